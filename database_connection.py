@@ -1,41 +1,575 @@
 # Python数据库连接示例
 # 支持SQLite、MySQL、PostgreSQL等多种数据库
 
+import asyncio
 import sqlite3
 import os
+import io
+import itertools
+import json
+import time
+import re
+import threading
+import weakref
+import uuid
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager, nullcontext
 from datetime import datetime
+from pathlib import Path
+
+
+def is_read_query(sql):
+    """是否为只读查询（SELECT / WITH）"""
+    return sql.lstrip().upper().startswith(('SELECT', 'WITH'))
+
+
+class ConnectionPool:
+    """通用线程安全连接池（用于MySQL/PostgreSQL）
+
+    - 预先创建 min_size 个连接，最多同时存在 max_size 个
+    - 空闲超过 idle_timeout 秒的多余连接会被关闭
+    - 空闲超过 health_check_interval 秒的连接在取出前执行健康检查，失效则重建
+    """
+
+    def __init__(self, connect, min_size=1, max_size=5, idle_timeout=300,
+                 health_check_interval=30, checkout_timeout=30, ping_sql='SELECT 1'):
+        """
+        Args:
+            connect: 创建新连接的函数
+            min_size: 最少保持的连接数
+            max_size: 最多连接数
+            idle_timeout: 空闲连接超时时间（秒）
+            health_check_interval: 连接空闲多久后取出时需要健康检查（秒）
+            checkout_timeout: 连接池耗尽时等待的最长时间（秒）
+            ping_sql: 健康检查语句
+        """
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.checkout_timeout = checkout_timeout
+        self.ping_sql = ping_sql
+
+        self._idle = deque()  # (连接, 归还时间)
+        self._size = 0        # 已创建且未关闭的连接数
+        self._cond = threading.Condition()
+        self._closed = False
+
+        for _ in range(min_size):
+            self._idle.append((self._connect(), time.monotonic()))
+            self._size += 1
+
+    def _is_healthy(self, conn):
+        try:
+            cursor = conn.cursor()
+            cursor.execute(self.ping_sql)
+            cursor.fetchall()
+            cursor.close()
+            conn.rollback()  # 不让健康检查留下打开的事务
+            return True
+        except Exception:
+            return False
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _prune_idle(self):
+        """关闭空闲超时的多余连接（调用方需持有锁）"""
+        now = time.monotonic()
+        # 队列左端是最久未使用的连接
+        while self._size > self.min_size and self._idle and now - self._idle[0][1] > self.idle_timeout:
+            conn, _ = self._idle.popleft()
+            self._size -= 1
+            self._close_quietly(conn)
+
+    def acquire(self):
+        """取出一个连接，连接池耗尽时等待"""
+        deadline = time.monotonic() + self.checkout_timeout
+        conn, last_used = None, None
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("连接池已关闭")
+                self._prune_idle()
+                if self._idle:
+                    # 后进先出：优先复用最近使用的连接，让多余连接自然超时
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"等待数据库连接超时 ({self.checkout_timeout}s)")
+                self._cond.wait(remaining)
+
+        try:
+            if conn is None:
+                conn = self._connect()
+            elif time.monotonic() - last_used > self.health_check_interval and not self._is_healthy(conn):
+                self._close_quietly(conn)
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    def release(self, conn, broken=False):
+        """归还连接；broken=True 或回滚失败时直接关闭
+
+        归还前先回滚未提交的事务：只执行过查询的连接（如 psycopg2）也处于事务中，
+        不回滚会一直保持 idle in transaction，占用快照和锁。
+        """
+        if not broken and not self._closed:
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+        with self._cond:
+            if broken or self._closed:
+                self._size -= 1
+                self._close_quietly(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """上下文管理方式借用连接，归还时回滚未提交的事务"""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close_all(self):
+        """关闭所有空闲连接，借出的连接归还时关闭"""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.popleft()
+                self._size -= 1
+                self._close_quietly(conn)
+            self._cond.notify_all()
+
+
+class SQLiteConnectionPool:
+    """SQLite按线程分配连接
+
+    sqlite3 连接不能安全地跨线程共享，每个线程第一次使用时创建自己的连接并一直复用。
+    """
+
+    def __init__(self, database, **connect_kwargs):
+        self.database = database
+        self.connect_kwargs = connect_kwargs
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """获取当前线程的连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # 每个连接只在创建它的线程中使用，关闭时允许由其他线程统一关闭
+            conn = sqlite3.connect(self.database, check_same_thread=False, **self.connect_kwargs)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def release(self, conn, broken=False):
+        """线程连接常驻，不关闭；与 ConnectionPool 一样回滚未提交的事务
+
+        同一线程嵌套借用时共享同一个连接，只在最外层归还时回滚，
+        内层归还不会撤销外层尚未提交的写入。
+        """
+        if getattr(self._local, 'depth', 0) == 0:
+            conn.rollback()
+
+    @contextmanager
+    def connection(self):
+        """上下文管理方式使用当前线程的连接，归还时回滚未提交的事务"""
+        conn = self.acquire()
+        self._local.depth = getattr(self._local, 'depth', 0) + 1
+        try:
+            yield conn
+        finally:
+            self._local.depth -= 1
+            self.release(conn)
+
+    def close_all(self):
+        """关闭所有线程的连接"""
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+class QueryProfiler:
+    """命名语句注册表 + 执行计时 + 慢查询日志
+
+    语句只在注册时构建一次；每次执行都会计时，
+    超过 slow_threshold 秒的查询连同执行计划写入环形缓冲区。
+    """
+
+    def __init__(self, slow_threshold=0.1, max_slow_queries=100, explain_prefix='EXPLAIN QUERY PLAN'):
+        self.slow_threshold = slow_threshold
+        self.explain_prefix = explain_prefix
+        self.statements = {}
+        self.slow_log = deque(maxlen=max_slow_queries)
+        self._stats = {}  # 语句名 -> [执行次数, 总耗时, 最大耗时]
+        self._lock = threading.Lock()
+
+    def register(self, name, sql):
+        """注册命名语句"""
+        self.statements[name] = sql
+
+    def sql(self, name):
+        try:
+            return self.statements[name]
+        except KeyError:
+            raise KeyError(f"未注册的语句: {name}")
+
+    def explain(self, conn, sql, params):
+        """获取查询的执行计划"""
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f'{self.explain_prefix} {sql}', params or ())
+            return '\n'.join(' | '.join(str(col) for col in row) for row in cursor.fetchall())
+        except Exception as e:
+            return f'无法获取执行计划: {e}'
+        finally:
+            cursor.close()
+
+    def record(self, name, sql, params, duration, conn=None):
+        """记录一次执行；慢查询会附带执行计划"""
+        with self._lock:
+            stats = self._stats.setdefault(name, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += duration
+            stats[2] = max(stats[2], duration)
+
+        if duration < self.slow_threshold:
+            return
+
+        # 只对读语句获取计划，避免 EXPLAIN 出错中断写事务
+        plan = None
+        if conn is not None and is_read_query(sql):
+            plan = self.explain(conn, sql, params)
+        self.slow_log.append({
+            'name': name,
+            'sql': ' '.join(sql.split()),
+            'params': params,
+            'duration': duration,
+            'plan': plan,
+            'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        })
+
+    def query_stats(self):
+        """按总耗时排序的语句统计"""
+        with self._lock:
+            rows = [
+                {'name': name, 'count': count, 'total': total, 'avg': total / count, 'max': max_duration}
+                for name, (count, total, max_duration) in self._stats.items()
+            ]
+        return sorted(rows, key=lambda row: row['total'], reverse=True)
+
+    def slow_queries(self):
+        """慢查询日志（最新的在最后）"""
+        return list(self.slow_log)
+
+    def print_report(self, top=10):
+        """打印查询耗时统计和慢查询"""
+        print("\n⏱️ 查询耗时统计:")
+        for row in self.query_stats()[:top]:
+            print(f"{row['name']:<30} 次数: {row['count']:<6} 平均: {row['avg'] * 1000:.2f}ms  "
+                  f"最大: {row['max'] * 1000:.2f}ms")
+        for entry in self.slow_queries()[-top:]:
+            print(f"\n🐢 慢查询 {entry['name']} ({entry['duration'] * 1000:.1f}ms): {entry['sql']}")
+            if entry['plan']:
+                print(f"执行计划:\n{entry['plan']}")
+
+
+class MigrationRunner:
+    """版本化数据库迁移
+
+    migrations 为按版本号排列的 (version, description, scripts) 列表，
+    scripts 按数据库类型给出有序的语句列表: {'sqlite': [...], 'postgresql': [...], 'mysql': [...]}，
+    语句可以是 SQL 字符串，也可以是接收游标的函数（用于需要先检查现有结构的迁移）。
+
+    - 已应用的版本记录在 schema_version 表中，结构已是最新时启动只需一次查询
+    - 每个版本在一个事务中执行并登记（MySQL 的 DDL 会隐式提交，无法整体回滚）
+    - PostgreSQL 的 CREATE INDEX CONCURRENTLY 不能在事务中执行，会切换到自动提交模式，
+      建索引期间不锁写入；失败时删除残留的无效索引，下次启动重试
+    """
+
+    CONCURRENT_INDEX = re.compile(r'INDEX\s+CONCURRENTLY\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)', re.IGNORECASE)
+
+    def __init__(self, db_type, migrations, table='schema_version'):
+        self.db_type = db_type
+        self.table = table
+        self.migrations = sorted(migrations, key=lambda migration: migration[0])
+        self.placeholder = '?' if db_type == 'sqlite' else '%s'
+
+    @property
+    def latest_version(self):
+        return self.migrations[-1][0] if self.migrations else 0
+
+    def current_version(self, conn):
+        """读取已应用的最高版本（版本表不存在时返回 None）"""
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f'SELECT MAX(version) FROM {self.table}')
+            return cursor.fetchone()[0] or 0
+        except Exception:
+            conn.rollback()
+            return None
+        finally:
+            cursor.close()
+
+    def _create_version_table(self, conn):
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {self.table} (
+                version INTEGER PRIMARY KEY,
+                description TEXT,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        conn.commit()
+        cursor.close()
+
+    def _execute_concurrently(self, conn, sql):
+        """在自动提交模式下执行 CREATE INDEX CONCURRENTLY"""
+        conn.commit()
+        conn.autocommit = True
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql)
+        except Exception:
+            # 失败的并发建索引会留下 INVALID 索引，删除后才能重试
+            match = self.CONCURRENT_INDEX.search(sql)
+            if match:
+                cursor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {match.group(1)}')
+            raise
+        finally:
+            cursor.close()
+            conn.autocommit = False
+
+    def migrate(self, conn):
+        """应用所有未执行的迁移，返回本次应用的版本号列表"""
+        current = self.current_version(conn)
+        if current is not None and current >= self.latest_version:
+            return []
+
+        if current is None:
+            self._create_version_table(conn)
+            current = 0
+
+        applied = []
+        for version, description, scripts in self.migrations:
+            if version <= current:
+                continue
+            if self.db_type not in scripts:
+                raise ValueError(f"迁移 v{version} 缺少 {self.db_type} 脚本")
+
+            print(f"🔄 应用迁移 v{version}: {description}")
+            cursor = conn.cursor()
+            try:
+                if self.db_type == 'sqlite' and not conn.in_transaction:
+                    # sqlite3 模块不会为 DDL 自动开启事务
+                    cursor.execute('BEGIN')
+                for statement in scripts[self.db_type]:
+                    if callable(statement):
+                        statement(cursor)
+                    elif self.db_type == 'postgresql' and self.CONCURRENT_INDEX.search(statement):
+                        self._execute_concurrently(conn, statement)
+                        cursor = conn.cursor()
+                    else:
+                        cursor.execute(statement)
+                cursor.execute(
+                    f'INSERT INTO {self.table} (version, description) '
+                    f'VALUES ({self.placeholder}, {self.placeholder})',
+                    (version, description)
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+            applied.append(version)
+
+        return applied
+
 
 class DatabaseManager:
     """数据库管理器类"""
 
-    def __init__(self, db_type='sqlite', **kwargs):
+    # 有序的数据库迁移：(版本, 说明, 各数据库的语句)
+    MIGRATIONS = [
+        (1, '创建用户表和实验数据表', {
+            'sqlite': [
+                '''
+                CREATE TABLE IF NOT EXISTS users (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    username TEXT NOT NULL UNIQUE,
+                    email TEXT NOT NULL,
+                    password_hash TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    is_active BOOLEAN DEFAULT 1
+                )
+                ''',
+                '''
+                CREATE TABLE IF NOT EXISTS experiments (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER,
+                    experiment_name TEXT NOT NULL,
+                    description TEXT,
+                    data TEXT,  -- JSON格式存储实验数据
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (user_id) REFERENCES users (id)
+                )
+                ''',
+            ],
+            'mysql': [
+                '''
+                CREATE TABLE IF NOT EXISTS users (
+                    id INT AUTO_INCREMENT PRIMARY KEY,
+                    username VARCHAR(100) NOT NULL UNIQUE,
+                    email VARCHAR(255) NOT NULL,
+                    password_hash VARCHAR(255) NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    is_active BOOLEAN DEFAULT TRUE
+                )
+                ''',
+                '''
+                CREATE TABLE IF NOT EXISTS experiments (
+                    id INT AUTO_INCREMENT PRIMARY KEY,
+                    user_id INT,
+                    experiment_name VARCHAR(255) NOT NULL,
+                    description TEXT,
+                    data JSON,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (user_id) REFERENCES users (id)
+                )
+                ''',
+            ],
+            'postgresql': [
+                '''
+                CREATE TABLE IF NOT EXISTS users (
+                    id SERIAL PRIMARY KEY,
+                    username VARCHAR(100) NOT NULL UNIQUE,
+                    email VARCHAR(255) NOT NULL,
+                    password_hash VARCHAR(255) NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    is_active BOOLEAN DEFAULT TRUE
+                )
+                ''',
+                '''
+                CREATE TABLE IF NOT EXISTS experiments (
+                    id SERIAL PRIMARY KEY,
+                    user_id INTEGER REFERENCES users (id),
+                    experiment_name VARCHAR(255) NOT NULL,
+                    description TEXT,
+                    data JSONB,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+                ''',
+            ],
+        }),
+        (2, '为按用户查询实验添加索引', {
+            'sqlite': [
+                'CREATE INDEX IF NOT EXISTS idx_experiments_user ON experiments (user_id, created_at)',
+            ],
+            # InnoDB 在线DDL：建索引期间不阻塞读写
+            'mysql': [
+                'ALTER TABLE experiments ADD INDEX idx_experiments_user (user_id, created_at), '
+                'ALGORITHM=INPLACE, LOCK=NONE',
+            ],
+            'postgresql': [
+                'CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_experiments_user ON experiments (user_id, created_at)',
+            ],
+        }),
+    ]
+
+    def __init__(self, db_type='sqlite', pool_min=1, pool_max=5, idle_timeout=300,
+                 statement_cache_size=256, slow_query_threshold=0.1, replicas=None,
+                 sqlite_read_connection=False, max_replica_lag=5.0, lag_check_interval=10,
+                 read_your_writes=None, **kwargs):
         """
-        初始化数据库连接
+        初始化数据库连接池
 
         Args:
             db_type: 数据库类型 ('sqlite', 'mysql', 'postgresql')
+            pool_min: 连接池最少连接数（MySQL/PostgreSQL）
+            pool_max: 连接池最多连接数（MySQL/PostgreSQL）
+            idle_timeout: 空闲连接超时时间（秒）
+            statement_cache_size: SQLite 每个连接缓存的已编译语句数
+            slow_query_threshold: 慢查询阈值（秒）
+            replicas: 只读副本的连接参数列表（MySQL/PostgreSQL），读操作分发到副本
+            sqlite_read_connection: SQLite 启用WAL并为读操作使用单独的只读连接
+            max_replica_lag: 副本延迟超过该秒数时不再分发读操作
+            lag_check_interval: 副本延迟检查间隔（秒）
+            read_your_writes: 写入提交后该秒数内，同一线程的读操作仍走主库（按线程记录，
+                其他线程不受影响）；默认等于 max_replica_lag
             **kwargs: 数据库连接参数
         """
         self.db_type = db_type
-        self.connection = None
+        self.pool = None
+
+        # 读写分离：写操作走主库，读操作分发到延迟可接受的副本
+        self.replicas = []
+        self.max_replica_lag = max_replica_lag
+        self.lag_check_interval = lag_check_interval
+        self.read_your_writes = max_replica_lag if read_your_writes is None else read_your_writes
+        self._replica_cycle = itertools.count()
+        self._session = threading.local()  # 每个线程：正在使用的主库连接数、最近一次写入提交的时间
+
+        # 命名语句、执行计时与慢查询日志
+        self.profiler = QueryProfiler(
+            slow_threshold=slow_query_threshold,
+            explain_prefix='EXPLAIN QUERY PLAN' if db_type == 'sqlite' else 'EXPLAIN'
+        )
+        self._prepared = weakref.WeakKeyDictionary()  # 不能设置属性的连接（psycopg2）-> 语句缓存
 
         if db_type == 'sqlite':
-            # SQLite数据库
+            # SQLite数据库：每个线程一个连接
             db_path = kwargs.get('database', 'example.db')
-            self.connection = sqlite3.connect(db_path)
+            self.pool = SQLiteConnectionPool(db_path, cached_statements=statement_cache_size)
             print(f"✅ 连接到SQLite数据库: {db_path}")
 
+            if sqlite_read_connection:
+                # WAL 模式下读连接不会阻塞写入，写入也不会阻塞读取
+                with self.pool.connection() as conn:
+                    conn.execute('PRAGMA journal_mode=WAL')
+                read_uri = Path(db_path).resolve().as_uri() + '?mode=ro'
+                self._add_replica('sqlite-ro', SQLiteConnectionPool(
+                    read_uri, uri=True, cached_statements=statement_cache_size))
+
         elif db_type == 'mysql':
             # MySQL数据库 (需要安装: pip install mysql-connector-python)
             try:
                 import mysql.connector
-                self.connection = mysql.connector.connect(
-                    host=kwargs.get('host', 'localhost'),
-                    user=kwargs.get('user', 'root'),
-                    password=kwargs.get('password', ''),
-                    database=kwargs.get('database', 'test'),
-                    port=kwargs.get('port', 3306)
-                )
+
+                def connector(params):
+                    return lambda: mysql.connector.connect(
+                        host=params.get('host', 'localhost'),
+                        user=params.get('user', 'root'),
+                        password=params.get('password', ''),
+                        database=params.get('database', 'test'),
+                        port=params.get('port', 3306)
+                    )
+                self.pool = ConnectionPool(connector(kwargs), min_size=pool_min, max_size=pool_max,
+                                           idle_timeout=idle_timeout)
                 print("✅ 连接到MySQL数据库")
             except ImportError:
                 print("❌ 请先安装MySQL连接器: pip install mysql-connector-python")
@@ -44,13 +578,17 @@ class DatabaseManager:
             # PostgreSQL数据库 (需要安装: pip install psycopg2)
             try:
                 import psycopg2
-                self.connection = psycopg2.connect(
-                    host=kwargs.get('host', 'localhost'),
-                    user=kwargs.get('user', 'postgres'),
-                    password=kwargs.get('password', ''),
-                    database=kwargs.get('database', 'test'),
-                    port=kwargs.get('port', 5432)
-                )
+
+                def connector(params):
+                    return lambda: psycopg2.connect(
+                        host=params.get('host', 'localhost'),
+                        user=params.get('user', 'postgres'),
+                        password=params.get('password', ''),
+                        database=params.get('database', 'test'),
+                        port=params.get('port', 5432)
+                    )
+                self.pool = ConnectionPool(connector(kwargs), min_size=pool_min, max_size=pool_max,
+                                           idle_timeout=idle_timeout)
                 print("✅ 连接到PostgreSQL数据库")
             except ImportError:
                 print("❌ 请先安装PostgreSQL连接器: pip install psycopg2-binary")
@@ -58,115 +596,860 @@ class DatabaseManager:
         else:
             raise ValueError(f"不支持的数据库类型: {db_type}")
 
-    def create_tables(self):
-        """创建示例表"""
-        if not self.connection:
+        if self.pool and replicas and db_type != 'sqlite':
+            for replica in replicas:
+                # 副本未指定的参数沿用主库配置
+                params = {**kwargs, **replica}
+                self._add_replica(f"{params.get('host', 'localhost')}:{params.get('port', '')}",
+                                  ConnectionPool(connector(params), min_size=0, max_size=pool_max,
+                                                 idle_timeout=idle_timeout))
+            print(f"✅ 已配置 {len(self.replicas)} 个只读副本")
+
+    def _add_replica(self, name, pool):
+        self.replicas.append({'name': name, 'pool': pool, 'lag': 0.0, 'checked_at': 0.0})
+
+    @contextmanager
+    def get_connection(self):
+        """从主库连接池借用连接（上下文管理器）
+
+        通过主库借用连接视为写操作：持有连接期间以及归还（提交）之后 read_your_writes 秒内，
+        当前线程的读操作也走主库，保证能读到自己刚写入的数据。该状态按线程记录。
+
+        用法:
+            with db.get_connection() as conn:
+                conn.cursor().execute(...)
+                conn.commit()
+        """
+        session = self._session
+        session.writing = getattr(session, 'writing', 0) + 1
+        try:
+            with self.pool.connection() as conn:
+                yield conn
+        finally:
+            session.writing -= 1
+            # 从事务结束时开始计算，长事务提交后同样有完整的一致性窗口
+            session.last_write = time.monotonic()
+
+    def read_connection(self):
+        """借用读连接（上下文管理器）：优先使用延迟可接受的副本，否则使用主库"""
+        replica = self._pick_replica()
+        if replica is None:
+            return self.pool.connection()
+        return replica['pool'].connection()
+
+    def _pick_replica(self):
+        """轮询选择副本；刚写入过数据或所有副本延迟过大时返回 None"""
+        if not self.replicas:
+            return None
+        if getattr(self._session, 'writing', 0):
+            return None
+        last_write = getattr(self._session, 'last_write', None)
+        if last_write is not None and time.monotonic() - last_write < self.read_your_writes:
+            return None
+
+        start = next(self._replica_cycle)
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            if self.replica_lag(replica) <= self.max_replica_lag:
+                return replica
+        return None
+
+    def replica_lag(self, replica):
+        """副本复制延迟（秒），每 lag_check_interval 秒检查一次；不可用时为无穷大"""
+        now = time.monotonic()
+        if now - replica['checked_at'] < self.lag_check_interval:
+            return replica['lag']
+
+        lag = 0.0
+        if self.db_type != 'sqlite':
+            # SQLite 只读连接读取的是同一个文件，没有复制延迟
+            try:
+                with replica['pool'].connection() as conn:
+                    if self.db_type == 'postgresql':
+                        cursor = conn.cursor()
+                        # WAL 已全部回放时视为无延迟，否则按最后回放事务的时间计算
+                        cursor.execute('''
+                            SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                                        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+                                   END
+                        ''')
+                        value = cursor.fetchone()[0]
+                    else:
+                        cursor = conn.cursor(dictionary=True)
+                        try:
+                            cursor.execute('SHOW REPLICA STATUS')
+                        except Exception:
+                            cursor.execute('SHOW SLAVE STATUS')  # MySQL 8.0.22 之前的版本
+                        status = cursor.fetchone() or {}
+                        value = status.get('Seconds_Behind_Source', status.get('Seconds_Behind_Master'))
+                    cursor.close()
+                    conn.rollback()
+                # 复制线程停止时延迟为 NULL
+                lag = float(value) if value is not None else float('inf')
+            except Exception as e:
+                print(f"⚠️ 副本 {replica['name']} 延迟检查失败: {e}")
+                lag = float('inf')
+
+        replica['lag'] = lag
+        replica['checked_at'] = now
+        return lag
+
+    def register_statement(self, name, sql):
+        """注册命名语句（占位符使用当前数据库驱动的风格）
+
+        PostgreSQL 在每个连接上首次执行时 PREPARE，之后直接 EXECUTE；
+        SQLite 依靠连接的语句缓存复用已编译语句；MySQL 使用预处理游标。
+        """
+        if not name.isidentifier():
+            raise ValueError(f"语句名必须是合法标识符: {name}")
+        self.profiler.register(name, sql)
+
+    def execute_named(self, name, params=(), fetch='all'):
+        """执行已注册的命名语句
+
+        Args:
+            name: 语句名
+            params: 查询参数
+            fetch: 'all' 返回全部行，'one' 返回一行，None 表示写操作（提交并返回影响行数）
+        """
+        sql = self.profiler.sql(name)
+        params = tuple(params or ())
+        readonly = fetch is not None and is_read_query(sql)
+
+        with (self.read_connection() if readonly else self.get_connection()) as conn:
+            start = time.perf_counter()
+
+            cache = self._statement_cache(conn) if self.db_type != 'sqlite' else None
+            cached_cursor = False
+            if self.db_type == 'postgresql' and cache is not None:
+                cursor = conn.cursor()
+                if name not in cache:
+                    cursor.execute(f'PREPARE {name} AS {self._numbered_params(sql)}')
+                    cache[name] = True
+                placeholders = ', '.join(['%s'] * len(params))
+                cursor.execute(f'EXECUTE {name} ({placeholders})' if params else f'EXECUTE {name}', params)
+            elif self.db_type == 'mysql':
+                # 每个连接上每条语句只预处理一次，之后复用同一个预处理游标
+                cursor = cache.get(name) if cache is not None else None
+                if cursor is None:
+                    cursor = conn.cursor(prepared=True)
+                    if cache is not None:
+                        cache[name] = cursor
+                cached_cursor = cache is not None
+                cursor.execute(sql, params)
+            else:
+                cursor = conn.cursor()
+                cursor.execute(sql, params)
+
+            if fetch == 'all':
+                result = cursor.fetchall()
+            elif fetch == 'one':
+                result = cursor.fetchone()
+            else:
+                conn.commit()
+                result = cursor.rowcount
+            if cached_cursor:
+                # 复用的预处理游标必须读完结果集，否则下次执行会报 Unread result found
+                if getattr(conn, 'unread_result', False):
+                    cursor.fetchall()
+            else:
+                cursor.close()
+
+            # 计时包含读取结果，数据量大、耗时在读取阶段的查询同样会记入慢查询日志
+            self.profiler.record(name, sql, params, time.perf_counter() - start, conn)
+        return result
+
+    def _statement_cache(self, conn):
+        """连接上的命名语句缓存（PostgreSQL: 已PREPARE的语句名；MySQL: 语句名 -> 预处理游标）
+
+        缓存作为连接对象的属性保存，随连接一起释放（MySQL 的预处理游标引用连接，不能放在弱引用字典的值里）；
+        不能设置属性的连接（psycopg2）以连接为弱引用键保存；都不支持时返回 None，不做缓存。
+        """
+        cache = getattr(conn, '_named_statements', None)
+        if cache is not None:
+            return cache
+        try:
+            conn._named_statements = cache = {}
+            return cache
+        except AttributeError:
+            pass
+        try:
+            return self._prepared.setdefault(conn, {})
+        except TypeError:
+            return None
+
+    @staticmethod
+    def _numbered_params(sql):
+        """把 %s 占位符转换为 PREPARE 需要的 $1, $2 ..."""
+        counter = itertools.count(1)
+        return re.sub(r'%s', lambda _: f'${next(counter)}', sql)
+
+    def query_stats(self):
+        """各语句的执行次数与耗时统计"""
+        return self.profiler.query_stats()
+
+    def slow_queries(self):
+        """慢查询日志（包含执行计划）"""
+        return self.profiler.slow_queries()
+
+    @property
+    def placeholder(self):
+        """当前数据库驱动的参数占位符"""
+        return '?' if self.db_type == 'sqlite' else '%s'
+
+    def quote(self, name):
+        """引用表名/列名"""
+        if self.db_type == 'mysql':
+            return f"`{name}`"
+        return f'"{name}"'
+
+    @staticmethod
+    def _normalize_rows(rows, columns=None):
+        """把 DataFrame、字典或元组的可迭代对象统一为 (列名, 元组迭代器)"""
+        if hasattr(rows, 'itertuples') and hasattr(rows, 'columns'):
+            columns = list(columns or rows.columns)
+            return columns, DatabaseManager._frame_rows(rows, columns)
+
+        rows = iter(rows)
+        first = next(rows, None)
+        if first is None:
+            return columns, iter(())
+        if isinstance(first, dict):
+            columns = list(columns or first.keys())
+            return columns, (tuple(row.get(c) for c in columns) for row in itertools.chain([first], rows))
+        if not columns:
+            raise ValueError("传入元组数据时必须指定 columns")
+        return list(columns), itertools.chain([tuple(first)], (tuple(row) for row in rows))
+
+    @staticmethod
+    def _frame_rows(frame, columns, chunk_rows=10000):
+        """按块把 DataFrame 转换为驱动可以绑定的 Python 值
+
+        Timestamp -> datetime，Timedelta -> timedelta，NaN/NaT/NA -> None
+        """
+        import numpy as np
+        import pandas as pd
+        for start in range(0, len(frame), chunk_rows):
+            chunk = frame.iloc[start:start + chunk_rows]
+            values = []
+            for column in columns:
+                series = chunk[column]
+                if pd.api.types.is_datetime64_any_dtype(series.dtype):
+                    column_values = np.array(series.dt.to_pydatetime(), dtype=object)
+                elif pd.api.types.is_timedelta64_dtype(series.dtype):
+                    column_values = np.array(series.dt.to_pytimedelta(), dtype=object)
+                else:
+                    column_values = series.to_numpy(dtype=object, copy=True)
+                missing = series.isna().to_numpy()
+                if missing.any():
+                    column_values[missing] = None
+                values.append(column_values)
+            yield from zip(*values)
+
+    @staticmethod
+    def _is_missing(value):
+        """None、NaN、NaT 和 pandas.NA 都视为缺失值"""
+        try:
+            return value is None or bool(value != value)
+        except TypeError:
+            # pandas.NA 不能转换为布尔值
+            return True
+
+    @staticmethod
+    def _batches(rows, batch_size):
+        while True:
+            batch = list(itertools.islice(rows, batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def _conflict_clause(self, columns, on_conflict, conflict_columns):
+        """生成 SQLite/PostgreSQL 的 ON CONFLICT 子句"""
+        if on_conflict == 'ignore':
+            return ' ON CONFLICT DO NOTHING'
+        if on_conflict == 'update':
+            if not conflict_columns:
+                raise ValueError("on_conflict='update' 需要指定 conflict_columns")
+            updates = ', '.join(f'{self.quote(c)} = excluded.{self.quote(c)}'
+                                for c in columns if c not in conflict_columns)
+            target = ', '.join(self.quote(c) for c in conflict_columns)
+            if not updates:
+                # 所有列都是冲突键，没有可更新的列：重复行保持不变
+                return f' ON CONFLICT ({target}) DO NOTHING'
+            return f' ON CONFLICT ({target}) DO UPDATE SET {updates}'
+        return ''
+
+    def bulk_insert(self, table, rows, columns=None, on_conflict='error',
+                    conflict_columns=None, batch_size=10000, conn=None):
+        """批量写入数据
+
+        - SQLite: 分批 executemany，整个导入在一个事务中提交
+        - PostgreSQL: 无冲突处理时使用 COPY FROM STDIN，否则使用 execute_values
+        - MySQL: 多行 INSERT 分批写入
+
+        Args:
+            table: 表名
+            rows: pandas DataFrame、字典列表或元组的可迭代对象
+            columns: 列名（元组数据必填，DataFrame/字典默认取全部列）
+            on_conflict: 'error'（报错）、'ignore'（跳过重复行）、'update'（覆盖重复行）
+            conflict_columns: on_conflict='update' 时判断冲突的唯一键列
+            batch_size: 每批行数
+            conn: 传入时在调用方的事务中写入且不提交（多次写入可以放在同一个事务中）
+
+        Returns:
+            写入的行数
+        """
+        if on_conflict not in ('error', 'ignore', 'update'):
+            raise ValueError(f"不支持的冲突处理方式: {on_conflict}")
+        if not self.pool:
+            return 0
+
+        columns, rows = self._normalize_rows(rows, columns)
+        if not columns:
+            return 0
+
+        column_list = ', '.join(self.quote(c) for c in columns)
+        total = 0
+
+        own_connection = conn is None
+        with self.get_connection() if own_connection else nullcontext(conn) as conn:
+            cursor = conn.cursor()
+
+            if self.db_type == 'sqlite':
+                sql = (f'INSERT INTO {self.quote(table)} ({column_list}) '
+                       f'VALUES ({", ".join("?" * len(columns))})'
+                       f'{self._conflict_clause(columns, on_conflict, conflict_columns)}')
+                for batch in self._batches(rows, batch_size):
+                    cursor.executemany(sql, batch)
+                    total += len(batch)
+
+            elif self.db_type == 'postgresql':
+                if on_conflict == 'error':
+                    # COPY 协议按批流式发送，不逐行往返
+                    sql = f'COPY {self.quote(table)} ({column_list}) FROM STDIN'
+                    for batch in self._batches(rows, batch_size):
+                        cursor.copy_expert(sql, io.StringIO(''.join(map(self._copy_line, batch))))
+                        total += len(batch)
+                else:
+                    from psycopg2.extras import execute_values
+                    sql = (f'INSERT INTO {self.quote(table)} ({column_list}) VALUES %s'
+                           f'{self._conflict_clause(columns, on_conflict, conflict_columns)}')
+                    for batch in self._batches(rows, batch_size):
+                        execute_values(cursor, sql, batch, page_size=len(batch))
+                        total += len(batch)
+
+            elif self.db_type == 'mysql':
+                verb = 'INSERT IGNORE' if on_conflict == 'ignore' else 'INSERT'
+                suffix = ''
+                if on_conflict == 'update':
+                    updates = [f'{self.quote(c)} = VALUES({self.quote(c)})'
+                               for c in columns if c not in (conflict_columns or ())]
+                    # 没有可更新的列时用无操作赋值，重复行保持不变
+                    suffix = ' ON DUPLICATE KEY UPDATE ' + (
+                        ', '.join(updates) or f'{self.quote(columns[0])} = {self.quote(columns[0])}')
+                row_placeholder = f'({", ".join(["%s"] * len(columns))})'
+                # 多行 INSERT 受 max_allowed_packet 限制，每条语句最多1000行
+                for batch in self._batches(rows, min(batch_size, 1000)):
+                    sql = (f'{verb} INTO {self.quote(table)} ({column_list}) VALUES '
+                           f'{", ".join([row_placeholder] * len(batch))}{suffix}')
+                    cursor.execute(sql, [value for row in batch for value in row])
+                    total += len(batch)
+
+            if own_connection:
+                conn.commit()
+
+        return total
+
+    @staticmethod
+    def _copy_value(value):
+        """把单个值转换为 COPY 输入文本（转义之前）
+
+        dict/list 编码为 JSON（json/jsonb 列），bytes 编码为 bytea 的十六进制格式，
+        日期时间使用 ISO 格式，布尔值为 t/f。
+        """
+        if isinstance(value, (dict, list)):
+            return json.dumps(value, ensure_ascii=False, default=str)
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return '\\x' + bytes(value).hex()
+        if isinstance(value, bool):
+            return 't' if value else 'f'
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return str(value)
+
+    @staticmethod
+    def _copy_line(row):
+        """把一行数据编码为 COPY text 格式（反斜杠、制表符和换行转义，缺失值为 \\N）"""
+        values = []
+        for value in row:
+            if DatabaseManager._is_missing(value):
+                values.append('\\N')
+            else:
+                values.append(DatabaseManager._copy_value(value).replace('\\', '\\\\').replace('\t', '\\t')
+                              .replace('\n', '\\n').replace('\r', '\\r'))
+        return '\t'.join(values) + '\n'
+
+    def stream(self, query, params=None, batch_size=1000, as_frame=None):
+        """流式读取查询结果，内存占用与结果集大小无关
+
+        - SQLite: fetchmany 分批读取
+        - PostgreSQL: 命名（服务器端）游标
+        - MySQL: 非缓冲游标
+
+        读操作通过 read_connection() 执行，配置了副本时不占用主库。
+
+        Args:
+            query: SQL语句（占位符使用当前数据库驱动的风格）
+            params: 查询参数
+            batch_size: 每批读取的行数
+            as_frame: None 逐行返回元组；'pandas' 每批返回 DataFrame；'arrow' 每批返回 pyarrow.RecordBatch
+
+        Yields:
+            行元组，或每批一个 DataFrame / RecordBatch
+        """
+        if not self.pool:
             return
 
-        cursor = self.connection.cursor()
+        with self.read_connection() as conn:
+            if self.db_type == 'postgresql':
+                cursor = conn.cursor(name=f'stream_{uuid.uuid4().hex}')
+                cursor.itersize = batch_size
+            elif self.db_type == 'mysql':
+                cursor = conn.cursor(buffered=False)
+            else:
+                cursor = conn.cursor()
 
-        if self.db_type == 'sqlite':
-            # 创建用户表
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    username TEXT NOT NULL UNIQUE,
-                    email TEXT NOT NULL,
-                    password_hash TEXT NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    is_active BOOLEAN DEFAULT 1
-                )
-            ''')
+            finished = False
+            # 只统计 execute/fetchmany 的耗时，消费方处理数据的时间不计入
+            start = time.perf_counter()
+            try:
+                cursor.execute(query, params or ())
+                elapsed = time.perf_counter() - start
+                columns = None
+                while True:
+                    start = time.perf_counter()
+                    rows = cursor.fetchmany(batch_size)
+                    elapsed += time.perf_counter() - start
+                    if not rows:
+                        finished = True
+                        break
+                    if columns is None:
+                        columns = [d[0] for d in cursor.description]
 
-            # 创建实验数据表
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS experiments (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER,
-                    experiment_name TEXT NOT NULL,
-                    description TEXT,
-                    data TEXT,  -- JSON格式存储实验数据
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users (id)
-                )
-            ''')
+                    if as_frame == 'pandas':
+                        import pandas as pd
+                        yield pd.DataFrame.from_records(rows, columns=columns)
+                    elif as_frame == 'arrow':
+                        import pyarrow as pa
+                        yield pa.RecordBatch.from_arrays([pa.array(col) for col in zip(*rows)], names=columns)
+                    else:
+                        yield from rows
+                self.profiler.record('stream', query, params, elapsed, conn)
+            finally:
+                if self.db_type == 'mysql' and not finished:
+                    # 提前结束迭代时丢弃未读取的结果，连接才能继续使用
+                    conn.consume_results()
+                cursor.close()
+                if self.db_type == 'postgresql':
+                    # 命名游标运行在事务中，读完后结束事务
+                    conn.rollback()
+
+    def create_tables(self):
+        """创建示例表（执行尚未应用的数据库迁移）"""
+        if not self.pool:
+            return
 
-        print("✅ 数据表创建完成")
+        with self.get_connection() as conn:
+            applied = MigrationRunner(self.db_type, self.MIGRATIONS).migrate(conn)
+
+        if applied:
+            print(f"✅ 数据表迁移完成: v{applied[-1]}")
+        else:
+            print("✅ 数据表结构已是最新")
 
     def insert_sample_data(self):
         """插入示例数据"""
-        if not self.connection:
+        if not self.pool:
             return
 
-        cursor = self.connection.cursor()
-
         try:
-            # 插入用户数据
-            cursor.execute('''
-                INSERT OR IGNORE INTO users (username, email, password_hash)
-                VALUES (?, ?, ?)
-            ''', ('admin', 'admin@example.com', 'hashed_password_123'))
-
-            cursor.execute('''
-                INSERT OR IGNORE INTO users (username, email, password_hash)
-                VALUES (?, ?, ?)
-            ''', ('user1', 'user1@example.com', 'hashed_password_456'))
+            # 用户和实验数据在同一个事务中写入，任何一步失败都整体回滚
+            with self.get_connection() as conn:
+                try:
+                    # 插入用户数据（用户名已存在时跳过）
+                    self.bulk_insert('users', [
+                        ('admin', 'admin@example.com', 'hashed_password_123'),
+                        ('user1', 'user1@example.com', 'hashed_password_456'),
+                    ], columns=['username', 'email', 'password_hash'], on_conflict='ignore', conn=conn)
 
-            # 插入实验数据
-            cursor.execute('''
-                INSERT INTO experiments (user_id, experiment_name, description, data)
-                VALUES (?, ?, ?, ?)
-            ''', (1, '机器学习实验1', '线性回归实验', '{"accuracy": 0.85, "model": "linear_regression"}'))
+                    # 插入实验数据
+                    self.bulk_insert('experiments', [
+                        (1, '机器学习实验1', '线性回归实验', '{"accuracy": 0.85, "model": "linear_regression"}'),
+                        (1, '机器学习实验2', '分类实验', '{"accuracy": 0.92, "model": "random_forest"}'),
+                    ], columns=['user_id', 'experiment_name', 'description', 'data'], conn=conn)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
 
-            cursor.execute('''
-                INSERT INTO experiments (user_id, experiment_name, description, data)
-                VALUES (?, ?, ?, ?)
-            ''', (1, '机器学习实验2', '分类实验', '{"accuracy": 0.92, "model": "random_forest"}'))
-
-            self.connection.commit()
             print("✅ 示例数据插入完成")
 
         except Exception as e:
             print(f"❌ 插入数据时出错: {e}")
-            self.connection.rollback()
 
     def query_data(self):
         """查询数据示例"""
-        if not self.connection:
+        if not self.pool:
             return
 
-        cursor = self.connection.cursor()
-
         try:
-            # 查询所有用户
-            cursor.execute("SELECT id, username, email, created_at FROM users")
-            users = cursor.fetchall()
+            # 查询所有用户（流式读取，不一次性加载全部结果）
             print("\n📋 用户列表:")
-            for user in users:
+            for user in self.stream("SELECT id, username, email, created_at FROM users"):
                 print(f"ID: {user[0]}, 用户名: {user[1]}, 邮箱: {user[2]}, 创建时间: {user[3]}")
 
+            # 命名语句：注册一次，重复执行时复用已编译/预处理的语句
+            self.register_statement(
+                'experiments_by_user',
+                f"SELECT COUNT(*) FROM experiments WHERE user_id = {self.placeholder}"
+            )
+            count = self.execute_named('experiments_by_user', (1,), fetch='one')[0]
+            print(f"\n用户1的实验数量: {count}")
+
             # 查询实验数据
-            cursor.execute("""
+            print("\n🧪 实验列表:")
+            for exp in self.stream("""
                 SELECT e.experiment_name, e.description, u.username, e.created_at
                 FROM experiments e
                 JOIN users u ON e.user_id = u.id
                 ORDER BY e.created_at DESC
-            """)
-            experiments = cursor.fetchall()
-            print("\n🧪 实验列表:")
-            for exp in experiments:
+            """):
                 print(f"实验名: {exp[0]}, 描述: {exp[1]}, 用户: {exp[2]}, 创建时间: {exp[3]}")
 
         except Exception as e:
             print(f"❌ 查询数据时出错: {e}")
 
     def close(self):
-        """关闭数据库连接"""
-        if self.connection:
-            self.connection.close()
+        """关闭连接池中的所有连接"""
+        if self.pool:
+            self.pool.close_all()
+            for replica in self.replicas:
+                replica['pool'].close_all()
             print("🔌 数据库连接已关闭")
 
 
+class AsyncSession:
+    """异步连接会话：统一 aiosqlite / asyncpg / aiomysql 的常用操作
+
+    SQL 占位符使用对应驱动的风格（SQLite '?'，PostgreSQL '$1'，MySQL '%s'）。
+    """
+
+    def __init__(self, db_type, conn):
+        self.db_type = db_type
+        self.conn = conn
+        self.in_transaction = False
+
+    async def _autocommit(self):
+        # aiosqlite 默认开启隐式事务，事务外的写操作立即提交
+        if self.db_type == 'sqlite' and not self.in_transaction:
+            await self.conn.commit()
+
+    async def execute(self, sql, params=()):
+        """执行写操作，返回影响行数"""
+        if self.db_type == 'postgresql':
+            status = await self.conn.execute(sql, *params)
+            return int(status.split()[-1]) if status.split()[-1].isdigit() else 0
+        if self.db_type == 'mysql':
+            async with self.conn.cursor() as cursor:
+                await cursor.execute(sql, params)
+                return cursor.rowcount
+        cursor = await self.conn.execute(sql, params)
+        await self._autocommit()
+        return cursor.rowcount
+
+    async def executemany(self, sql, rows):
+        """批量执行同一条语句"""
+        rows = list(rows)
+        if self.db_type == 'postgresql':
+            await self.conn.executemany(sql, rows)
+        elif self.db_type == 'mysql':
+            async with self.conn.cursor() as cursor:
+                await cursor.executemany(sql, rows)
+        else:
+            await self.conn.executemany(sql, rows)
+            await self._autocommit()
+        return len(rows)
+
+    async def fetchall(self, sql, params=()):
+        if self.db_type == 'postgresql':
+            return [tuple(record) for record in await self.conn.fetch(sql, *params)]
+        if self.db_type == 'mysql':
+            async with self.conn.cursor() as cursor:
+                await cursor.execute(sql, params)
+                return await cursor.fetchall()
+        async with self.conn.execute(sql, params) as cursor:
+            return await cursor.fetchall()
+
+    async def fetchone(self, sql, params=()):
+        if self.db_type == 'postgresql':
+            record = await self.conn.fetchrow(sql, *params)
+            return tuple(record) if record is not None else None
+        if self.db_type == 'mysql':
+            async with self.conn.cursor() as cursor:
+                await cursor.execute(sql, params)
+                return await cursor.fetchone()
+        async with self.conn.execute(sql, params) as cursor:
+            return await cursor.fetchone()
+
+    async def iterate(self, sql, params=(), batch_size=1000):
+        """异步逐行迭代结果集，分批从数据库读取"""
+        if self.db_type == 'postgresql':
+            # asyncpg 游标必须在事务中使用
+            if self.conn.is_in_transaction():
+                async for record in self.conn.cursor(sql, *params, prefetch=batch_size):
+                    yield tuple(record)
+            else:
+                async with self.conn.transaction():
+                    async for record in self.conn.cursor(sql, *params, prefetch=batch_size):
+                        yield tuple(record)
+        elif self.db_type == 'mysql':
+            import aiomysql
+            async with self.conn.cursor(aiomysql.SSCursor) as cursor:
+                await cursor.execute(sql, params)
+                while True:
+                    rows = await cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield row
+        else:
+            async with self.conn.execute(sql, params) as cursor:
+                while True:
+                    rows = await cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield row
+
+
+class AsyncDatabaseManager:
+    """异步数据库管理器，供 asyncio 代码（爬虫、Web服务）使用
+
+    - SQLite: aiosqlite（pip install aiosqlite），启用WAL；打开时创建 pool_min 个连接，
+      不够用时按需增加到 pool_max 个，归还时回滚未提交的事务
+    - PostgreSQL: asyncpg 连接池（pip install asyncpg）
+    - MySQL: aiomysql 连接池（pip install aiomysql）
+
+    用法:
+        async with AsyncDatabaseManager('sqlite', database='app.db') as db:
+            async with db.transaction() as session:
+                await session.execute('INSERT INTO users (username) VALUES (?)', ('a',))
+            async with db.iterate('SELECT * FROM users') as rows:
+                async for row in rows:
+                    ...
+    """
+
+    def __init__(self, db_type='sqlite', pool_min=1, pool_max=5, **kwargs):
+        if db_type not in ('sqlite', 'mysql', 'postgresql'):
+            raise ValueError(f"不支持的数据库类型: {db_type}")
+        if not 0 <= pool_min <= pool_max or pool_max < 1:
+            raise ValueError(f"连接池大小无效: pool_min={pool_min}, pool_max={pool_max}")
+        self.db_type = db_type
+        self.pool_min = pool_min
+        self.pool_max = pool_max
+        self.kwargs = kwargs
+        self.pool = None
+
+    async def open(self):
+        """创建连接池"""
+        if self.pool is not None:
+            return self
+
+        if self.db_type == 'sqlite':
+            try:
+                import aiosqlite
+            except ImportError:
+                print("❌ 请先安装异步驱动: pip install aiosqlite")
+                raise
+            self._aiosqlite = aiosqlite
+            self.pool = asyncio.Queue()
+            self._sqlite_connections = []
+            self._sqlite_size = 0  # 已创建和正在创建的连接数
+            try:
+                for _ in range(self.pool_min):
+                    self.pool.put_nowait(await self._new_sqlite_connection())
+            except Exception:
+                for conn in self._sqlite_connections:
+                    await conn.close()
+                self.pool = None
+                raise
+            print(f"✅ 异步连接到SQLite数据库: {self.kwargs.get('database', 'example.db')}")
+
+        elif self.db_type == 'postgresql':
+            try:
+                import asyncpg
+            except ImportError:
+                print("❌ 请先安装异步驱动: pip install asyncpg")
+                raise
+            self.pool = await asyncpg.create_pool(
+                host=self.kwargs.get('host', 'localhost'),
+                user=self.kwargs.get('user', 'postgres'),
+                password=self.kwargs.get('password', ''),
+                database=self.kwargs.get('database', 'test'),
+                port=self.kwargs.get('port', 5432),
+                min_size=self.pool_min, max_size=self.pool_max
+            )
+            print("✅ 异步连接到PostgreSQL数据库")
+
+        else:
+            try:
+                import aiomysql
+            except ImportError:
+                print("❌ 请先安装异步驱动: pip install aiomysql")
+                raise
+            self.pool = await aiomysql.create_pool(
+                host=self.kwargs.get('host', 'localhost'),
+                user=self.kwargs.get('user', 'root'),
+                password=self.kwargs.get('password', ''),
+                db=self.kwargs.get('database', 'test'),
+                port=self.kwargs.get('port', 3306),
+                minsize=self.pool_min, maxsize=self.pool_max, autocommit=True
+            )
+            print("✅ 异步连接到MySQL数据库")
+
+        return self
+
+    async def _new_sqlite_connection(self):
+        """创建一个 aiosqlite 连接（计入连接池大小）"""
+        self._sqlite_size += 1
+        try:
+            conn = await self._aiosqlite.connect(self.kwargs.get('database', 'example.db'))
+        except Exception:
+            self._sqlite_size -= 1
+            raise
+        if not self._sqlite_connections:
+            # WAL 模式下读写互不阻塞，多个连接可以并发读取（设置后持久生效）
+            async with conn.execute('PRAGMA journal_mode=WAL'):
+                pass
+        self._sqlite_connections.append(conn)
+        return conn
+
+    async def _release_sqlite_connection(self, conn):
+        """归还连接：回滚未提交的隐式事务，避免连接继续持有写锁；回滚失败时关闭连接"""
+        try:
+            if conn.in_transaction:
+                await conn.rollback()
+        except Exception:
+            self._sqlite_connections.remove(conn)
+            self._sqlite_size -= 1
+            try:
+                await conn.close()
+            except Exception:
+                pass
+            return
+        self.pool.put_nowait(conn)
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    @asynccontextmanager
+    async def acquire(self):
+        """从连接池借用一个连接，返回 AsyncSession"""
+        if self.pool is None:
+            await self.open()
+
+        if self.db_type == 'sqlite':
+            if self.pool.empty() and self._sqlite_size < self.pool_max:
+                conn = await self._new_sqlite_connection()
+            else:
+                conn = await self.pool.get()
+            try:
+                yield AsyncSession(self.db_type, conn)
+            finally:
+                await self._release_sqlite_connection(conn)
+        else:
+            async with self.pool.acquire() as conn:
+                yield AsyncSession(self.db_type, conn)
+
+    @asynccontextmanager
+    async def transaction(self, immediate=False):
+        """事务：正常退出时提交，出现异常时回滚
+
+        SQLite 下 immediate=True 在开始时就获取写锁（BEGIN IMMEDIATE），
+        适合“先读后写”的事务，避免多个连接同时升级写锁时失败。
+        """
+        async with self.acquire() as session:
+            conn = session.conn
+            session.in_transaction = True
+            if self.db_type == 'postgresql':
+                async with conn.transaction():
+                    yield session
+                return
+
+            if self.db_type == 'mysql':
+                await conn.begin()
+            else:
+                await conn.execute('BEGIN IMMEDIATE' if immediate else 'BEGIN')
+            try:
+                yield session
+            except BaseException:
+                await conn.rollback()
+                raise
+            else:
+                await conn.commit()
+
+    async def execute(self, sql, params=()):
+        async with self.acquire() as session:
+            return await session.execute(sql, params)
+
+    async def executemany(self, sql, rows):
+        async with self.transaction() as session:
+            return await session.executemany(sql, rows)
+
+    async def fetchall(self, sql, params=()):
+        async with self.acquire() as session:
+            return await session.fetchall(sql, params)
+
+    async def fetchone(self, sql, params=()):
+        async with self.acquire() as session:
+            return await session.fetchone(sql, params)
+
+    @asynccontextmanager
+    async def iterate(self, sql, params=(), batch_size=1000):
+        """异步迭代查询结果（结果集分批读取，不占用大量内存）
+
+        返回的迭代器只在 async with 块内有效；退出时关闭游标并归还连接，
+        因此提前 break 也不会让连接一直被占用:
+            async with db.iterate('SELECT * FROM users') as rows:
+                async for row in rows:
+                    ...
+        """
+        async with self.acquire() as session:
+            rows = session.iterate(sql, params, batch_size)
+            try:
+                yield rows
+            finally:
+                await rows.aclose()
+
+    async def close(self):
+        """关闭连接池"""
+        if self.pool is None:
+            return
+        if self.db_type == 'sqlite':
+            for conn in self._sqlite_connections:
+                await conn.close()
+        elif self.db_type == 'postgresql':
+            await self.pool.close()
+        else:
+            self.pool.close()
+            await self.pool.wait_closed()
+        self.pool = None
+        print("🔌 异步数据库连接已关闭")
+
+
 def main():
     """主函数 - 演示数据库连接和操作"""
     print("🚀 Python数据库连接演示")
@@ -187,6 +1470,7 @@ def main():
     # 4. 查询数据
     print("\n4️⃣ 查询数据...")
     db.query_data()
+    db.profiler.print_report()
 
     # 5. 关闭连接
     print("\n5️⃣ 关闭数据库连接...")
@@ -3,15 +3,19 @@
 使用逻辑回归和决策树进行二分类任务
 """
 
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import pandas as pd
 from sklearn.datasets import make_classification
 from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LogisticRegression
+from sklearn.linear_model import LogisticRegression, SGDClassifier
 from sklearn.tree import DecisionTreeClassifier
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, confusion_matrix
+from sklearn.ensemble import HistGradientBoostingClassifier
 import matplotlib.pyplot as plt
 import seaborn as sns
+from plotting import PLOT_DIR, PlotWorker, decision_grid, finish_figure
 
 def create_classification_dataset():
     """创建二分类数据集"""
@@ -32,6 +36,93 @@ def create_classification_dataset():
 
     return df, X, y
 
+def _as_labels(values, name):
+    """把标签转换为 int64 数组；接受整数取值的浮点标签（如 [0., 1.]），其他取值报错"""
+    values = np.asarray(values)
+    if values.dtype.kind in 'biu':
+        return values.astype(np.int64, copy=False)
+    if values.dtype.kind != 'f':
+        raise ValueError(f"{name} 必须是 0..n_classes-1 的整数标签，实际类型为 {values.dtype}")
+    if not np.all(np.isfinite(values)) or np.any(values != np.round(values)):
+        raise ValueError(f"{name} 包含非整数标签，需先编码为 0..n_classes-1 的整数")
+    return values.astype(np.int64)
+
+def confusion_matrices(y_true, y_pred, n_classes=None):
+    """用一次 bincount 计算混淆矩阵
+
+    y_pred 可以是一维预测，也可以是多个模型的预测堆叠成的 (n_models, n_samples) 数组，
+    此时返回 (n_models, n_classes, n_classes)。标签需为 0..n_classes-1 的整数（默认至少按二分类），
+    超出范围时抛出 ValueError，避免计入其他模型的混淆矩阵。
+    """
+    y_true = _as_labels(y_true, 'y_true')
+    y_pred = _as_labels(y_pred, 'y_pred')
+    stacked = y_pred.ndim == 2
+    if y_true.ndim != 1 or y_pred.ndim not in (1, 2) or y_pred.shape[-1] != len(y_true):
+        raise ValueError(f"y_pred 形状 {y_pred.shape} 与 y_true 的样本数 {len(y_true)} 不一致")
+    y_pred = y_pred.reshape(-1, len(y_true))
+    if n_classes is None:
+        n_classes = max(int(max(y_true.max(initial=0), y_pred.max(initial=0))) + 1, 2)
+
+    low = min(y_true.min(initial=0), y_pred.min(initial=0))
+    high = max(y_true.max(initial=0), y_pred.max(initial=0))
+    if low < 0 or high >= n_classes:
+        raise ValueError(f"标签取值范围 [{low}, {high}] 超出 [0, {n_classes})")
+
+    # 每个 (模型, 真实标签, 预测标签) 组合对应一个桶
+    n_models = len(y_pred)
+    index = y_true * n_classes + y_pred
+    index += (np.arange(n_models, dtype=np.int64) * n_classes ** 2)[:, None]
+    cm = np.bincount(index.ravel(), minlength=n_models * n_classes ** 2)
+    cm = cm.reshape(n_models, n_classes, n_classes)
+    return cm if stacked else cm[0]
+
+def metrics_from_confusion(cm, pos_label=1):
+    """由混淆矩阵推导准确率、精确率、召回率、F1（与 sklearn 二分类默认口径一致，分母为0时记为0）
+
+    cm 可以带前导的模型维度，此时每个指标都是数组。
+    """
+    cm = np.asarray(cm)
+    tp = cm[..., pos_label, pos_label]
+    predicted_positive = cm[..., :, pos_label].sum(axis=-1)
+    actual_positive = cm[..., pos_label, :].sum(axis=-1)
+    correct = np.trace(cm, axis1=-2, axis2=-1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        accuracy = np.where(cm.sum(axis=(-2, -1)) > 0, correct / cm.sum(axis=(-2, -1)), 0.0)
+        precision = np.where(predicted_positive > 0, tp / predicted_positive, 0.0)
+        recall = np.where(actual_positive > 0, tp / actual_positive, 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+    return {'accuracy': accuracy, 'precision': precision, 'recall': recall, 'f1': f1, 'confusion_matrix': cm}
+
+def evaluate_predictions(y_true, y_pred, n_classes=None, pos_label=1):
+    """计算混淆矩阵并推导全部指标（y_pred 可为多个模型堆叠的预测）"""
+    return metrics_from_confusion(confusion_matrices(y_true, y_pred, n_classes), pos_label)
+
+class ConfusionMatrixAccumulator:
+    """分块累计混淆矩阵，适合流式评估；多个累计器（如不同进程的结果）可以合并"""
+
+    def __init__(self, n_classes=2, n_models=1):
+        self.n_classes = n_classes
+        self.matrix = np.zeros((n_models, n_classes, n_classes), dtype=np.int64)
+
+    def update(self, y_true, y_pred):
+        """y_pred 为一维预测或 (n_models, n_samples) 的堆叠预测"""
+        self.matrix += confusion_matrices(y_true, np.reshape(y_pred, (len(self.matrix), -1)), self.n_classes)
+        return self
+
+    def merge(self, other):
+        self.matrix += other.matrix
+        return self
+
+    def metrics(self, pos_label=1):
+        return metrics_from_confusion(self.matrix, pos_label)
+
+def print_metrics(metrics):
+    print(f"准确率: {metrics['accuracy']:.4f}")
+    print(f"精确率: {metrics['precision']:.4f}")
+    print(f"召回率: {metrics['recall']:.4f}")
+    print(f"F1分数: {metrics['f1']:.4f}")
+
 def train_logistic_regression(X_train, X_test, y_train, y_test):
     """训练逻辑回归模型"""
     print("=== 训练逻辑回归模型 ===")
@@ -44,20 +135,13 @@ def train_logistic_regression(X_train, X_test, y_train, y_test):
     y_pred = model.predict(X_test)
     y_pred_proba = model.predict_proba(X_test)[:, 1]  # 正类概率
 
-    # 评估模型
-    accuracy = accuracy_score(y_test, y_pred)
-    precision = precision_score(y_test, y_pred)
-    recall = recall_score(y_test, y_pred)
-    f1 = f1_score(y_test, y_pred)
-
-    print(f"准确率: {accuracy:.4f}")
-    print(f"精确率: {precision:.4f}")
-    print(f"召回率: {recall:.4f}")
-    print(f"F1分数: {f1:.4f}")
+    # 评估模型（一次计算混淆矩阵，推导全部指标）
+    metrics = evaluate_predictions(y_test, y_pred)
+    print_metrics(metrics)
     print(f"模型系数: {model.coef_[0]}")
     print(f"模型截距: {model.intercept_[0]:.4f}")
 
-    return model, y_pred, y_pred_proba
+    return model, y_pred, y_pred_proba, metrics
 
 def train_decision_tree(X_train, X_test, y_train, y_test):
     """训练决策树模型"""
@@ -71,24 +155,150 @@ def train_decision_tree(X_train, X_test, y_train, y_test):
     y_pred = model.predict(X_test)
     y_pred_proba = model.predict_proba(X_test)[:, 1]
 
-    # 评估模型
-    accuracy = accuracy_score(y_test, y_pred)
-    precision = precision_score(y_test, y_pred)
-    recall = recall_score(y_test, y_pred)
-    f1 = f1_score(y_test, y_pred)
-
-    print(f"准确率: {accuracy:.4f}")
-    print(f"精确率: {precision:.4f}")
-    print(f"召回率: {recall:.4f}")
-    print(f"F1分数: {f1:.4f}")
+    # 评估模型（一次计算混淆矩阵，推导全部指标）
+    metrics = evaluate_predictions(y_test, y_pred)
+    print_metrics(metrics)
     print(f"树的最大深度: {model.get_depth()}")
     print(f"叶子节点数量: {model.get_n_leaves()}")
 
-    return model, y_pred, y_pred_proba
-
-def plot_confusion_matrix(y_true, y_pred, title):
-    """绘制混淆矩阵"""
-    cm = confusion_matrix(y_true, y_pred)
+    return model, y_pred, y_pred_proba, metrics
+
+def stream_classification_batches(n_samples, batch_size=100_000, n_features=4, n_informative=3,
+                                  flip_y=0.01, random_state=42, sample_seed=0):
+    """分批生成二分类数据，内存占用只与 batch_size 有关
+
+    与 make_classification 类似：每个类别一个高斯聚类，其余特征是有信息特征的线性组合。
+    random_state 决定数据分布（类中心、协方差、冗余特征系数），sample_seed 决定抽样，
+    因此相同 random_state、不同 sample_seed 的两个数据流可以分别作为训练集和测试集。
+
+    Yields:
+        (X, y)，X 为 float32，y 为 int8
+    """
+    dist = np.random.default_rng(random_state)
+    centroids = dist.normal(scale=2.0, size=(2, n_informative))
+    mixing = dist.uniform(-1, 1, size=(2, n_informative, n_informative))
+    redundant = dist.uniform(-1, 1, size=(n_informative, n_features - n_informative))
+
+    rng = np.random.default_rng([random_state, sample_seed])
+    for start in range(0, n_samples, batch_size):
+        size = min(batch_size, n_samples - start)
+        y = rng.integers(0, 2, size, dtype=np.int8)
+        X = np.empty((size, n_features), dtype=np.float32)
+        z = rng.standard_normal((size, n_informative), dtype=np.float32)
+        for label in (0, 1):
+            mask = y == label
+            X[mask, :n_informative] = z[mask] @ mixing[label] + centroids[label]
+        X[:, n_informative:] = X[:, :n_informative] @ redundant
+
+        # 少量标签噪声
+        flip = rng.random(size) < flip_y
+        y[flip] = rng.integers(0, 2, flip.sum(), dtype=np.int8)
+        yield X, y
+
+def collect_batches(batches, n_samples, n_features=4):
+    """把数据流写入预先分配的数组（不做 concatenate，避免峰值内存翻倍）"""
+    X = np.empty((n_samples, n_features), dtype=np.float32)
+    y = np.empty(n_samples, dtype=np.int8)
+    offset = 0
+    for X_batch, y_batch in batches:
+        X[offset:offset + len(X_batch)] = X_batch
+        y[offset:offset + len(y_batch)] = y_batch
+        offset += len(X_batch)
+    return X[:offset], y[:offset]
+
+def _train_sgd(n_samples, batch_size, random_state, n_epochs=1):
+    """工作进程：SGD 逻辑回归（log loss）逐批 partial_fit，不需要把数据全部载入内存"""
+    start = time.perf_counter()
+    model = SGDClassifier(loss='log_loss', alpha=1e-5, random_state=random_state)
+    for epoch in range(n_epochs):
+        for X, y in stream_classification_batches(n_samples, batch_size, random_state=random_state,
+                                                  sample_seed=epoch):
+            model.partial_fit(X, y, classes=[0, 1])
+    return model, time.perf_counter() - start
+
+def _train_tree(n_samples, batch_size, random_state, tree='hist'):
+    """工作进程：树模型需要完整数据，逐批写入 float32 数组后训练
+
+    tree='hist' 使用直方图梯度提升树（特征先分箱成 uint8，适合大数据），
+    tree='exact' 使用与小数据流程相同的 DecisionTreeClassifier(max_depth=3)
+    """
+    start = time.perf_counter()
+    X, y = collect_batches(stream_classification_batches(n_samples, batch_size, random_state=random_state),
+                           n_samples)
+    if tree == 'hist':
+        model = HistGradientBoostingClassifier(max_iter=30, early_stopping=False, random_state=random_state)
+    else:
+        model = DecisionTreeClassifier(random_state=random_state, max_depth=3)
+    model.fit(X, y)
+    return model, time.perf_counter() - start
+
+def train_large_scale(n_samples=1_000_000, batch_size=100_000, tree='hist', n_jobs=2,
+                      random_state=42, test_samples=200_000):
+    """大数据训练模式：SGD 逻辑回归与树模型在不同进程中同时训练
+
+    每个工作进程自己生成（或读取）数据流，父进程和进程之间不传输训练数据。
+
+    Returns:
+        {模型名: {'model', 'fit_seconds', 'accuracy', 'precision', 'recall', 'f1', 'confusion_matrix'}}，
+        以及总耗时 wall_seconds
+    """
+    print(f"\n=== 大数据训练模式 ({n_samples:,} 行, 批大小 {batch_size:,}) ===")
+    start = time.perf_counter()
+    jobs = {
+        'SGD逻辑回归': (_train_sgd, (n_samples, batch_size, random_state)),
+        '直方图梯度提升树' if tree == 'hist' else '决策树': (_train_tree, (n_samples, batch_size, random_state, tree)),
+    }
+    with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+        futures = {name: executor.submit(func, *args) for name, (func, args) in jobs.items()}
+        trained = {name: future.result() for name, future in futures.items()}
+    wall_seconds = time.perf_counter() - start
+
+    # 测试集与训练集同分布、不同抽样；分块评估，每块把所有模型的预测堆叠后一次计算混淆矩阵
+    accumulator = ConfusionMatrixAccumulator(n_models=len(trained))
+    for X_test, y_test in stream_classification_batches(test_samples, batch_size, random_state=random_state,
+                                                        sample_seed=10_000):
+        accumulator.update(y_test, np.stack([model.predict(X_test) for model, _ in trained.values()]))
+    metrics = accumulator.metrics()
+
+    results = {}
+    for i, (name, (model, fit_seconds)) in enumerate(trained.items()):
+        results[name] = {'model': model, 'fit_seconds': fit_seconds,
+                         **{key: value[i] for key, value in metrics.items()}}
+        print(f"{name}: 训练 {fit_seconds:.2f} 秒, 准确率 {metrics['accuracy'][i]:.4f}, F1分数 {metrics['f1'][i]:.4f}")
+    print(f"并行训练总耗时: {wall_seconds:.2f} 秒")
+    return results, wall_seconds
+
+def benchmark_large_scale(sizes=(1_000_000, 10_000_000), batch_size=100_000, random_state=42,
+                          test_samples=200_000):
+    """对比原始流程（全部数据载入内存，依次训练 LogisticRegression 和决策树）与大数据训练模式"""
+    X_test, y_test = collect_batches(
+        stream_classification_batches(test_samples, batch_size, random_state=random_state, sample_seed=10_000),
+        test_samples)
+
+    for n_samples in sizes:
+        # 原始流程：float64 全量数据，顺序训练
+        print(f"\n=== 原始流程 ({n_samples:,} 行) ===")
+        start = time.perf_counter()
+        X, y = collect_batches(stream_classification_batches(n_samples, batch_size, random_state=random_state),
+                               n_samples)
+        X = X.astype(np.float64)
+        for name, model in (('逻辑回归', LogisticRegression(random_state=random_state, max_iter=1000)),
+                            ('决策树', DecisionTreeClassifier(random_state=random_state, max_depth=3))):
+            fit_start = time.perf_counter()
+            model.fit(X, y)
+            fit_seconds = time.perf_counter() - fit_start
+            metrics = evaluate_predictions(y_test, model.predict(X_test))
+            print(f"{name}: 训练 {fit_seconds:.2f} 秒, 准确率 {metrics['accuracy']:.4f}, F1分数 {metrics['f1']:.4f}")
+        baseline_seconds = time.perf_counter() - start
+        del X, y
+        print(f"顺序训练总耗时: {baseline_seconds:.2f} 秒")
+
+        results, wall_seconds = train_large_scale(n_samples, batch_size, random_state=random_state,
+                                                  test_samples=test_samples)
+        print(f"加速 {baseline_seconds / wall_seconds:.1f}x")
+
+def plot_confusion_matrix(cm, title):
+    """绘制混淆矩阵（cm 由 confusion_matrices 计算）"""
     plt.figure(figsize=(6, 5))
     sns.heatmap(cm, annot=True, fmt='d', cmap='Blues',
                 xticklabels=['预测负类', '预测正类'],
@@ -96,7 +306,7 @@ def plot_confusion_matrix(y_true, y_pred, title):
     plt.title(f'{title} - 混淆矩阵')
     plt.ylabel('实际标签')
     plt.xlabel('预测标签')
-    plt.show()
+    return finish_figure(f'{title}_混淆矩阵')
 
 def plot_feature_importance(model, feature_names, title):
     """绘制特征重要性"""
@@ -109,18 +319,15 @@ def plot_feature_importance(model, feature_names, title):
         plt.xlabel('特征')
         plt.ylabel('重要性')
         plt.tight_layout()
-        plt.show()
+        return finish_figure(f'{title}_特征重要性')
 
-def plot_decision_boundary(X, y, model, title):
-    """绘制决策边界（仅适用于2D特征）"""
+def plot_decision_boundary(X, y, model, title, max_points=40_000):
+    """绘制决策边界（仅适用于2D特征），网格点数不超过 max_points"""
     if X.shape[1] != 2:
         return
 
-    # 创建网格
-    x_min, x_max = X[:, 0].min() - 1, X[:, 0].max() + 1
-    y_min, y_max = X[:, 1].min() - 1, X[:, 1].max() + 1
-    xx, yy = np.meshgrid(np.arange(x_min, x_max, 0.1),
-                         np.arange(y_min, y_max, 0.1))
+    # 创建网格（分辨率随数据范围自适应）
+    xx, yy = decision_grid(X, max_points)
 
     # 预测网格点
     Z = model.predict(np.c_[xx.ravel(), yy.ravel()])
@@ -133,9 +340,10 @@ def plot_decision_boundary(X, y, model, title):
     plt.title(f'{title} - 决策边界')
     plt.xlabel('特征1')
     plt.ylabel('特征2')
-    plt.show()
+    return finish_figure(f'{title}_决策边界')
 
-def main():
+def main(benchmark=False):
+    """benchmark=True 时额外运行大数据训练模式的性能对比（耗时较长）"""
     print("=== 机器学习分类算法示例 ===\n")
 
     # 创建数据集
@@ -155,42 +363,49 @@ def main():
     print(f"测试集大小: {len(X_test)}")
 
     # 训练逻辑回归模型
-    lr_model, lr_pred, lr_proba = train_logistic_regression(X_train, X_test, y_train, y_test)
+    lr_model, lr_pred, lr_proba, lr_metrics = train_logistic_regression(X_train, X_test, y_train, y_test)
 
     # 训练决策树模型
-    dt_model, dt_pred, dt_proba = train_decision_tree(X_train, X_test, y_train, y_test)
+    dt_model, dt_pred, dt_proba, dt_metrics = train_decision_tree(X_train, X_test, y_train, y_test)
 
-    # 可视化结果
-    feature_names = [f'特征{i+1}' for i in range(X.shape[1])]
+    # 可视化结果：设置 ML_PLOT_DIR 时在后台进程中绘制并保存，主进程继续后面的计算
+    with PlotWorker(PLOT_DIR) as plots:
+        feature_names = [f'特征{i+1}' for i in range(X.shape[1])]
 
-    # 绘制混淆矩阵
-    plot_confusion_matrix(y_test, lr_pred, "逻辑回归")
-    plot_confusion_matrix(y_test, dt_pred, "决策树")
+        # 绘制混淆矩阵
+        plots.submit(plot_confusion_matrix, lr_metrics['confusion_matrix'], "逻辑回归")
+        plots.submit(plot_confusion_matrix, dt_metrics['confusion_matrix'], "决策树")
 
-    # 绘制特征重要性（仅决策树）
-    plot_feature_importance(dt_model, feature_names, "决策树")
+        # 绘制特征重要性（仅决策树）
+        plots.submit(plot_feature_importance, dt_model, feature_names, "决策树")
 
-    # 如果是2D数据，绘制决策边界
-    if X.shape[1] == 2:
-        plot_decision_boundary(X_test, y_test, lr_model, "逻辑回归")
-        plot_decision_boundary(X_test, y_test, dt_model, "决策树")
+        # 如果是2D数据，绘制决策边界
+        if X.shape[1] == 2:
+            plots.submit(plot_decision_boundary, X_test, y_test, lr_model, "逻辑回归")
+            plots.submit(plot_decision_boundary, X_test, y_test, dt_model, "决策树")
 
-    print("\n=== 模型比较 ===")
-    models = {
-        '逻辑回归': lr_pred,
-        '决策树': dt_pred
-    }
+        print("\n=== 模型比较 ===")
+        models = {
+            '逻辑回归': lr_metrics,
+            '决策树': dt_metrics
+        }
+
+        for name, metrics in models.items():
+            print(f"{name} - 准确率: {metrics['accuracy']:.4f}, F1分数: {metrics['f1']:.4f}")
+
+        if benchmark:
+            # 大数据训练模式（可传入 sizes=(1_000_000, 10_000_000) 做完整对比）
+            benchmark_large_scale(sizes=(1_000_000,))
 
-    for name, pred in models.items():
-        acc = accuracy_score(y_test, pred)
-        f1 = f1_score(y_test, pred)
-        print(f"{name} - 准确率: {acc:.4f}, F1分数: {f1:.4f}")
     print("\n=== 分类算法学习完成 ===")
     print("主要概念:")
     print("- 逻辑回归: 适用于线性可分的二分类问题")
     print("- 决策树: 易解释，可处理非线性关系")
     print("- 评估指标: 准确率、精确率、召回率、F1分数")
     print("- 混淆矩阵: 显示分类结果的详细信息")
+    print("- 大数据: SGD 增量学习、直方图梯度提升树、多进程并行训练")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description='机器学习分类算法示例')
+    parser.add_argument('--benchmark', action='store_true', help='运行大数据训练模式的性能对比')
+    main(parser.parse_args().benchmark)
@@ -3,35 +3,47 @@
 演示数据清洗、特征工程和标准化等预处理技术
 """
 
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import tempfile
+import time
+import tracemalloc
 import numpy as np
 import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
 from sklearn.preprocessing import StandardScaler, MinMaxScaler, LabelEncoder
 from sklearn.impute import SimpleImputer
 from sklearn.model_selection import train_test_split
+from sklearn.utils.validation import check_is_fitted
 import matplotlib.pyplot as plt
 import seaborn as sns
+from plotting import PLOT_DIR, PlotWorker, finish_figure
 
-def create_sample_dataset():
+def create_sample_dataset(n_samples=100, seed=42):
     """创建包含缺失值和异常值的示例数据集"""
-    np.random.seed(42)
+    np.random.seed(seed)
 
     # 创建基础数据
     data = {
-        'age': np.random.normal(35, 10, 100),
-        'income': np.random.normal(50000, 15000, 100),
-        'education': np.random.choice(['高中', '本科', '硕士', '博士'], 100),
-        'experience': np.random.normal(10, 5, 100),
-        'city': np.random.choice(['北京', '上海', '广州', '深圳'], 100)
+        'age': np.random.normal(35, 10, n_samples),
+        'income': np.random.normal(50000, 15000, n_samples),
+        'education': np.random.choice(['高中', '本科', '硕士', '博士'], n_samples),
+        'experience': np.random.normal(10, 5, n_samples),
+        'city': np.random.choice(['北京', '上海', '广州', '深圳'], n_samples)
     }
 
     df = pd.DataFrame(data)
 
     # 添加缺失值
-    mask = np.random.random(100) < 0.1  # 10%的缺失率
+    mask = np.random.random(n_samples) < 0.1  # 10%的缺失率
     df.loc[mask, 'income'] = np.nan
 
     # 添加异常值
-    outlier_indices = np.random.choice(100, 5, replace=False)
+    outlier_indices = np.random.choice(n_samples, max(n_samples // 20, 1), replace=False)
     df.loc[outlier_indices, 'income'] = df.loc[outlier_indices, 'income'] * 10
 
     return df
@@ -77,13 +89,12 @@ def encode_categorical_features(df):
     """编码分类特征"""
     print("\n=== 编码分类特征 ===")
 
-    # 标签编码
-    le = LabelEncoder()
-    df['education_encoded'] = le.fit_transform(df['education'])
-    df['city_encoded'] = le.fit_transform(df['city'])
+    # 标签编码（每列一个编码器，各拟合一次）
+    le_education = LabelEncoder()
+    df['education_encoded'] = le_education.fit_transform(df['education'])
 
     print("教育水平编码映射:")
-    for i, label in enumerate(le.classes_):
+    for i, label in enumerate(le_education.classes_):
         print(f"  {label} -> {i}")
 
     print("\n城市编码映射:")
@@ -95,29 +106,408 @@ def encode_categorical_features(df):
     return df
 
 def scale_numerical_features(df):
-    """标准化数值特征"""
+    """标准化数值特征，返回只包含数值列的 (标准化结果, 归一化结果)"""
     print("\n=== 标准化数值特征 ===")
 
     numerical_cols = ['age', 'income_filled', 'experience']
 
+    # 只取出数值列转换一次（float32），不复制整张表
+    values = df[numerical_cols].to_numpy(dtype=np.float32)
+
     # 标准化 (Z-score)
     scaler = StandardScaler()
-    df_scaled = df.copy()
-    df_scaled[numerical_cols] = scaler.fit_transform(df[numerical_cols])
+    df_scaled = pd.DataFrame(scaler.fit_transform(values), columns=numerical_cols, index=df.index)
 
     print("标准化后的统计信息:")
     print(df_scaled[numerical_cols].describe().round(3))
 
     # 归一化 (Min-Max)
     minmax_scaler = MinMaxScaler()
-    df_normalized = df.copy()
-    df_normalized[numerical_cols] = minmax_scaler.fit_transform(df[numerical_cols])
+    df_normalized = pd.DataFrame(minmax_scaler.fit_transform(values), columns=numerical_cols, index=df.index)
 
     print("\n归一化后的统计信息:")
     print(df_normalized[numerical_cols].describe().round(3))
 
     return df_scaled, df_normalized
 
+class QuantileSketch:
+    """可合并的流式分位数草图（KLL 风格）
+
+    数据按层保存，第 h 层每个值代表 2^h 个原始值；某层超过 k 个值时排序后隔一个取一个
+    提升到上一层。内存约为 O(k·log(n/k))，数据量不超过 k 时结果是精确的。
+    """
+
+    def __init__(self, k=2048, seed=0):
+        self.k = k
+        self.count = 0
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        self.count += values.size
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+
+    def merge(self, other):
+        """合并另一个草图（例如并行处理的其他分块）"""
+        for h, level in enumerate(other.levels):
+            if h == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[h] = np.concatenate([self.levels[h], level])
+        self.count += other.count
+        self._compress()
+
+    def _compress(self):
+        h = 0
+        while h < len(self.levels):
+            if self.levels[h].size > self.k:
+                level = np.sort(self.levels[h])
+                # 奇数个值时留一个在本层，保证总权重不变
+                keep, level = level[:level.size % 2], level[level.size % 2:]
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], level[self._rng.integers(2)::2]])
+                self.levels[h] = keep
+            h += 1
+
+    def weighted_values(self):
+        """返回 (值, 权重)"""
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(level.size, 2.0 ** h) for h, level in enumerate(self.levels)])
+        return values, weights
+
+    def quantile(self, q):
+        if self.count == 0:
+            return np.full(np.shape(q), np.nan)
+        if len(self.levels) == 1:
+            return np.quantile(self.levels[0], q)
+        values, weights = self.weighted_values()
+        order = np.argsort(values)
+        values, cumulative = values[order], np.cumsum(weights[order])
+        index = np.searchsorted(cumulative, np.asarray(q) * cumulative[-1])
+        return values[np.minimum(index, values.size - 1)]
+
+def _apply_params(values, params):
+    """原地对 float32 数值矩阵做填充、截断和缩放（params 格式见 StreamingPreprocessor.finalize）"""
+    dtype = values.dtype
+    np.copyto(values, np.asarray(params['median'], dtype=dtype), where=np.isnan(values))
+    np.clip(values, np.asarray(params['lower'], dtype=dtype), np.asarray(params['upper'], dtype=dtype), out=values)
+    values -= np.asarray(params['center'], dtype=dtype)
+    values /= np.asarray(params['scale'], dtype=dtype)
+    return values
+
+class StreamingPreprocessor:
+    """分块拟合、分块转换的预处理流水线
+
+    一次遍历所有分块即可得到全部统计量：
+    - 分位数草图 -> 中位数填充值、IQR 异常值边界
+    - Welford 均值/方差 -> StandardScaler（截断异常值时由草图估计，缺失值填充的影响精确合并）
+    - 最小/最大值 -> MinMaxScaler
+    - 类别词表 -> 标签编码（按字典序，与 LabelEncoder 一致；未见过的类别编码为 -1）
+
+    拟合后的参数可以保存为 JSON，在其他进程中加载后直接转换。
+    """
+
+    def __init__(self, numerical_cols, categorical_cols=(), scaling='standard',
+                 clip_outliers=True, iqr_factor=1.5, sketch_k=2048):
+        if scaling not in ('standard', 'minmax', None):
+            raise ValueError(f"不支持的缩放方式: {scaling}")
+        self.numerical_cols = list(numerical_cols)
+        self.categorical_cols = list(categorical_cols)
+        self.scaling = scaling
+        self.clip_outliers = clip_outliers
+        self.iqr_factor = iqr_factor
+        self.sketch_k = sketch_k
+        self.params_ = None
+        self._reset()
+
+    def _reset(self):
+        n = len(self.numerical_cols)
+        self._count = np.zeros(n)
+        self._mean = np.zeros(n)
+        self._m2 = np.zeros(n)
+        self._missing = np.zeros(n)
+        self._min = np.full(n, np.inf)
+        self._max = np.full(n, -np.inf)
+        self._sketches = [QuantileSketch(self.sketch_k) for _ in self.numerical_cols]
+        self._vocab = {col: set() for col in self.categorical_cols}
+
+    def partial_fit(self, chunk):
+        """用一个分块更新统计量"""
+        values = chunk[self.numerical_cols].to_numpy(dtype=np.float64)
+        observed = ~np.isnan(values)
+        count = observed.sum(axis=0)
+        self._missing += len(values) - count
+
+        # Chan 并行合并公式：把分块的均值/方差合并到累计值
+        with np.errstate(invalid='ignore', divide='ignore'):
+            chunk_mean = np.where(count > 0, np.nansum(values, axis=0) / count, 0.0)
+            chunk_m2 = np.nansum((values - chunk_mean) ** 2, axis=0)
+            total = self._count + count
+            delta = chunk_mean - self._mean
+            self._mean = np.where(total > 0, self._mean + delta * count / total, 0.0)
+            self._m2 = np.where(total > 0, self._m2 + chunk_m2 + delta ** 2 * self._count * count / total, 0.0)
+        self._count = total
+
+        if count.any():
+            self._min = np.fmin(self._min, np.nanmin(np.where(observed, values, np.inf), axis=0))
+            self._max = np.fmax(self._max, np.nanmax(np.where(observed, values, -np.inf), axis=0))
+        for i, sketch in enumerate(self._sketches):
+            sketch.update(values[:, i])
+
+        for col in self.categorical_cols:
+            self._vocab[col].update(chunk[col].dropna().unique().tolist())
+        return self
+
+    def fit(self, chunks):
+        """一次遍历所有分块拟合"""
+        self._reset()
+        for chunk in chunks:
+            self.partial_fit(chunk)
+        return self.finalize()
+
+    def finalize(self):
+        """由累计统计量计算填充值、异常值边界和缩放参数"""
+        params = {'median': [], 'lower': [], 'upper': [], 'center': [], 'scale': []}
+        for i, sketch in enumerate(self._sketches):
+            q1, median, q3 = sketch.quantile([0.25, 0.5, 0.75])
+            if self.clip_outliers:
+                iqr = q3 - q1
+                lower, upper = q1 - self.iqr_factor * iqr, q3 + self.iqr_factor * iqr
+            else:
+                lower, upper = -np.inf, np.inf
+
+            n = self._count[i]
+            if self.clip_outliers and sketch.count:
+                # 截断后的分布有界，用草图中的加权样本估计均值和方差
+                values, weights = sketch.weighted_values()
+                clipped = np.clip(values, lower, upper)
+                mean = np.average(clipped, weights=weights)
+                var = np.average((clipped - mean) ** 2, weights=weights)
+            else:
+                mean = self._mean[i]
+                var = self._m2[i] / n if n else 0.0
+
+            # 缺失值用中位数填充：把 missing 个中位数合并进均值和方差
+            missing = self._missing[i]
+            total = n + missing
+            if total:
+                filled_mean = (n * mean + missing * median) / total
+                var = (n * (var + (mean - filled_mean) ** 2) + missing * (median - filled_mean) ** 2) / total
+                mean = filled_mean
+
+            if self.scaling == 'standard':
+                center, scale = mean, np.sqrt(var)
+            elif self.scaling == 'minmax':
+                low, high = np.clip([self._min[i], self._max[i]], lower, upper)
+                if missing:
+                    low, high = min(low, median), max(high, median)
+                center, scale = low, high - low
+            else:
+                center, scale = 0.0, 1.0
+
+            for key, value in zip(params, (median, lower, upper, center, scale if scale > 0 else 1.0)):
+                params[key].append(float(value))
+
+        params['vocab'] = {col: sorted(self._vocab[col]) for col in self.categorical_cols}
+        self.params_ = params
+        return self
+
+    def transform(self, chunk):
+        """转换一个分块，返回 float32 数值特征和 int32 类别编码"""
+        if self.params_ is None:
+            raise RuntimeError("请先调用 fit / finalize")
+        values = _apply_params(chunk[self.numerical_cols].to_numpy(dtype=np.float32, copy=True), self.params_)
+
+        result = pd.DataFrame(values, columns=self.numerical_cols, index=chunk.index)
+        for col in self.categorical_cols:
+            codes = pd.Categorical(chunk[col], categories=self.params_['vocab'][col]).codes
+            result[f'{col}_encoded'] = codes.astype(np.int32)
+        return result
+
+    def transform_chunks(self, chunks):
+        for chunk in chunks:
+            yield self.transform(chunk)
+
+    def to_dict(self):
+        return {
+            'numerical_cols': self.numerical_cols,
+            'categorical_cols': self.categorical_cols,
+            'scaling': self.scaling,
+            'clip_outliers': self.clip_outliers,
+            'iqr_factor': self.iqr_factor,
+            'params': self.params_,
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        preprocessor = cls(state['numerical_cols'], state['categorical_cols'], state['scaling'],
+                           state['clip_outliers'], state['iqr_factor'])
+        preprocessor.params_ = state['params']
+        return preprocessor
+
+    def save(self, path):
+        """保存拟合后的参数（JSON）"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+class TabularPreprocessor(BaseEstimator, TransformerMixin):
+    """内存中数据的一体化预处理器（sklearn 转换器接口，可放入 Pipeline）
+
+    等价于 中位数填充 -> IQR 截断 -> 标准化/归一化 -> 标签编码 的组合，但是：
+    - 所有特征写入同一个预先分配的 float32 矩阵（按列存储），之后的步骤都在原地完成
+    - fit_transform 每列只遍历一次：分位数、填充、截断、缩放统计量依次在同一块内存上计算
+    - 类别列用 pd.factorize(sort=True) 编码一次，顺序与 LabelEncoder 一致；未见过的类别编码为 -1
+    - params_ 的格式与 StreamingPreprocessor 相同，分位数基于填充前的观测值
+    """
+
+    def __init__(self, numerical_cols, categorical_cols=(), scaling='standard',
+                 clip_outliers=True, iqr_factor=1.5):
+        self.numerical_cols = numerical_cols
+        self.categorical_cols = categorical_cols
+        self.scaling = scaling
+        self.clip_outliers = clip_outliers
+        self.iqr_factor = iqr_factor
+
+    def _allocate(self, X):
+        """分配输出矩阵，并把数值列直接转换写入（数据的唯一一次复制）"""
+        numerical_cols, categorical_cols = list(self.numerical_cols), list(self.categorical_cols)
+        out = np.empty((len(X), len(numerical_cols) + len(categorical_cols)), dtype=np.float32, order='F')
+        for j, col in enumerate(numerical_cols):
+            out[:, j] = X[col].to_numpy(dtype=np.float32, na_value=np.nan)
+        return out, len(numerical_cols)
+
+    def fit(self, X, y=None):
+        self.fit_transform(X)
+        return self
+
+    def fit_transform(self, X, y=None):
+        if self.scaling not in ('standard', 'minmax', None):
+            raise ValueError(f"不支持的缩放方式: {self.scaling}")
+        out, n_num = self._allocate(X)
+        params = {'median': [], 'lower': [], 'upper': [], 'center': [], 'scale': []}
+
+        for j in range(n_num):
+            column = out[:, j]
+            q1, median, q3 = np.nanpercentile(column, [25, 50, 75])
+            column[np.isnan(column)] = median
+            if self.clip_outliers:
+                iqr = q3 - q1
+                lower, upper = q1 - self.iqr_factor * iqr, q3 + self.iqr_factor * iqr
+                np.clip(column, lower, upper, out=column)
+            else:
+                lower, upper = -np.inf, np.inf
+
+            if self.scaling == 'standard':
+                center = column.mean(dtype=np.float64)
+                scale = column.std(dtype=np.float64)
+            elif self.scaling == 'minmax':
+                center = column.min()
+                scale = column.max() - center
+            else:
+                center, scale = 0.0, 1.0
+            scale = scale if scale > 0 else 1.0
+            column -= np.float32(center)
+            column /= np.float32(scale)
+
+            for key, value in zip(params, (median, lower, upper, center, scale)):
+                params[key].append(float(value))
+
+        params['vocab'] = {}
+        for k, col in enumerate(self.categorical_cols):
+            codes, categories = pd.factorize(X[col], sort=True)
+            out[:, n_num + k] = codes
+            params['vocab'][col] = categories.tolist()
+
+        self.params_ = params
+        self.n_features_in_ = n_num + len(self.categorical_cols)
+        return out
+
+    def transform(self, X):
+        """用拟合好的参数转换新数据，返回 float32 矩阵"""
+        check_is_fitted(self, 'params_')
+        out, n_num = self._allocate(X)
+        _apply_params(out[:, :n_num], self.params_)
+        for k, col in enumerate(self.categorical_cols):
+            out[:, n_num + k] = pd.Categorical(X[col], categories=self.params_['vocab'][col]).codes
+        return out
+
+    def get_feature_names_out(self, input_features=None):
+        return np.array(list(self.numerical_cols) + [f'{col}_encoded' for col in self.categorical_cols], dtype=object)
+
+def legacy_preprocessing(df):
+    """逐步预处理的原始流程（用于对比）"""
+    df = handle_missing_values(df)
+    df = handle_outliers(df, 'income_filled')
+    df = encode_categorical_features(df)
+    return scale_numerical_features(df)
+
+def benchmark_preprocessing(n_samples=10_000_000):
+    """对比逐步预处理与 TabularPreprocessor 的耗时和峰值内存（tracemalloc 统计）"""
+    print(f"\n=== 预处理性能对比 ({n_samples:,} 行) ===")
+    df = create_sample_dataset(n_samples)
+
+    def measure(func):
+        gc.collect()
+        tracemalloc.start()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            func()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return elapsed, peak / 2**20
+
+    # 原始流程会往输入表里添加列，用副本测试
+    legacy_input = df.copy()
+    legacy_time, legacy_peak = measure(lambda: legacy_preprocessing(legacy_input))
+    del legacy_input
+
+    preprocessor = TabularPreprocessor(['age', 'income', 'experience'], ['education', 'city'])
+    fused_time, fused_peak = measure(lambda: preprocessor.fit_transform(df))
+
+    print(f"逐步预处理:          {legacy_time:.2f} 秒, 峰值内存 {legacy_peak:,.0f} MB")
+    print(f"TabularPreprocessor: {fused_time:.2f} 秒, 峰值内存 {fused_peak:,.0f} MB")
+    print(f"加速 {legacy_time / fused_time:.1f}x, 内存减少 {1 - fused_peak / legacy_peak:.0%}")
+
+def streaming_preprocessing_demo(n_chunks=20, chunksize=50000):
+    """流式预处理演示：分块写入大CSV，一次遍历拟合，再分块转换（文件写在临时目录中，结束后删除）"""
+    print("\n=== 流式预处理（分块拟合与转换） ===")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'preprocessing_sample.csv')
+        params_path = os.path.join(workdir, 'preprocessing_params.json')
+
+        # 分块生成数据，不在内存中构造完整数据集
+        for i in range(n_chunks):
+            chunk = create_sample_dataset(chunksize, seed=i)
+            chunk.to_csv(path, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+
+        numerical_cols = ['age', 'income', 'experience']
+        preprocessor = StreamingPreprocessor(numerical_cols, ['education', 'city'], scaling='standard')
+        preprocessor.fit(pd.read_csv(path, chunksize=chunksize))
+
+        params = preprocessor.params_
+        for i, col in enumerate(numerical_cols):
+            print(f"{col}: 中位数 {params['median'][i]:.2f}, 边界 [{params['lower'][i]:.2f}, {params['upper'][i]:.2f}], "
+                  f"均值 {params['center'][i]:.2f}, 标准差 {params['scale'][i]:.2f}")
+
+        # 拟合结果可以保存后在其他进程中复用
+        preprocessor.save(params_path)
+        preprocessor = StreamingPreprocessor.load(params_path)
+
+        rows = 0
+        for transformed in preprocessor.transform_chunks(pd.read_csv(path, chunksize=chunksize)):
+            rows += len(transformed)
+        print(f"分块转换完成: {rows} 行, 示例:\n{transformed.head()}")
+
 def visualize_data(df):
     """可视化数据分布"""
     fig, axes = plt.subplots(2, 2, figsize=(12, 10))
@@ -150,9 +540,10 @@ def visualize_data(df):
     axes[1, 1].tick_params(axis='x', rotation=45)
 
     plt.tight_layout()
-    plt.show()
+    return finish_figure('数据分布')
 
-def main():
+def main(benchmark=False):
+    """benchmark=True 时额外运行流式预处理演示和大数据性能对比（耗时较长）"""
     print("=== 机器学习数据预处理示例 ===\n")
 
     # 创建数据集
@@ -174,8 +565,22 @@ def main():
     # 标准化数值特征
     df_scaled, df_normalized = scale_numerical_features(df)
 
-    # 可视化
-    visualize_data(df)
+    # 一体化预处理器：一次拟合得到全部参数，输出 float32 特征矩阵
+    preprocessor = TabularPreprocessor(['age', 'income', 'experience'], ['education', 'city'])
+    features = preprocessor.fit_transform(df)
+    print(f"\nTabularPreprocessor 输出: {features.shape}, {features.dtype}, "
+          f"特征 {list(preprocessor.get_feature_names_out())}")
+
+    # 可视化（设置 ML_PLOT_DIR 时在后台进程中绘制并保存，主进程继续后面的计算）
+    with PlotWorker(PLOT_DIR) as plots:
+        plots.submit(visualize_data, df)
+
+        if benchmark:
+            # 流式预处理（适合无法一次载入内存的大表）
+            streaming_preprocessing_demo()
+
+            # 性能对比（数据量可调大到 10_000_000）
+            benchmark_preprocessing(1_000_000)
 
     print("\n=== 数据预处理完成 ===")
     print(f"最终数据集形状: {df.shape}")
@@ -184,4 +589,6 @@ def main():
     print(f"分类特征: {['education', 'city']}")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description='机器学习数据预处理示例')
+    parser.add_argument('--benchmark', action='store_true', help='运行流式预处理演示和大数据性能对比')
+    main(parser.parse_args().benchmark)
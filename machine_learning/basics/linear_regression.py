@@ -3,11 +3,20 @@
 使用scikit-learn实现简单的线性回归
 """
 
+import argparse
+import gc
+import time
+import tracemalloc
+import warnings
 import numpy as np
 import matplotlib.pyplot as plt
+from sklearn.base import BaseEstimator, RegressorMixin
+from sklearn.exceptions import ConvergenceWarning
 from sklearn.linear_model import LinearRegression
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error, r2_score
+from sklearn.utils.validation import check_is_fitted
+from plotting import PLOT_DIR, PlotWorker, finish_figure
 
 def create_sample_data():
     """创建示例数据集"""
@@ -42,6 +51,265 @@ def train_linear_regression(X, y):
 
     return model, X_test, y_test, y_pred
 
+class StreamingLinearRegression(BaseEstimator, RegressorMixin):
+    """分块流式训练的线性回归（最小二乘 / 岭回归）
+
+    - solver='normal'：一次遍历数据，逐块累计中心化的 XᵀX 和 Xᵀy（Chan 合并公式，数值稳定），
+      最后解 (XᵀX + alpha·I) w = Xᵀy。内存只与特征数的平方和分块大小有关，与样本数无关。
+    - solver='sgd'：特征数很多时 XᵀX 放不进内存，改用小批量梯度下降（Adam 步长，按 sgd_batch_size
+      切分数据块，特征按运行均值中心化）。fit 最多遍历 n_epochs 次，每轮打乱顺序，
+      损失连续两轮相对下降小于 tol 时提前停止；达到 n_epochs 仍未收敛时发出 ConvergenceWarning。
+    - solver='auto'：特征数不超过 max_normal_features 时用 'normal'，否则用 'sgd'。
+
+    支持多目标输出（y 为二维）；输入按 dtype（默认 float32）转换，累计量使用 float64。
+    alpha 与 sklearn Ridge 的含义相同，alpha=0 时与 LinearRegression 一致。
+    """
+
+    def __init__(self, alpha=0.0, fit_intercept=True, solver='auto', max_normal_features=4096,
+                 dtype=np.float32, batch_size=100_000, learning_rate=0.01, n_epochs=50, tol=1e-4,
+                 sgd_batch_size=256, random_state=0):
+        self.alpha = alpha
+        self.fit_intercept = fit_intercept
+        self.solver = solver
+        self.max_normal_features = max_normal_features
+        self.dtype = dtype
+        self.batch_size = batch_size
+        self.learning_rate = learning_rate
+        self.n_epochs = n_epochs
+        self.tol = tol
+        self.sgd_batch_size = sgd_batch_size
+        self.random_state = random_state
+
+    def _resolve_solver(self, n_features):
+        if self.solver not in ('auto', 'normal', 'sgd'):
+            raise ValueError(f"不支持的求解器: {self.solver}")
+        if self.solver == 'auto':
+            return 'normal' if n_features <= self.max_normal_features else 'sgd'
+        return self.solver
+
+    def _reset(self, n_features, n_targets):
+        self.solver_ = self._resolve_solver(n_features)
+        self.n_features_in_ = n_features
+        self.n_samples_seen_ = 0
+        self.x_mean_ = np.zeros(n_features)
+        self.y_mean_ = np.zeros(n_targets)
+        if self.solver_ == 'normal':
+            self.xtx_ = np.zeros((n_features, n_features))
+            self.xty_ = np.zeros((n_features, n_targets))
+        else:
+            self._weights = np.zeros((n_features, n_targets), dtype=self.dtype)
+            self._moments = [np.zeros_like(self._weights), np.zeros_like(self._weights)]
+            self._step = 0
+            self._epoch_loss = [0.0, 0]  # 本轮的损失总和、样本数
+
+    def partial_fit(self, X, y):
+        """用一个数据块更新累计量（normal）或做一轮小批量梯度下降（sgd），并更新系数"""
+        self._accumulate(X, y)
+        self._finalize()
+        return self
+
+    def _accumulate(self, X, y):
+        X = np.asarray(X, dtype=self.dtype)
+        y = np.asarray(y, dtype=self.dtype)
+        self._single_target = y.ndim == 1
+        y = y.reshape(len(y), -1)
+        if not hasattr(self, 'solver_'):
+            self._reset(X.shape[1], y.shape[1])
+
+        n_seen, n_chunk = self.n_samples_seen_, len(X)
+        total = n_seen + n_chunk
+        if n_chunk == 0:
+            return
+        chunk_x_mean = X.mean(axis=0, dtype=np.float64)
+        chunk_y_mean = y.mean(axis=0, dtype=np.float64)
+
+        if self.solver_ == 'normal':
+            # 块内中心化后计算，再用 Chan 公式合并到全局的中心化累计量
+            Xc = X - chunk_x_mean.astype(self.dtype) if self.fit_intercept else X
+            yc = y - chunk_y_mean.astype(self.dtype) if self.fit_intercept else y
+            self.xtx_ += Xc.T @ Xc
+            self.xty_ += Xc.T @ yc
+            if self.fit_intercept:
+                dx = chunk_x_mean - self.x_mean_
+                dy = chunk_y_mean - self.y_mean_
+                self.xtx_ += np.outer(dx, dx) * (n_seen * n_chunk / total)
+                self.xty_ += np.outer(dx, dy) * (n_seen * n_chunk / total)
+
+        self.x_mean_ += (chunk_x_mean - self.x_mean_) * (n_chunk / total)
+        self.y_mean_ += (chunk_y_mean - self.y_mean_) * (n_chunk / total)
+        self.n_samples_seen_ = total
+
+        if self.solver_ == 'sgd':
+            self._sgd_chunk(X, y)
+
+    def _sgd_chunk(self, X, y):
+        """对一个数据块逐个小批量做 Adam 更新
+
+        损失为 0.5·均方误差 + 0.5·alpha/n·‖w‖²，n 为整个数据集的样本数（与 Ridge 的解一致）；
+        数据集大小未知时（partial_fit、未指定 n_samples 的 fit_chunks）用已见样本数代替。
+        截距由中心化后的均值在 _finalize 中求出，不参与梯度下降。
+        """
+        n_total = getattr(self, '_n_total', None) or self.n_samples_seen_
+        penalty = self.alpha / n_total
+        x_mean = self.x_mean_.astype(self.dtype) if self.fit_intercept else 0
+        y_mean = self.y_mean_.astype(self.dtype) if self.fit_intercept else 0
+        weights, (m, v) = self._weights, self._moments
+        beta1, beta2, eps = 0.9, 0.999, 1e-8
+
+        for start in range(0, len(X), self.sgd_batch_size):
+            X_batch = X[start:start + self.sgd_batch_size] - x_mean
+            residual = X_batch @ weights - (y[start:start + self.sgd_batch_size] - y_mean)
+            self._epoch_loss[0] += 0.5 * float(np.sum(residual ** 2, dtype=np.float64))
+            self._epoch_loss[1] += len(X_batch)
+            grad = X_batch.T @ residual / len(X_batch) + penalty * weights
+
+            self._step += 1
+            m *= beta1
+            m += (1 - beta1) * grad
+            v *= beta2
+            v += (1 - beta2) * grad ** 2
+            m_hat = m / (1 - beta1 ** self._step)
+            v_hat = v / (1 - beta2 ** self._step)
+            weights -= self.learning_rate * m_hat / (np.sqrt(v_hat) + eps)
+
+    def _finish_epoch(self):
+        """返回本轮的平均损失（含惩罚项）并清零计数"""
+        loss_sum, count = self._epoch_loss
+        self._epoch_loss = [0.0, 0]
+        n_total = getattr(self, '_n_total', None) or self.n_samples_seen_
+        return loss_sum / max(count, 1) + 0.5 * self.alpha / n_total * float(np.sum(self._weights ** 2))
+
+    def _finalize(self):
+        """由当前累计量计算 coef_ / intercept_"""
+        if self.solver_ == 'normal':
+            A = self.xtx_ + self.alpha * np.eye(self.n_features_in_)
+            try:
+                weights = np.linalg.solve(A, self.xty_)
+            except np.linalg.LinAlgError:
+                # 奇异矩阵（共线特征）时取最小范数解
+                weights = np.linalg.lstsq(A, self.xty_, rcond=None)[0]
+        else:
+            weights = self._weights.astype(np.float64)
+        bias = self.y_mean_ - self.x_mean_ @ weights if self.fit_intercept else np.zeros(weights.shape[1])
+
+        self.coef_ = weights.T.astype(self.dtype)
+        self.intercept_ = bias.astype(self.dtype)
+        if self._single_target:
+            self.coef_, self.intercept_ = self.coef_[0], self.intercept_[0]
+
+    def _clear(self, n_samples=None):
+        for attr in ('solver_', '_weights', '_moments', '_step', '_epoch_loss', 'xtx_', 'xty_', 'n_iter_'):
+            self.__dict__.pop(attr, None)
+        self._n_total = n_samples
+
+    def fit(self, X, y):
+        """在内存中的数组上训练（按 batch_size 分块）
+
+        sgd 求解器最多遍历 n_epochs 次，每轮用同一个随机数生成器重新打乱顺序，收敛后提前停止。
+        """
+        self._clear(len(X))
+        rng = np.random.default_rng(self.random_state)
+        sgd = self._resolve_solver(np.shape(X)[1]) == 'sgd'
+        for X_batch, y_batch in self._iter_batches(X, y, rng if sgd else None):
+            self._accumulate(X_batch, y_batch)
+
+        if sgd:
+            best_loss, no_improvement = self._finish_epoch(), 0
+            self.n_iter_ = 1
+            while no_improvement < 2:
+                if self.n_iter_ >= self.n_epochs:
+                    warnings.warn(f"SGD 在 {self.n_epochs} 轮内未收敛，可增大 n_epochs 或调整 learning_rate",
+                                  ConvergenceWarning)
+                    break
+                for X_batch, y_batch in self._iter_batches(X, y, rng):
+                    self._accumulate(X_batch, y_batch)
+                self.n_iter_ += 1
+                loss = self._finish_epoch()
+                no_improvement = no_improvement + 1 if loss > best_loss * (1 - self.tol) else 0
+                best_loss = min(best_loss, loss)
+        self._finalize()
+        return self
+
+    def fit_chunks(self, chunks, n_samples=None):
+        """一次遍历 (X, y) 数据块训练，数据块可以来自文件或数据库等无法一次载入内存的数据源
+
+        sgd 求解器只遍历一次；已知总样本数时传入 n_samples，使岭回归惩罚项按整个数据集缩放。
+        """
+        self._clear(n_samples)
+        for X_chunk, y_chunk in chunks:
+            self._accumulate(X_chunk, y_chunk)
+        self._finalize()
+        return self
+
+    def _iter_batches(self, X, y, rng=None):
+        """按 batch_size 分块；传入 rng 时打乱样本顺序"""
+        order = rng.permutation(len(X)) if rng is not None else None
+        for start in range(0, len(X), self.batch_size):
+            if order is None:
+                yield X[start:start + self.batch_size], y[start:start + self.batch_size]
+            else:
+                index = np.sort(order[start:start + self.batch_size])
+                yield X[index], y[index]
+
+    def predict(self, X):
+        check_is_fitted(self, 'coef_')
+        X = np.asarray(X, dtype=self.dtype)
+        return X @ self.coef_.T + self.intercept_
+
+def stream_regression_chunks(n_samples, n_features=10, n_targets=1, chunksize=1_000_000, noise=0.5,
+                             random_state=42):
+    """分块生成线性回归数据（float32），内存占用只与 chunksize 有关
+
+    Returns:
+        (数据块生成器, 真实系数 (n_targets, n_features), 真实截距 (n_targets,))
+    """
+    rng = np.random.default_rng(random_state)
+    true_coef = rng.uniform(-3, 3, size=(n_targets, n_features))
+    true_intercept = rng.uniform(-5, 5, size=n_targets)
+
+    def chunks():
+        chunk_rng = np.random.default_rng([random_state, 1])
+        for start in range(0, n_samples, chunksize):
+            size = min(chunksize, n_samples - start)
+            X = chunk_rng.standard_normal((size, n_features), dtype=np.float32)
+            X += 10.0  # 特征均值远离0，检验中心化累计的数值稳定性
+            y = X @ true_coef.T.astype(np.float32) + true_intercept.astype(np.float32)
+            y += noise * chunk_rng.standard_normal(y.shape, dtype=np.float32)
+            yield X, y if n_targets > 1 else y[:, 0]
+
+    return chunks(), true_coef, true_intercept
+
+def benchmark_large_regression(n_samples=100_000_000, n_features=10, chunksize=1_000_000, in_memory_samples=5_000_000):
+    """流式训练与 sklearn LinearRegression（全部载入内存）的耗时和峰值内存对比"""
+    print("\n=== 大数据线性回归 ===")
+
+    def measure(func):
+        gc.collect()
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+        return result, elapsed, peak
+
+    # sklearn：数据必须全部在内存中（float64）
+    def fit_in_memory():
+        chunks, _, _ = stream_regression_chunks(in_memory_samples, n_features, chunksize=chunksize)
+        X, y = map(np.concatenate, zip(*chunks))
+        return LinearRegression().fit(X.astype(np.float64), y.astype(np.float64))
+
+    sk_model, sk_time, sk_peak = measure(fit_in_memory)
+    print(f"LinearRegression ({in_memory_samples:,} 行): {sk_time:.2f} 秒, 峰值内存 {sk_peak:,.0f} MB")
+
+    chunks, true_coef, true_intercept = stream_regression_chunks(n_samples, n_features, chunksize=chunksize)
+    model, stream_time, stream_peak = measure(lambda: StreamingLinearRegression().fit_chunks(chunks))
+    print(f"StreamingLinearRegression ({n_samples:,} 行): {stream_time:.2f} 秒, 峰值内存 {stream_peak:,.0f} MB, "
+          f"{n_samples / stream_time:,.0f} 行/秒")
+    print(f"系数最大误差: {np.abs(model.coef_ - true_coef[0]).max():.2e}, "
+          f"截距误差: {abs(model.intercept_ - true_intercept[0]):.2e}")
+    return model
+
 def plot_results(X, y, model, X_test, y_test, y_pred):
     """可视化结果"""
     plt.figure(figsize=(10, 6))
@@ -62,9 +330,10 @@ def plot_results(X, y, model, X_test, y_test, y_pred):
     plt.title('线性回归示例')
     plt.legend()
     plt.grid(True, alpha=0.3)
-    plt.show()
+    return finish_figure('线性回归结果')
 
-def main():
+def main(benchmark=False):
+    """benchmark=True 时额外运行大数据线性回归的性能对比（耗时较长）"""
     print("=== 机器学习基础：线性回归示例 ===\n")
 
     # 创建数据
@@ -76,8 +345,21 @@ def main():
     # 训练模型
     model, X_test, y_test, y_pred = train_linear_regression(X, y)
 
-    # 可视化结果
-    plot_results(X, y, model, X_test, y_test, y_pred)
+    # 可视化结果（设置 ML_PLOT_DIR 时在后台进程中保存为图片）
+    with PlotWorker(PLOT_DIR) as plots:
+        plots.submit(plot_results, X, y, model, X_test, y_test, y_pred)
+
+        # 流式线性回归：小数据上与 sklearn 结果一致
+        streaming_model = StreamingLinearRegression(dtype=np.float64, batch_size=16).fit(X, y)
+        sklearn_model = LinearRegression().fit(X, y)
+        print(f"\n流式训练 - 斜率: {streaming_model.coef_[0][0]:.2f}, 截距: {streaming_model.intercept_[0]:.2f}, "
+              f"与 sklearn 的系数差异: {np.abs(streaming_model.coef_ - sklearn_model.coef_).max():.2e}")
+
+        if benchmark:
+            # 大数据（可调大到 n_samples=100_000_000）
+            benchmark_large_regression(n_samples=10_000_000, in_memory_samples=1_000_000)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description='机器学习基础：线性回归示例')
+    parser.add_argument('--benchmark', action='store_true', help='运行大数据线性回归的性能对比')
+    main(parser.parse_args().benchmark)
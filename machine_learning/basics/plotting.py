@@ -0,0 +1,90 @@
+"""
+机器学习基础示例 - 绘图工具
+交互模式下直接显示图像；无界面模式（Agg 后端）下把图保存为文件，并在单独的工作进程中批量绘制
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+import matplotlib
+
+# 设置环境变量 ML_PLOT_DIR 后以无界面模式运行：图像保存到该目录，不会调用 plt.show() 阻塞批处理任务
+PLOT_DIR = os.environ.get('ML_PLOT_DIR')
+
+# 当前进程的图像输出目录（None 表示交互显示）
+_output_dir = None
+
+def use_headless(output_dir):
+    """切换到 Agg 后端，之后 finish_figure 会把图保存到 output_dir"""
+    global _output_dir
+    matplotlib.use('Agg', force=True)
+    _output_dir = Path(output_dir)
+    _output_dir.mkdir(parents=True, exist_ok=True)
+
+def finish_figure(name):
+    """完成当前图像：交互模式下显示；无界面模式下保存为 PNG、关闭图像并返回文件路径"""
+    import matplotlib.pyplot as plt
+    if _output_dir is None:
+        plt.show()
+        return None
+
+    path = _output_dir / f'{name}.png'
+    fig = plt.gcf()
+    fig.savefig(path, dpi=100, bbox_inches='tight')
+    plt.close(fig)
+    return str(path)
+
+def decision_grid(X, max_points=40_000, margin=1.0):
+    """为决策边界生成网格，点数不超过 max_points
+
+    分辨率按特征范围自适应：两个方向的步长相同，网格点总数固定在预算以内，
+    因此无论数据范围多大，预测和绘图的开销都不变。
+    """
+    x_min, x_max = X[:, 0].min() - margin, X[:, 0].max() + margin
+    y_min, y_max = X[:, 1].min() - margin, X[:, 1].max() + margin
+    step = np.sqrt((x_max - x_min) * (y_max - y_min) / max_points)
+    nx = max(int((x_max - x_min) / step), 2)
+    ny = max(int((y_max - y_min) / step), 2)
+    return np.meshgrid(np.linspace(x_min, x_max, nx, dtype=np.float32),
+                       np.linspace(y_min, y_max, ny, dtype=np.float32))
+
+class PlotWorker:
+    """把一次运行中的所有绘图任务交给单独的进程完成
+
+    output_dir 为 None 时在当前进程中直接绘制并显示（与原来的行为一致）；
+    否则工作进程使用 Agg 后端依次绘制并保存，主进程不必等待绘图，可以继续计算。
+
+    用法:
+        with PlotWorker(PLOT_DIR) as plots:
+            plots.submit(plot_confusion_matrix, cm, '逻辑回归')
+    """
+
+    def __init__(self, output_dir=None):
+        self.output_dir = output_dir
+        self.paths = []
+        self._executor = None
+        self._futures = []
+
+    def __enter__(self):
+        if self.output_dir is not None:
+            self._executor = ProcessPoolExecutor(max_workers=1, initializer=use_headless,
+                                                 initargs=(self.output_dir,))
+        return self
+
+    def submit(self, func, *args, **kwargs):
+        """提交一个绘图函数（函数和参数需可序列化）"""
+        if self._executor is None:
+            func(*args, **kwargs)
+        else:
+            self._futures.append(self._executor.submit(func, *args, **kwargs))
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._executor is None:
+            return
+        try:
+            if exc_type is None:
+                self.paths = [path for path in (future.result() for future in self._futures) if path]
+                print(f"🖼️ 已保存 {len(self.paths)} 张图到 {self.output_dir}")
+        finally:
+            self._executor.shutdown(cancel_futures=exc_type is not None)
@@ -1,31 +1,322 @@
 # 机器学习数据库集成示例
 # 将机器学习实验结果存储到数据库中
 
+import os
 import sqlite3
 import json
+import time
+import hashlib
+import joblib
 import pandas as pd
 import numpy as np
 from datetime import datetime
-from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LinearRegression
-from sklearn.metrics import mean_squared_error, r2_score
+from pathlib import Path
+from joblib import Parallel, delayed
+from sklearn.base import is_classifier
+from sklearn.model_selection import train_test_split, ParameterGrid, ParameterSampler
+from sklearn.linear_model import LinearRegression, Ridge
+from sklearn.metrics import mean_squared_error, r2_score, accuracy_score, f1_score
+from database_connection import MigrationRunner, QueryProfiler
+
+
+def params_hash(model_type, params):
+    """模型类型 + 参数的稳定哈希（与参数顺序无关）"""
+    payload = json.dumps({'model': model_type, 'params': params}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+# 数据指纹：优先使用 xxhash（非加密哈希，比 blake2b 快一个数量级；两者得到的指纹不同）
+# 保存的指纹同时记录 HASH_ALGORITHM，只和同一算法计算的指纹比较
+try:
+    import xxhash
+
+    HASH_ALGORITHM = 'xxh3_128'
+
+    def new_hasher():
+        return xxhash.xxh3_128()
+except ImportError:
+    HASH_ALGORITHM = 'blake2b_128'
+
+    def new_hasher():
+        return hashlib.blake2b(digest_size=16)
+
+
+def _update_digest(digest, values, chunk_rows=1 << 20):
+    """按块把一列（或一个数组）的数据缓冲区写入哈希"""
+    for start in range(0, len(values), chunk_rows):
+        chunk = values[start:start + chunk_rows]
+        if isinstance(chunk, pd.Series):
+            if isinstance(chunk.dtype, np.dtype) and chunk.dtype != object:
+                chunk = chunk.to_numpy()
+            else:
+                # 字符串、类别和可空类型先逐值哈希为 uint64
+                chunk = pd.util.hash_pandas_object(chunk, index=False).to_numpy()
+        chunk = np.ascontiguousarray(chunk)
+        if chunk.dtype == object:
+            chunk = pd.util.hash_pandas_object(pd.Series(chunk.ravel()), index=False).to_numpy()
+        digest.update(chunk.reshape(-1).view(np.uint8).data)
+
+
+def dataset_fingerprint(dataframe):
+    """DataFrame 内容指纹：逐列分块哈希列缓冲区（列名、类型和数值都参与计算）"""
+    digest = new_hasher()
+    digest.update(f'{dataframe.shape}'.encode('utf-8'))
+    for name in dataframe.columns:
+        column = dataframe[name]
+        digest.update(f'{name}:{column.dtype}'.encode('utf-8'))
+        _update_digest(digest, column)
+    return digest.hexdigest()
+
+
+def array_hash(*arrays):
+    """数组内容指纹（形状、类型和数值都参与计算）"""
+    digest = new_hasher()
+    for array in arrays:
+        array = np.asarray(array)
+        digest.update(f'{array.shape}{array.dtype.str}'.encode('utf-8'))
+        _update_digest(digest, array.reshape(-1))
+    return digest.hexdigest()
+
+
+def run_trial(estimator_class, params, X, y, test_size=0.2, random_state=42):
+    """训练并评估一组参数（模块级函数，可在工作进程中执行）"""
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=random_state)
+    start = time.perf_counter()
+    try:
+        model = estimator_class(**params)
+        model.fit(X_train, y_train)
+        y_pred = model.predict(X_test)
+    except Exception as e:
+        return {'params': params, 'status': 'failed', 'metrics': {}, 'error': str(e)}
 
-class MLDatabaseManager:
-    """机器学习数据库管理器"""
+    if is_classifier(model):
+        metrics = {
+            'accuracy': accuracy_score(y_test, y_pred),
+            'f1_score': f1_score(y_test, y_pred, average='weighted')
+        }
+    else:
+        metrics = {
+            'mean_squared_error': mean_squared_error(y_test, y_pred),
+            'r2_score': r2_score(y_test, y_pred)
+        }
+    metrics['fit_time'] = time.perf_counter() - start
+    return {'params': params, 'status': 'completed', 'metrics': metrics}
+
+
+class ModelStore:
+    """按内容寻址的模型缓存
+
+    键 = hash(模型类, 参数, 训练数据指纹)。模型用 joblib 保存，加载时以内存映射方式读取
+    其中的 numpy 数组；缓存总大小超过 max_bytes 时淘汰最久未使用的模型（LRU）。
+
+    get 返回的模型中的数组直接映射缓存文件，只要模型（或从中取出的数组）还被引用，映射就一直存在。
+    POSIX 系统上删除或替换文件不影响已有映射；Windows 上被映射的文件不能删除或替换，
+    此时淘汰会跳过该文件，等模型被释放后由之后的淘汰再删除。
+    """
+
+    def __init__(self, root='model_store', max_bytes=1 << 30):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def model_key(model, X, y=None, fit_params=None):
+        """模型类 + 参数 + 训练数据指纹 + fit 参数的哈希
+
+        fit 参数中的数组（如 sample_weight）按内容计算指纹，其他值按文本参与计算。
+        """
+        model_type = f'{type(model).__module__}.{type(model).__qualname__}'
+        data = array_hash(X) if y is None else array_hash(X, y)
+        fit_data = {
+            name: array_hash(value) if isinstance(value, (np.ndarray, pd.Series, pd.DataFrame, list)) else value
+            for name, value in (fit_params or {}).items()
+        }
+        payload = {'params': model.get_params(deep=True), 'data': data}
+        if fit_data:
+            # 没有 fit 参数时键与之前相同，已有的缓存仍然有效
+            payload['fit_params'] = fit_data
+        return params_hash(model_type, payload)
+
+    def path(self, key):
+        return self.root / f'{key}.joblib'
+
+    def get(self, key):
+        """读取缓存的模型，不存在时返回 None"""
+        path = self.path(key)
+        try:
+            model = joblib.load(path, mmap_mode='r')
+        except FileNotFoundError:
+            return None
+        os.utime(path)  # 更新最近使用时间
+        return model
+
+    def put(self, key, model):
+        """保存模型（先写临时文件再重命名，避免留下不完整的文件）"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self.path(key)
+        tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+        joblib.dump(model, tmp_path)
+        try:
+            os.replace(tmp_path, path)
+        except PermissionError:
+            # Windows：同一个键的文件正被映射读取。键按内容寻址，已有文件就是同一个模型
+            tmp_path.unlink(missing_ok=True)
+            if not path.exists():
+                raise
+        self.evict(keep=key)
+
+    def fit(self, model, X, y=None, **fit_params):
+        """训练模型；相同的模型、参数、训练数据和 fit 参数已缓存时直接返回缓存的模型
+
+        Returns:
+            (训练好的模型, 缓存键)
+        """
+        key = self.model_key(model, X, y, fit_params)
+        cached = self.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached, key
+
+        self.misses += 1
+        model.fit(X, **fit_params) if y is None else model.fit(X, y, **fit_params)
+        self.put(key, model)
+        return model, key
+
+    def size(self):
+        """缓存占用的磁盘空间（字节）"""
+        return sum(path.stat().st_size for path in self.root.glob('*.joblib'))
+
+    def evict(self, keep=None):
+        """按最近使用时间淘汰模型，直到总大小不超过 max_bytes"""
+        entries = []
+        for path in self.root.glob('*.joblib'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total <= self.max_bytes:
+                break
+            if path.stem == keep:
+                continue
+            try:
+                path.unlink(missing_ok=True)
+            except PermissionError:
+                # Windows：模型仍被映射使用，暂不淘汰，之后的淘汰会再次尝试
+                print(f"⚠️ 模型文件正在使用，暂不淘汰: {path.name}")
+                continue
+            total -= size
+
+
+# 按指标排序实验；过滤条件以 JSON 数组 [[指标名, 运算符, 值], ...] 作为一个参数传入，
+# 每个条件都必须有满足的指标（NOT EXISTS 未满足的条件）
+RANK_EXPERIMENTS_SQL = '''
+    SELECT e.id, e.experiment_name, e.model_type, e.dataset_name, m.value, e.created_at
+    FROM experiment_metrics m
+    JOIN experiments e ON e.id = m.experiment_id
+    WHERE m.name = ? AND m.step = ?
+      AND (? IS NULL OR e.model_type = ?)
+      AND NOT EXISTS (
+          SELECT 1 FROM json_each(?) c
+          WHERE NOT EXISTS (
+              SELECT 1 FROM experiment_metrics f
+              WHERE f.experiment_id = m.experiment_id AND f.step = m.step
+                AND f.name = json_extract(c.value, '$[0]')
+                AND CASE json_extract(c.value, '$[1]')
+                    WHEN '<' THEN f.value < json_extract(c.value, '$[2]')
+                    WHEN '<=' THEN f.value <= json_extract(c.value, '$[2]')
+                    WHEN '=' THEN f.value = json_extract(c.value, '$[2]')
+                    WHEN '>=' THEN f.value >= json_extract(c.value, '$[2]')
+                    WHEN '>' THEN f.value > json_extract(c.value, '$[2]')
+                    WHEN '!=' THEN f.value != json_extract(c.value, '$[2]')
+                END
+          )
+      )
+    ORDER BY m.value {order}
+    LIMIT ?
+'''
 
-    def __init__(self, db_path='ml_experiments.db'):
-        """初始化数据库连接"""
-        self.db_path = db_path
-        self.connection = sqlite3.connect(db_path)
-        self.create_tables()
-        print(f"✅ 连接到机器学习数据库: {db_path}")
 
-    def create_tables(self):
-        """创建机器学习实验相关的表"""
-        cursor = self.connection.cursor()
+class MLDatabaseManager:
+    """机器学习数据库管理器"""
 
-        # 实验记录表
-        cursor.execute('''
+    # 常用语句只构建一次，按名称执行
+    STATEMENTS = {
+        'save_dataset_info': '''
+            INSERT INTO datasets (name, version, content_hash, hash_algorithm, description, rows, columns,
+                                  data_types, storage_path)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''',
+        'latest_dataset': '''
+            SELECT version, content_hash, storage_path, hash_algorithm FROM datasets
+            WHERE name = ? ORDER BY version DESC LIMIT 1
+        ''',
+        'latest_stored_dataset': '''
+            SELECT version, content_hash, storage_path FROM datasets
+            WHERE name = ? AND storage_path IS NOT NULL ORDER BY version DESC LIMIT 1
+        ''',
+        'dataset_version': '''
+            SELECT version, content_hash, storage_path FROM datasets
+            WHERE name = ? AND version = ?
+        ''',
+        'dataset_by_hash': '''
+            SELECT version, content_hash, storage_path FROM datasets
+            WHERE content_hash = ? AND storage_path IS NOT NULL LIMIT 1
+        ''',
+        'save_experiment': '''
+            INSERT INTO experiments (experiment_name, model_type, dataset_name,
+                                   parameters, metrics, feature_importance, model_key, status)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 'completed')
+        ''',
+        'experiment_model_key': '''
+            SELECT model_key FROM experiments WHERE id = ?
+        ''',
+        'save_trial': '''
+            INSERT INTO experiments (experiment_name, model_type, dataset_name, parameters,
+                                   metrics, status, params_hash, dataset_hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''',
+        'completed_trials': '''
+            SELECT params_hash FROM experiments
+            WHERE model_type = ? AND dataset_hash = ? AND status = 'completed'
+        ''',
+        'save_metrics': '''
+            INSERT OR REPLACE INTO experiment_metrics (experiment_id, name, value, step)
+            VALUES (?, ?, ?, ?)
+        ''',
+        'stream_experiments': '''
+            SELECT id, experiment_name, model_type, dataset_name,
+                   metrics, created_at, status
+            FROM experiments
+            ORDER BY created_at DESC
+            LIMIT ?
+        ''',
+        # 排序方向不能参数化，升序和降序各注册一条（都能使用 idx_experiment_metrics_rank）
+        'rank_experiments_asc': RANK_EXPERIMENTS_SQL.format(order='ASC'),
+        'rank_experiments_desc': RANK_EXPERIMENTS_SQL.format(order='DESC'),
+        # 每个实验每个指标一行，在 Python 中透视为列，SQL 不随指标数量变化
+        'metrics_table': '''
+            SELECT e.id, e.experiment_name, e.model_type, e.status, m.name, m.value
+            FROM (
+                SELECT id, experiment_name, model_type, status, created_at FROM experiments
+                ORDER BY created_at DESC, id DESC
+                LIMIT ?
+            ) e
+            LEFT JOIN experiment_metrics m
+                ON m.experiment_id = e.id AND m.step = ? AND m.name IN (SELECT value FROM json_each(?))
+            ORDER BY e.created_at DESC, e.id DESC
+        ''',
+    }
+
+    # 有序的数据库迁移：(版本, 说明, 语句)
+    MIGRATIONS = [
+        (1, '创建实验、数据集和模型对比表', {'sqlite': [
+            # 实验记录表
+            '''
             CREATE TABLE IF NOT EXISTS experiments (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 experiment_name TEXT NOT NULL,
@@ -37,10 +328,9 @@ class MLDatabaseManager:
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 status TEXT DEFAULT 'running'  -- running, completed, failed
             )
-        ''')
-
-        # 数据集信息表
-        cursor.execute('''
+            ''',
+            # 数据集信息表
+            '''
             CREATE TABLE IF NOT EXISTS datasets (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 name TEXT NOT NULL UNIQUE,
@@ -50,10 +340,9 @@ class MLDatabaseManager:
                 data_types TEXT,  -- JSON格式存储各列数据类型
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
-        ''')
-
-        # 模型性能对比表
-        cursor.execute('''
+            ''',
+            # 模型性能对比表
+            '''
             CREATE TABLE IF NOT EXISTS model_comparison (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 experiment_id INTEGER,
@@ -66,71 +355,313 @@ class MLDatabaseManager:
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (experiment_id) REFERENCES experiments (id)
             )
-        ''')
+            ''',
+        ]}),
+        (2, '为实验列表和模型对比查询添加索引', {'sqlite': [
+            'CREATE INDEX IF NOT EXISTS idx_experiments_created ON experiments (created_at)',
+            'CREATE INDEX IF NOT EXISTS idx_model_comparison_experiment ON model_comparison (experiment_id)',
+        ]}),
+        (3, '按指标拆分的实验指标表', {'sqlite': [
+            # step = 0 为实验的最终指标，训练过程中的指标从 1 开始记录
+            '''
+            CREATE TABLE IF NOT EXISTS experiment_metrics (
+                experiment_id INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                value REAL NOT NULL,
+                step INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (experiment_id, name, step),
+                FOREIGN KEY (experiment_id) REFERENCES experiments (id)
+            ) WITHOUT ROWID
+            ''',
+            # 按指标排序/过滤只需扫描索引
+            'CREATE INDEX IF NOT EXISTS idx_experiment_metrics_rank ON experiment_metrics (name, step, value)',
+            # 回填已有实验的数值型指标
+            '''
+            INSERT OR IGNORE INTO experiment_metrics (experiment_id, name, value, step)
+            SELECT e.id, j.key, j.value, 0
+            FROM experiments e, json_each(e.metrics) j
+            WHERE e.metrics IS NOT NULL AND json_valid(e.metrics) AND j.type IN ('integer', 'real')
+            ''',
+        ]}),
+        (4, '记录参数哈希和数据集哈希，用于跳过重复试验', {'sqlite': [
+            'ALTER TABLE experiments ADD COLUMN params_hash TEXT',
+            'ALTER TABLE experiments ADD COLUMN dataset_hash TEXT',
+            'CREATE INDEX IF NOT EXISTS idx_experiments_trial ON experiments (model_type, dataset_hash, params_hash)',
+        ]}),
+        (5, '实验关联模型缓存', {'sqlite': [
+            'ALTER TABLE experiments ADD COLUMN model_key TEXT',
+        ]}),
+        (6, '数据集按版本保存并记录内容指纹', {'sqlite': [
+            '''
+            CREATE TABLE datasets_versioned (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                version INTEGER NOT NULL DEFAULT 1,
+                content_hash TEXT,  -- 数据内容指纹
+                description TEXT,
+                rows INTEGER,
+                columns INTEGER,
+                data_types TEXT,  -- JSON格式存储各列数据类型
+                storage_path TEXT,  -- Parquet/npz 数据文件
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE (name, version)
+            )
+            ''',
+            # 已有数据集作为第1版保留
+            '''
+            INSERT INTO datasets_versioned (id, name, version, description, rows, columns, data_types, created_at)
+            SELECT id, name, 1, description, rows, columns, data_types, created_at FROM datasets
+            ''',
+            'DROP TABLE datasets',
+            'ALTER TABLE datasets_versioned RENAME TO datasets',
+            'CREATE INDEX IF NOT EXISTS idx_datasets_hash ON datasets (content_hash)',
+        ]}),
+        (7, '数据集指纹记录哈希算法', {'sqlite': [
+            # 已有版本的算法未知（取决于当时是否安装了 xxhash），保持为 NULL，不参与指纹比较
+            'ALTER TABLE datasets ADD COLUMN hash_algorithm TEXT',
+        ]}),
+    ]
+
+    def __init__(self, db_path='ml_experiments.db', statement_cache_size=256, slow_query_threshold=0.1,
+                 model_store_dir='model_store', model_store_max_bytes=1 << 30, dataset_dir='dataset_store'):
+        """初始化数据库连接"""
+        self.db_path = db_path
+        self.dataset_dir = Path(dataset_dir)
+        self.model_store = ModelStore(model_store_dir, model_store_max_bytes)
+        self.connection = sqlite3.connect(db_path, cached_statements=statement_cache_size)
+        self.profiler = QueryProfiler(slow_threshold=slow_query_threshold)
+        for name, sql in self.STATEMENTS.items():
+            self.profiler.register(name, sql)
+        self.create_tables()
+        print(f"✅ 连接到机器学习数据库: {db_path}")
 
-        self.connection.commit()
-        print("✅ 机器学习数据库表创建完成")
+    def execute(self, name, params=(), fetch=None):
+        """执行命名语句并计时
+
+        fetch='all' / 'one' 时在计时范围内读取结果并返回行；为 None 时返回游标
+        （写操作或由调用方分批读取，计时只包含执行）。
+        """
+        sql = self.profiler.sql(name)
+        start = time.perf_counter()
+        cursor = self.connection.execute(sql, params)
+        if fetch == 'all':
+            result = cursor.fetchall()
+        elif fetch == 'one':
+            result = cursor.fetchone()
+        else:
+            result = cursor
+        self.profiler.record(name, sql, params, time.perf_counter() - start, self.connection)
+        return result
 
-    def save_dataset_info(self, name, description, dataframe):
-        """保存数据集信息"""
-        cursor = self.connection.cursor()
+    def create_tables(self):
+        """创建机器学习实验相关的表（执行尚未应用的数据库迁移）"""
+        applied = MigrationRunner('sqlite', self.MIGRATIONS).migrate(self.connection)
+        if applied:
+            print(f"✅ 机器学习数据库表迁移完成: v{applied[-1]}")
+
+    def save_dataset_info(self, name, description, dataframe, store_data=True):
+        """保存数据集版本
+
+        内容指纹与最新版本相同（且由同一哈希算法计算）时直接复用，否则版本号加一；
+        store_data=True 时数据本身按指纹保存为 Parquet（未安装 pyarrow 时为 npz），
+        相同内容只保存一份。
+
+        Returns:
+            'name@version'，可用于 load_dataset
+        """
+        content_hash = dataset_fingerprint(dataframe)
+        latest = self.execute('latest_dataset', (name,), fetch='one')
+        if latest and latest[3] == HASH_ALGORITHM and latest[1] == content_hash and (latest[2] or not store_data):
+            print(f"♻️ 数据集 '{name}@{latest[0]}' 内容未变化，复用已有版本")
+            return f'{name}@{latest[0]}'
+
+        version = latest[0] + 1 if latest else 1
+        storage_path = str(self._write_dataset(dataframe, content_hash)) if store_data else None
 
         # 获取数据类型信息
         data_types = {}
         for column in dataframe.columns:
             data_types[column] = str(dataframe[column].dtype)
 
-        cursor.execute('''
-            INSERT OR REPLACE INTO datasets (name, description, rows, columns, data_types)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (name, description, len(dataframe), len(dataframe.columns), json.dumps(data_types)))
+        self.execute('save_dataset_info',
+                     (name, version, content_hash, HASH_ALGORITHM, description, len(dataframe), len(dataframe.columns),
+                      json.dumps(data_types), storage_path))
 
         self.connection.commit()
-        print(f"✅ 数据集 '{name}' 信息已保存")
+        print(f"✅ 数据集 '{name}@{version}' 信息已保存")
+        return f'{name}@{version}'
+
+    def _write_dataset(self, dataframe, content_hash):
+        """按内容指纹保存数据文件（已存在时直接复用）"""
+        self.dataset_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            import pyarrow  # noqa: F401  pandas 写 Parquet 需要
+            path = self.dataset_dir / f'{content_hash}.parquet'
+        except ImportError:
+            path = self.dataset_dir / f'{content_hash}.npz'
+        if path.exists():
+            return path
+
+        tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+        if path.suffix == '.parquet':
+            dataframe.to_parquet(tmp_path, index=False)
+        else:
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, **{str(column): dataframe[column].to_numpy() for column in dataframe.columns})
+        os.replace(tmp_path, path)
+        return path
+
+    def load_dataset(self, ref):
+        """按 'name@version'、'name'（最新的已保存数据的版本）或内容指纹加载数据集
+
+        Parquet 文件以内存映射方式读取，实验之间可以直接复用已处理好的数据。
+        """
+        if '@' in ref:
+            name, version = ref.rsplit('@', 1)
+            row = self.execute('dataset_version', (name, int(version)), fetch='one')
+            if row and not row[2]:
+                raise KeyError(f"数据集 '{ref}' 没有保存数据（保存时 store_data=False）")
+        else:
+            latest = self.execute('latest_dataset', (ref,), fetch='one')
+            if latest is None:
+                row = self.execute('dataset_by_hash', (ref,), fetch='one')
+            else:
+                # 最新版本可能只记录了元数据，回退到最新的已保存数据的版本
+                row = self.execute('latest_stored_dataset', (ref,), fetch='one')
+                if row is None:
+                    raise KeyError(f"数据集 '{ref}' 的所有版本都没有保存数据（保存时 store_data=False）")
+                if row[0] != latest[0]:
+                    print(f"⚠️ 数据集 '{ref}@{latest[0]}' 没有保存数据，加载 '{ref}@{row[0]}'")
+
+        if not row:
+            raise KeyError(f"未找到已保存数据的数据集: {ref}")
+
+        path = Path(row[2])
+        if path.suffix == '.parquet':
+            return pd.read_parquet(path, memory_map=True)
+        with np.load(path, allow_pickle=True) as data:
+            return pd.DataFrame({column: data[column] for column in data.files})
 
     def save_experiment(self, experiment_name, model_type, dataset_name, parameters,
-                       metrics, feature_importance=None):
-        """保存实验结果"""
-        cursor = self.connection.cursor()
-
-        cursor.execute('''
-            INSERT INTO experiments (experiment_name, model_type, dataset_name,
-                                   parameters, metrics, feature_importance, status)
-            VALUES (?, ?, ?, ?, ?, ?, 'completed')
-        ''', (experiment_name, model_type, dataset_name,
-              json.dumps(parameters), json.dumps(metrics),
-              json.dumps(feature_importance) if feature_importance else None))
+                       metrics, feature_importance=None, model_key=None):
+        """保存实验结果（model_key 为 ModelStore 中训练好的模型）"""
+        cursor = self.execute('save_experiment', (
+            experiment_name, model_type, dataset_name,
+            json.dumps(parameters), json.dumps(metrics),
+            json.dumps(feature_importance) if feature_importance else None,
+            model_key
+        ))
 
         experiment_id = cursor.lastrowid
+        self.log_metrics(experiment_id, metrics, step=0, commit=False)
         self.connection.commit()
         print(f"✅ 实验 '{experiment_name}' 结果已保存 (ID: {experiment_id})")
         return experiment_id
 
+    def model_path(self, experiment_id):
+        """实验模型在缓存中的文件路径（未保存或已被淘汰时返回 None）"""
+        row = self.execute('experiment_model_key', (experiment_id,), fetch='one')
+        if not row or not row[0]:
+            return None
+        path = self.model_store.path(row[0])
+        if not path.exists():
+            print(f"⚠️ 实验 {experiment_id} 的模型已从缓存中淘汰")
+            return None
+        return path
+
+    def load_model(self, experiment_id):
+        """加载实验训练好的模型（未保存或已被淘汰时返回 None）"""
+        path = self.model_path(experiment_id)
+        return self.model_store.get(path.stem) if path else None
+
+    def log_metrics(self, experiment_id, metrics, step=0, commit=True):
+        """把数值型指标写入 experiment_metrics（列表等非数值指标只保存在 metrics JSON 中）
+
+        Args:
+            experiment_id: 实验ID
+            metrics: {指标名: 值}
+            step: 0 表示最终指标；训练过程中的指标（如每个epoch）从 1 开始
+        """
+        rows = [
+            (experiment_id, name, float(value), step)
+            for name, value in metrics.items()
+            if isinstance(value, (int, float, np.number)) and not isinstance(value, bool)
+        ]
+        if rows:
+            sql = self.profiler.sql('save_metrics')
+            start = time.perf_counter()
+            self.connection.executemany(sql, rows)
+            self.profiler.record('save_metrics', sql, None, time.perf_counter() - start)
+        if commit:
+            self.connection.commit()
+        return len(rows)
+
+    def rank_experiments(self, metric, ascending=True, limit=10, step=0, filters=None, model_type=None):
+        """按任意指标对实验排序（一条使用索引的SQL查询）
+
+        Args:
+            metric: 排序指标名，如 'mean_squared_error'
+            ascending: True 表示越小越好
+            limit: 返回的实验数
+            step: 指标所在步数（0 为最终指标）
+            filters: 其他指标的过滤条件，如 {'r2_score': ('>=', 0.9)}
+            model_type: 只比较指定模型类型
+
+        Returns:
+            [{'id', 'experiment_name', 'model_type', 'dataset_name', metric, 'created_at'}, ...]
+        """
+        conditions = []
+        for name, (op, value) in (filters or {}).items():
+            if op not in ('<', '<=', '=', '>=', '>', '!='):
+                raise ValueError(f"不支持的比较运算符: {op}")
+            conditions.append([name, op, value])
+        params = (metric, step, model_type or None, model_type or None, json.dumps(conditions),
+                  limit if limit is not None else -1)
+
+        return [
+            {'id': row[0], 'experiment_name': row[1], 'model_type': row[2],
+             'dataset_name': row[3], metric: row[4], 'created_at': row[5]}
+            for row in self.execute('rank_experiments_asc' if ascending else 'rank_experiments_desc',
+                                    params, fetch='all')
+        ]
+
+    def metrics_table(self, metrics=('mean_squared_error', 'r2_score'), limit=10, step=0):
+        """每个实验一行，每个指标一列（SQL 按行返回指标，在 Python 中透视）"""
+        params = (limit if limit is not None else -1, step, json.dumps(list(metrics)))
+        table = {}
+        for exp_id, experiment_name, model_type, status, name, value in \
+                self.execute('metrics_table', params, fetch='all'):
+            row = table.setdefault(exp_id, {'experiment_name': experiment_name, 'model_type': model_type,
+                                            'status': status, **dict.fromkeys(metrics)})
+            if name is not None:
+                row[name] = value
+        return list(table.values())
+
+    def stream_experiments(self, limit=None, batch_size=500):
+        """逐条读取实验记录（fetchmany 分批读取，适合大量实验）"""
+        cursor = self.execute('stream_experiments', (limit if limit is not None else -1,))
+
+        try:
+            while True:
+                experiments = cursor.fetchmany(batch_size)
+                if not experiments:
+                    break
+                for exp in experiments:
+                    yield {
+                        'id': exp[0],
+                        'experiment_name': exp[1],
+                        'model_type': exp[2],
+                        'dataset_name': exp[3],
+                        'metrics': json.loads(exp[4]) if exp[4] else {},
+                        'created_at': exp[5],
+                        'status': exp[6]
+                    }
+        finally:
+            cursor.close()
+
     def get_experiments(self, limit=10):
         """获取实验记录"""
-        cursor = self.connection.cursor()
-        cursor.execute('''
-            SELECT id, experiment_name, model_type, dataset_name,
-                   metrics, created_at, status
-            FROM experiments
-            ORDER BY created_at DESC
-            LIMIT ?
-        ''', (limit,))
-
-        experiments = cursor.fetchall()
-        result = []
-        for exp in experiments:
-            result.append({
-                'id': exp[0],
-                'experiment_name': exp[1],
-                'model_type': exp[2],
-                'dataset_name': exp[3],
-                'metrics': json.loads(exp[4]) if exp[4] else {},
-                'created_at': exp[5],
-                'status': exp[6]
-            })
-
-        return result
+        return list(self.stream_experiments(limit=limit))
 
     def run_linear_regression_experiment(self, experiment_name="线性回归实验"):
         """运行线性回归实验并保存结果"""
@@ -145,15 +676,14 @@ class MLDatabaseManager:
         df = pd.DataFrame(X, columns=['feature1', 'feature2', 'feature3'])
         df['target'] = y
 
-        # 保存数据集信息
-        self.save_dataset_info("linear_regression_sample", "线性回归示例数据集", df)
+        # 保存数据集（内容未变化时复用已有版本）
+        dataset_ref = self.save_dataset_info("linear_regression_sample", "线性回归示例数据集", df)
 
         # 分割数据
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
-        # 训练模型
-        model = LinearRegression()
-        model.fit(X_train, y_train)
+        # 训练模型（相同参数和训练数据的模型已缓存时直接复用）
+        model, model_key = self.model_store.fit(LinearRegression(), X_train, y_train)
 
         # 预测
         y_pred = model.predict(X_test)
@@ -186,18 +716,90 @@ class MLDatabaseManager:
         experiment_id = self.save_experiment(
             experiment_name=experiment_name,
             model_type='LinearRegression',
-            dataset_name='linear_regression_sample',
+            dataset_name=dataset_ref,
             parameters=parameters,
             metrics=metrics,
-            feature_importance=feature_importance
+            feature_importance=feature_importance,
+            model_key=model_key
         )
 
         print(f"📈 模型性能 - MSE: {mse:.4f}, R²: {r2:.4f}")
         return experiment_id
 
+    def run_sweep(self, estimator_class, X, y, param_grid=None, param_distributions=None, n_iter=100,
+                  experiment_name=None, dataset_name=None, test_size=0.2, random_state=42,
+                  n_jobs=-1, batch_size=50):
+        """并行超参数搜索，结果批量写入 experiments
+
+        - param_grid: 网格搜索；param_distributions: 随机搜索（采样 n_iter 组）
+        - 试验在 joblib/loky 进程池中执行，n_jobs=-1 使用全部CPU核心
+        - 主进程按 batch_size 分批写入，每批一个事务
+        - 参数哈希和数据集哈希都相同的已完成试验会跳过，中断后重新运行即可继续
+
+        Returns:
+            {'total', 'skipped', 'completed', 'failed'}
+        """
+        if (param_grid is None) == (param_distributions is None):
+            raise ValueError("param_grid 和 param_distributions 需要且只能指定一个")
+
+        model_type = estimator_class.__name__
+        experiment_name = experiment_name or f'{model_type}超参数搜索'
+        if param_grid is not None:
+            candidates = list(ParameterGrid(param_grid))
+        else:
+            candidates = list(ParameterSampler(param_distributions, n_iter, random_state=random_state))
+
+        X, y = np.asarray(X), np.asarray(y)
+        data_hash = array_hash(X, y)
+        finished = {row[0] for row in self.execute('completed_trials', (model_type, data_hash), fetch='all')}
+
+        pending = {}
+        for params in candidates:
+            key = params_hash(model_type, params)
+            if key not in finished:
+                pending.setdefault(key, params)
+
+        summary = {'total': len(candidates), 'skipped': len(candidates) - len(pending), 'completed': 0, 'failed': 0}
+        print(f"🔍 超参数搜索 {model_type}: 共 {len(candidates)} 组参数，跳过 {summary['skipped']} 组已完成的试验")
+        if not pending:
+            return summary
+
+        # 大数组由 loky 自动以内存映射方式共享给工作进程
+        results = Parallel(n_jobs=n_jobs, backend='loky', return_as='generator_unordered')(
+            delayed(run_trial)(estimator_class, params, X, y, test_size, random_state)
+            for params in pending.values()
+        )
+
+        batch = []
+        for result in results:
+            batch.append(result)
+            summary[result['status']] += 1
+            if len(batch) >= batch_size:
+                self._save_trials(batch, experiment_name, model_type, dataset_name, data_hash)
+                batch = []
+        if batch:
+            self._save_trials(batch, experiment_name, model_type, dataset_name, data_hash)
+
+        print(f"✅ 超参数搜索完成: {summary}")
+        return summary
+
+    def _save_trials(self, trials, experiment_name, model_type, dataset_name, data_hash):
+        """在一个事务中写入一批试验结果"""
+        with self.connection:
+            for trial in trials:
+                key = params_hash(model_type, trial['params'])
+                metrics = trial['metrics'] if trial['status'] == 'completed' else {'error': trial.get('error')}
+                cursor = self.execute('save_trial', (
+                    f'{experiment_name}#{key[:8]}', model_type, dataset_name,
+                    json.dumps(trial['params'], default=str), json.dumps(metrics),
+                    trial['status'], key, data_hash
+                ))
+                self.log_metrics(cursor.lastrowid, trial['metrics'], commit=False)
+        print(f"💾 已写入 {len(trials)} 组试验结果")
+
     def compare_experiments(self):
-        """比较实验结果"""
-        experiments = self.get_experiments()
+        """比较实验结果（指标直接从 experiment_metrics 读取，无需解析JSON）"""
+        experiments = self.metrics_table(('mean_squared_error', 'r2_score'))
 
         if not experiments:
             print("❌ 没有找到实验记录")
@@ -209,9 +811,8 @@ class MLDatabaseManager:
         print("-" * 80)
 
         for exp in experiments:
-            metrics = exp['metrics']
-            mse = metrics.get('mean_squared_error', 'N/A')
-            r2 = metrics.get('r2_score', 'N/A')
+            mse = exp['mean_squared_error'] if exp['mean_squared_error'] is not None else 'N/A'
+            r2 = exp['r2_score'] if exp['r2_score'] is not None else 'N/A'
 
             mse_str = f"{mse:.4f}" if isinstance(mse, (int, float)) else str(mse)
             r2_str = f"{r2:.4f}" if isinstance(r2, (int, float)) else str(r2)
@@ -238,12 +839,26 @@ def main():
     print("\n2️⃣ 运行线性回归实验...")
     experiment_id = db.run_linear_regression_experiment("线性回归示例实验")
 
-    # 3. 查看实验结果
-    print("\n3️⃣ 查看实验结果...")
+    # 3. 并行超参数搜索（重复运行时跳过已完成的试验）
+    print("\n3️⃣ 岭回归超参数搜索...")
+    rng = np.random.RandomState(42)
+    X = rng.randn(1000, 10)
+    y = X @ rng.randn(10) + rng.randn(1000) * 0.1
+    db.run_sweep(Ridge, X, y, param_grid={'alpha': [0.001, 0.01, 0.1, 1.0, 10.0],
+                                          'fit_intercept': [True, False]},
+                 experiment_name='岭回归搜索', dataset_name='ridge_sample')
+
+    # 4. 查看实验结果
+    print("\n4️⃣ 查看实验结果...")
     db.compare_experiments()
 
-    # 4. 关闭连接
-    print("\n4️⃣ 关闭数据库连接...")
+    # 按指标排序（一条使用索引的SQL查询）
+    for exp in db.rank_experiments('mean_squared_error', limit=3):
+        print(f"🏆 {exp['experiment_name']}: MSE = {exp['mean_squared_error']:.4f}")
+    db.profiler.print_report()
+
+    # 5. 关闭连接
+    print("\n5️⃣ 关闭数据库连接...")
     db.close()
 
     print("\n" + "=" * 60)
@@ -0,0 +1,237 @@
+# 机器学习批量推理示例
+# 从实验记录中加载模型，分块读取大表并行预测，结果批量写回数据库
+
+import os
+import time
+import sqlite3
+import itertools
+import joblib
+import numpy as np
+import pandas as pd
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from database_connection import DatabaseManager
+from ml_database_integration import MLDatabaseManager
+
+# 工作进程中的模型（每个进程只加载一次）
+_worker_model = None
+
+
+def _init_worker(model_path):
+    """工作进程初始化：以内存映射方式加载模型，多个进程共享同一份数组内存"""
+    global _worker_model
+    _worker_model = joblib.load(model_path, mmap_mode='r')
+
+
+def _predict_chunk(features):
+    """在工作进程中对一块数据做向量化预测"""
+    return _worker_model.predict(features)
+
+
+def read_chunks(source, chunksize=50000, table=None, query=None, columns=None):
+    """分块读取输入数据，内存占用与数据总量无关
+
+    Args:
+        source: CSV / Parquet 文件路径，或 SQLite 数据库文件（.db/.sqlite）
+        chunksize: 每块行数
+        table: SQLite 表名（与 query 二选一）
+        query: SQLite 查询语句
+        columns: 只读取这些列（CSV/Parquet）
+
+    Yields:
+        DataFrame
+    """
+    suffix = Path(source).suffix.lower()
+
+    if suffix == '.csv':
+        yield from pd.read_csv(source, chunksize=chunksize, usecols=columns)
+
+    elif suffix == '.parquet':
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(source, memory_map=True)
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+
+    elif suffix in ('.db', '.sqlite', '.sqlite3'):
+        if not (table or query):
+            raise ValueError("读取SQLite时需要指定 table 或 query")
+        conn = sqlite3.connect(source)
+        try:
+            # chunksize 模式下 pandas 使用 fetchmany 分批读取
+            yield from pd.read_sql_query(query or f'SELECT * FROM "{table}"', conn, chunksize=chunksize)
+        finally:
+            conn.close()
+
+    else:
+        raise ValueError(f"不支持的输入格式: {source}")
+
+
+class BatchPredictor:
+    """批量推理服务
+
+    - 模型从 MLDatabaseManager 的模型缓存中按实验ID加载
+    - 输入分块读取（CSV / Parquet / SQLite）
+    - 每块在进程池中向量化预测，同时处理的块数有上限，内存占用保持不变
+    - 预测结果通过 DatabaseManager.bulk_insert 批量写入；单输出模型写入 prediction 列，
+      多输出模型（预测结果为 (行数, 输出数)）每个输出一列：prediction_0、prediction_1 ...
+    """
+
+    def __init__(self, ml_db, experiment_id, n_workers=None, chunksize=50000):
+        model_path = ml_db.model_path(experiment_id)
+        if model_path is None:
+            raise ValueError(f"实验 {experiment_id} 没有可用的模型")
+        self.experiment_id = experiment_id
+        self.model_path = str(model_path)
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.chunksize = chunksize
+
+    def predict_chunks(self, chunks, features, as_frame=False):
+        """按输入顺序逐块返回 (数据块, 预测结果)
+
+        as_frame=True 时以 DataFrame 传入特征（模型训练时记录了特征名），否则传入 numpy 数组
+        """
+        def model_input(chunk):
+            return chunk[features] if as_frame else chunk[features].to_numpy()
+
+        if self.n_workers == 1:
+            _init_worker(self.model_path)
+            for chunk in chunks:
+                yield chunk, _predict_chunk(model_input(chunk))
+            return
+
+        with ProcessPoolExecutor(self.n_workers, initializer=_init_worker,
+                                 initargs=(self.model_path,)) as executor:
+            pending = deque()
+            for chunk in chunks:
+                pending.append((chunk, executor.submit(_predict_chunk, model_input(chunk))))
+                # 最多同时处理 2 倍进程数的数据块
+                if len(pending) >= 2 * self.n_workers:
+                    chunk, future = pending.popleft()
+                    yield chunk, future.result()
+            while pending:
+                chunk, future = pending.popleft()
+                yield chunk, future.result()
+
+    @staticmethod
+    def _as_outputs(predictions, n_rows):
+        """把一块预测结果整理为 (行数, 输出数) 的二维数组，形状不支持时报错"""
+        predictions = np.asarray(predictions)
+        if predictions.ndim == 1:
+            predictions = predictions.reshape(-1, 1)
+        if predictions.ndim != 2 or predictions.shape[0] != n_rows:
+            raise ValueError(f"预测结果的形状 {predictions.shape} 不支持："
+                             f"应为 ({n_rows},) 或 ({n_rows}, 输出数)")
+        return predictions
+
+    def run(self, source, output_db, table='predictions', features=None, id_column=None,
+            source_table=None, query=None):
+        """对整个输入数据做预测并写入 output_db
+
+        Args:
+            source: 输入文件（见 read_chunks）
+            output_db: DatabaseManager，预测结果写入的数据库
+            table: 结果表名
+            features: 特征列（默认使用模型记录的 feature_names_in_）
+            id_column: 输入中的主键列（默认使用行号）
+            source_table / query: 输入为SQLite时的表名或查询语句
+
+        Returns:
+            {'rows', 'seconds', 'rows_per_sec'}
+        """
+        model = joblib.load(self.model_path, mmap_mode='r')
+        as_frame = hasattr(model, 'feature_names_in_')
+        if features is None:
+            if not as_frame:
+                raise ValueError("模型没有记录特征名，请通过 features 指定特征列")
+            features = list(model.feature_names_in_)
+
+        columns = list(features) + ([id_column] if id_column and id_column not in features else [])
+        file_columns = columns if Path(source).suffix.lower() in ('.csv', '.parquet') else None
+        chunks = read_chunks(source, self.chunksize, table=source_table, query=query, columns=file_columns)
+
+        stats = {'rows': 0}
+        start = time.perf_counter()
+
+        # 先取第一块预测结果确定输出数，再建表
+        results = self.predict_chunks(chunks, list(features), as_frame)
+        first = next(results, None)
+        n_outputs = self._as_outputs(first[1], len(first[0])).shape[1] if first else 1
+        prediction_columns = ['prediction'] if n_outputs == 1 else [f'prediction_{i}' for i in range(n_outputs)]
+
+        with output_db.get_connection() as conn:
+            cursor = conn.cursor()
+            column_defs = ''.join(f',\n                    {output_db.quote(column)} DOUBLE PRECISION'
+                                  for column in prediction_columns)
+            cursor.execute(f'''
+                CREATE TABLE IF NOT EXISTS {output_db.quote(table)} (
+                    experiment_id INTEGER,
+                    row_id BIGINT{column_defs}
+                )
+            ''')
+            conn.commit()
+            # 结果表已存在时检查列是否匹配（例如之前写入过输出数不同的模型）
+            cursor.execute(f'SELECT * FROM {output_db.quote(table)} WHERE 1 = 0')
+            existing = {description[0] for description in cursor.description}
+            missing = [column for column in prediction_columns if column not in existing]
+            cursor.close()
+        if missing:
+            raise ValueError(f"结果表 {table} 缺少预测列 {missing}，模型有 {n_outputs} 个输出，请换一个结果表")
+
+        def prediction_rows():
+            for chunk, predictions in itertools.chain([first] if first else [], results):
+                outputs = self._as_outputs(predictions, len(chunk))
+                if outputs.shape[1] != n_outputs:
+                    raise ValueError(f"预测结果的输出数不一致: {outputs.shape[1]} != {n_outputs}")
+                if id_column:
+                    row_ids = chunk[id_column].tolist()
+                else:
+                    row_ids = range(stats['rows'], stats['rows'] + len(chunk))
+                yield from ((self.experiment_id, row_id, *values)
+                            for row_id, values in zip(row_ids, outputs.tolist()))
+
+                stats['rows'] += len(chunk)
+                elapsed = time.perf_counter() - start
+                print(f"⚡ 已预测 {stats['rows']:,} 行，{stats['rows'] / elapsed:,.0f} 行/秒")
+
+        # bulk_insert 按批从生成器取数据，不会一次性生成全部预测结果
+        output_db.bulk_insert(table, prediction_rows(), columns=['experiment_id', 'row_id'] + prediction_columns)
+
+        elapsed = time.perf_counter() - start
+        stats.update(seconds=elapsed, rows_per_sec=stats['rows'] / elapsed if elapsed else 0.0)
+        print(f"✅ 推理完成: {stats['rows']:,} 行，用时 {elapsed:.2f} 秒，{stats['rows_per_sec']:,.0f} 行/秒")
+        return stats
+
+
+def main():
+    """主函数 - 演示批量推理"""
+    print("🚀 机器学习批量推理演示")
+    print("=" * 60)
+
+    # 1. 训练并保存模型
+    print("\n1️⃣ 训练模型...")
+    ml_db = MLDatabaseManager('ml_experiments.db')
+    experiment_id = ml_db.run_linear_regression_experiment("批量推理模型")
+
+    # 2. 生成待预测的数据
+    print("\n2️⃣ 生成待预测数据...")
+    rng = np.random.RandomState(0)
+    data = pd.DataFrame(rng.randn(500000, 3), columns=['feature1', 'feature2', 'feature3'])
+    data.insert(0, 'id', np.arange(len(data)))
+    data.to_parquet('inference_input.parquet', index=False)
+
+    # 3. 分块并行预测，结果写入数据库
+    print("\n3️⃣ 批量推理...")
+    output_db = DatabaseManager('sqlite', database='ml_predictions.db')
+    predictor = BatchPredictor(ml_db, experiment_id, chunksize=100000)
+    predictor.run('inference_input.parquet', output_db,
+                  features=['feature1', 'feature2', 'feature3'], id_column='id')
+
+    # 4. 关闭连接
+    print("\n4️⃣ 关闭数据库连接...")
+    output_db.close()
+    ml_db.close()
+
+
+if __name__ == "__main__":
+    main()
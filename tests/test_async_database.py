@@ -0,0 +1,105 @@
+"""AsyncDatabaseManager 测试（aiosqlite）"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip('aiosqlite')
+
+from database_connection import AsyncDatabaseManager  # noqa: E402
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def open_db(tmp_path, **kwargs):
+    db = await AsyncDatabaseManager('sqlite', database=str(tmp_path / 'async.db'), **kwargs).open()
+    await db.execute('CREATE TABLE IF NOT EXISTS items (id INTEGER PRIMARY KEY, name TEXT)')
+    return db
+
+
+def test_iterate_reads_all_rows_in_batches(tmp_path):
+    async def scenario():
+        db = await open_db(tmp_path)
+        try:
+            await db.executemany('INSERT INTO items (name) VALUES (?)', [(f'item{i}',) for i in range(25)])
+            async with db.iterate('SELECT name FROM items ORDER BY id', batch_size=10) as rows:
+                return [row[0] async for row in rows]
+        finally:
+            await db.close()
+
+    assert run(scenario()) == [f'item{i}' for i in range(25)]
+
+
+def test_early_break_releases_connection(tmp_path):
+    async def scenario():
+        db = await open_db(tmp_path, pool_min=1, pool_max=1)
+        try:
+            await db.executemany('INSERT INTO items (name) VALUES (?)', [('a',), ('b',), ('c',)])
+            async with db.iterate('SELECT name FROM items ORDER BY id', batch_size=1) as rows:
+                async for row in rows:
+                    break
+            # 唯一的连接已经归还，下一次借用不会等待
+            return await asyncio.wait_for(db.fetchone('SELECT COUNT(*) FROM items'), timeout=2)
+        finally:
+            await db.close()
+
+    assert run(scenario()) == (3,)
+
+
+def test_transaction_rolls_back_on_exception(tmp_path):
+    async def scenario():
+        db = await open_db(tmp_path)
+        try:
+            with pytest.raises(ValueError):
+                async with db.transaction() as session:
+                    await session.execute("INSERT INTO items (name) VALUES ('lost')")
+                    raise ValueError('boom')
+            async with db.transaction() as session:
+                await session.execute("INSERT INTO items (name) VALUES ('kept')")
+            return await db.fetchall('SELECT name FROM items')
+        finally:
+            await db.close()
+
+    assert run(scenario()) == [('kept',)]
+
+
+def test_uncommitted_work_is_rolled_back_on_release(tmp_path):
+    async def scenario():
+        db = await open_db(tmp_path, pool_min=1, pool_max=1)
+        try:
+            async with db.acquire() as session:
+                # 直接在连接上执行且不提交，插入只存在于隐式事务中
+                await session.conn.execute("INSERT INTO items (name) VALUES ('pending')")
+                assert session.conn.in_transaction
+            async with db.acquire() as session:
+                assert not session.conn.in_transaction
+                return await session.fetchone('SELECT COUNT(*) FROM items')
+        finally:
+            await db.close()
+
+    assert run(scenario()) == (0,)
+
+
+def test_pool_min_connections_opened_and_grows_to_pool_max(tmp_path):
+    async def scenario():
+        db = await open_db(tmp_path, pool_min=1, pool_max=3)
+        try:
+            opened = len(db._sqlite_connections)
+            sessions = [db.acquire() for _ in range(3)]
+            for session in sessions:
+                await session.__aenter__()
+            grown = len(db._sqlite_connections)
+            for session in sessions:
+                await session.__aexit__(None, None, None)
+            return opened, grown
+        finally:
+            await db.close()
+
+    assert run(scenario()) == (1, 3)
+
+
+def test_invalid_pool_size_raises():
+    with pytest.raises(ValueError):
+        AsyncDatabaseManager('sqlite', pool_min=3, pool_max=2)
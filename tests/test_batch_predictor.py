@@ -0,0 +1,77 @@
+"""BatchPredictor 测试：单输出和多输出模型的预测结果写入"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+
+from database_connection import DatabaseManager
+from ml_database_integration import MLDatabaseManager
+from ml_inference import BatchPredictor
+
+
+@pytest.fixture
+def setup(tmp_path):
+    ml_db = MLDatabaseManager(str(tmp_path / 'ml.db'), model_store_dir=str(tmp_path / 'models'),
+                              dataset_dir=str(tmp_path / 'datasets'))
+    output_db = DatabaseManager('sqlite', database=str(tmp_path / 'predictions.db'))
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame(rng.normal(size=(25, 2)), columns=['f1', 'f2'])
+    data.insert(0, 'id', np.arange(100, 125))
+    source = tmp_path / 'input.csv'
+    data.to_csv(source, index=False)
+    yield ml_db, output_db, data, str(source)
+    output_db.close()
+    ml_db.close()
+
+
+def train(ml_db, X, y):
+    model, key = ml_db.model_store.fit(LinearRegression(), X, y)
+    experiment_id = ml_db.save_experiment('推理测试', 'LinearRegression', 'sample', {}, {}, model_key=key)
+    return model, experiment_id
+
+
+def stored(output_db, table):
+    with output_db.get_connection() as conn:
+        return pd.read_sql_query(f'SELECT * FROM "{table}" ORDER BY row_id', conn)
+
+
+def test_single_output_writes_prediction_column(setup):
+    ml_db, output_db, data, source = setup
+    X = data[['f1', 'f2']].to_numpy()
+    model, experiment_id = train(ml_db, X, X @ [1.0, -2.0])
+
+    predictor = BatchPredictor(ml_db, experiment_id, n_workers=1, chunksize=10)
+    assert predictor.run(source, output_db, features=['f1', 'f2'], id_column='id')['rows'] == 25
+
+    result = stored(output_db, 'predictions')
+    assert list(result.columns) == ['experiment_id', 'row_id', 'prediction']
+    assert result['row_id'].tolist() == data['id'].tolist()
+    np.testing.assert_allclose(result['prediction'], model.predict(X))
+
+
+def test_multi_output_writes_one_column_per_output(setup):
+    ml_db, output_db, data, source = setup
+    X = data[['f1', 'f2']].to_numpy()
+    model, experiment_id = train(ml_db, X, np.column_stack([X @ [1.0, 0.5], X @ [-1.0, 2.0], X[:, 0]]))
+
+    predictor = BatchPredictor(ml_db, experiment_id, n_workers=1, chunksize=10)
+    predictor.run(source, output_db, table='multi', features=['f1', 'f2'], id_column='id')
+
+    result = stored(output_db, 'multi')
+    assert list(result.columns) == ['experiment_id', 'row_id', 'prediction_0', 'prediction_1', 'prediction_2']
+    np.testing.assert_allclose(result[['prediction_0', 'prediction_1', 'prediction_2']], model.predict(X))
+
+    # 已有的单输出结果表不能写入多输出预测
+    with output_db.get_connection() as conn:
+        conn.execute('CREATE TABLE predictions (experiment_id INTEGER, row_id BIGINT, prediction DOUBLE PRECISION)')
+        conn.commit()
+    with pytest.raises(ValueError, match='缺少预测列'):
+        predictor.run(source, output_db, table='predictions', features=['f1', 'f2'], id_column='id')
+
+
+def test_unsupported_prediction_shape_raises():
+    with pytest.raises(ValueError, match='形状'):
+        BatchPredictor._as_outputs(np.zeros((4, 2, 2)), 4)
+    with pytest.raises(ValueError, match='形状'):
+        BatchPredictor._as_outputs(np.zeros(3), 4)
@@ -0,0 +1,50 @@
+"""DatabaseManager.bulk_insert 测试：冲突处理、COPY 编码和多次写入的事务"""
+
+import pytest
+
+from database_connection import DatabaseManager
+
+
+@pytest.fixture
+def db(tmp_path):
+    manager = DatabaseManager('sqlite', database=str(tmp_path / 'bulk.db'))
+    manager.create_tables()
+    return manager
+
+
+def count(db, table):
+    with db.get_connection() as conn:
+        return conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+
+
+def test_update_with_only_conflict_columns_does_nothing(db):
+    assert db._conflict_clause(['username'], 'update', ['username']) == ' ON CONFLICT ("username") DO NOTHING'
+
+    db.bulk_insert('users', [('admin', 'a@example.com', 'x')], columns=['username', 'email', 'password_hash'])
+    with db.get_connection() as conn:
+        conn.execute('CREATE TABLE tags (name TEXT PRIMARY KEY)')
+        conn.commit()
+    db.bulk_insert('tags', [('python',)], columns=['name'])
+    db.bulk_insert('tags', [('python',), ('sql',)], columns=['name'],
+                   on_conflict='update', conflict_columns=['name'])
+    assert count(db, 'tags') == 2
+
+
+def test_copy_line_encodes_json_bytes_and_control_characters():
+    line = DatabaseManager._copy_line([
+        {'model': 'lr', 'note': 'a\tb'}, [1, 2], b'\x00\xff', 'x\ny\\z', None, True,
+    ])
+    assert line == ('{"model": "lr", "note": "a\\\\tb"}\t[1, 2]\t\\\\x00ff\tx\\ny\\\\z\t\\N\tt\n')
+    # 每行字段数不受值中的制表符和换行影响
+    assert len(line.rstrip('\n').split('\t')) == 6
+
+
+def test_insert_sample_data_rolls_back_as_one_transaction(db):
+    # 让第二次写入失败：实验表缺失
+    with db.get_connection() as conn:
+        conn.execute('DROP TABLE experiments')
+        conn.commit()
+
+    db.insert_sample_data()
+
+    assert count(db, 'users') == 0
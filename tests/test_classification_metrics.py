@@ -0,0 +1,52 @@
+"""混淆矩阵与分类指标测试"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'machine_learning', 'basics'))
+
+from classification import ConfusionMatrixAccumulator, confusion_matrices, evaluate_predictions  # noqa: E402
+
+
+def test_matches_sklearn_confusion_matrix():
+    from sklearn.metrics import confusion_matrix
+
+    rng = np.random.default_rng(0)
+    y_true = rng.integers(0, 3, 500)
+    y_pred = rng.integers(0, 3, 500)
+    np.testing.assert_array_equal(confusion_matrices(y_true, y_pred), confusion_matrix(y_true, y_pred))
+
+
+def test_stacked_predictions_give_one_matrix_per_model():
+    y_true = np.array([0, 1, 1, 0])
+    y_pred = np.array([[0, 1, 1, 0], [1, 1, 0, 0]])
+    cm = confusion_matrices(y_true, y_pred)
+    assert cm.shape == (2, 2, 2)
+    np.testing.assert_array_equal(cm[0], [[2, 0], [0, 2]])
+    np.testing.assert_array_equal(cm[1], [[1, 1], [1, 1]])
+
+
+def test_float_labels_are_accepted():
+    metrics = evaluate_predictions([0., 1., 1.], np.array([0., 1., 0.]))
+    np.testing.assert_array_equal(metrics['confusion_matrix'], [[1, 0], [1, 1]])
+
+
+@pytest.mark.parametrize('y_pred', [[0, 2, 1], [0, -1, 1], [0., 0.5, 1.], ['a', 'b', 'a']])
+def test_invalid_labels_raise_value_error(y_pred):
+    with pytest.raises(ValueError):
+        confusion_matrices([0, 1, 1], y_pred, n_classes=2)
+
+
+def test_out_of_range_label_does_not_leak_into_next_model():
+    acc = ConfusionMatrixAccumulator(n_classes=2, n_models=2)
+    with pytest.raises(ValueError):
+        acc.update([0, 1], [[0, 2], [0, 1]])
+    assert acc.matrix.sum() == 0
+
+
+def test_mismatched_lengths_raise_value_error():
+    with pytest.raises(ValueError):
+        confusion_matrices([0, 1, 1], [0, 1])
@@ -0,0 +1,136 @@
+"""ConnectionPool 借出/归还测试（使用 SQLite 连接代替 MySQL/PostgreSQL）"""
+
+import sqlite3
+import threading
+
+import pytest
+
+from database_connection import ConnectionPool, SQLiteConnectionPool
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / 'pool.db'
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)')
+    conn.commit()
+    conn.close()
+    return path
+
+
+def make_pool(db_path, **kwargs):
+    return ConnectionPool(lambda: sqlite3.connect(db_path, check_same_thread=False), **kwargs)
+
+
+def test_release_rolls_back_open_transaction(db_path):
+    pool = make_pool(db_path, min_size=1, max_size=1)
+
+    with pool.connection() as conn:
+        conn.execute("INSERT INTO items (name) VALUES ('uncommitted')")
+        assert conn.in_transaction
+
+    # 同一个连接被复用，未提交的事务已在归还时回滚
+    with pool.connection() as reused:
+        assert reused is conn
+        assert not reused.in_transaction
+        assert reused.execute('SELECT COUNT(*) FROM items').fetchone()[0] == 0
+    pool.close_all()
+
+
+def test_committed_work_survives_release(db_path):
+    pool = make_pool(db_path)
+    with pool.connection() as conn:
+        conn.execute("INSERT INTO items (name) VALUES ('committed')")
+        conn.commit()
+    with pool.connection() as conn:
+        assert conn.execute('SELECT name FROM items').fetchall() == [('committed',)]
+    pool.close_all()
+
+
+def test_exception_rolls_back_and_reraises(db_path):
+    pool = make_pool(db_path, min_size=1, max_size=1)
+    with pytest.raises(ValueError):
+        with pool.connection() as conn:
+            conn.execute("INSERT INTO items (name) VALUES ('failed')")
+            raise ValueError('boom')
+
+    with pool.connection() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM items').fetchone()[0] == 0
+    pool.close_all()
+
+
+class BrokenConnection:
+    """回滚失败的连接"""
+
+    def __init__(self):
+        self.closed = False
+
+    def rollback(self):
+        raise sqlite3.OperationalError('connection lost')
+
+    def close(self):
+        self.closed = True
+
+
+def test_connection_closed_when_rollback_fails():
+    created = []
+
+    def connect():
+        created.append(BrokenConnection())
+        return created[-1]
+
+    pool = ConnectionPool(connect, min_size=0, max_size=1)
+    conn = pool.acquire()
+    pool.release(conn)
+    assert conn.closed
+
+    # 失效连接不会再被借出
+    assert pool.acquire() is not conn
+    assert len(created) == 2
+
+
+def test_checkout_waits_for_release_and_times_out(db_path):
+    pool = make_pool(db_path, min_size=0, max_size=1, checkout_timeout=0.2)
+    conn = pool.acquire()
+
+    with pytest.raises(TimeoutError):
+        pool.acquire()
+
+    # 其他线程归还后，等待中的借出请求拿到同一个连接
+    timer = threading.Timer(0.05, pool.release, args=(conn,))
+    pool.checkout_timeout = 2
+    timer.start()
+    assert pool.acquire() is conn
+    timer.join()
+    pool.close_all()
+
+
+def test_sqlite_pool_release_rolls_back_open_transaction(db_path):
+    pool = SQLiteConnectionPool(str(db_path))
+
+    with pool.connection() as conn:
+        conn.execute("INSERT INTO items (name) VALUES ('uncommitted')")
+        assert conn.in_transaction
+
+    # 线程连接常驻复用，未提交的事务已在归还时回滚
+    with pool.connection() as reused:
+        assert reused is conn
+        assert not reused.in_transaction
+        assert reused.execute('SELECT COUNT(*) FROM items').fetchone()[0] == 0
+    pool.close_all()
+
+
+def test_sqlite_pool_nested_release_keeps_outer_transaction(db_path):
+    pool = SQLiteConnectionPool(str(db_path))
+
+    with pool.connection() as outer:
+        outer.execute("INSERT INTO items (name) VALUES ('outer')")
+        with pool.connection() as inner:
+            assert inner is outer
+        # 内层归还不回滚外层事务
+        assert outer.in_transaction
+        outer.commit()
+
+    with pool.connection() as conn:
+        assert conn.execute('SELECT name FROM items').fetchall() == [('outer',)]
+    pool.close_all()
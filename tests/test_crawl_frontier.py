@@ -0,0 +1,51 @@
+"""CrawlFrontier 测试：并发请求同一主机时只获取一次 robots.txt"""
+
+import asyncio
+import os
+import sys
+
+import aiohttp
+from aiohttp import web
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'web_scraping'))
+
+from job_spider import CrawlFrontier  # noqa: E402
+
+
+async def concurrent_checks(status=200):
+    calls = []
+
+    async def robots(request):
+        calls.append(request.path)
+        await asyncio.sleep(0.05)
+        return web.Response(status=status, text='User-agent: *\nDisallow: /private/\n')
+
+    app = web.Application()
+    app.router.add_get('/robots.txt', robots)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    base_url = f'http://127.0.0.1:{runner.addresses[0][1]}'
+
+    frontier = CrawlFrontier()
+    try:
+        async with aiohttp.ClientSession() as session:
+            urls = [f'{base_url}/jobs/{i}.html' for i in range(10)] + [f'{base_url}/private/1.html']
+            allowed = await asyncio.gather(*(frontier.allowed(session, url) for url in urls))
+    finally:
+        await runner.cleanup()
+    return allowed, calls
+
+
+def test_concurrent_first_requests_fetch_robots_once():
+    allowed, calls = asyncio.run(concurrent_checks())
+    assert calls == ['/robots.txt']
+    assert allowed == [True] * 10 + [False]
+
+
+def test_concurrent_requests_share_failed_robots_result():
+    # 5xx 时暂时禁止抓取，等待中的请求直接使用这次的结果，不会各自重试
+    allowed, calls = asyncio.run(concurrent_checks(status=503))
+    assert calls == ['/robots.txt']
+    assert allowed == [False] * 11
@@ -0,0 +1,163 @@
+"""JobSpider 接口模式（fetch_mode = api）测试：本地桩服务器返回 JSON 固定数据"""
+
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+from aiohttp import web
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'web_scraping'))
+
+import job_spider  # noqa: E402
+from job_spider import JobSpider, SourceRegistry  # noqa: E402
+
+FIXTURE = {
+    'code': 0,
+    'zpData': {
+        'jobList': [
+            {
+                'encryptJobId': 'abc123',
+                'jobName': ' Python开发工程师 ',
+                'brandName': '示例科技',
+                'salaryDesc': '20-40K',
+                'cityName': '北京',
+                'jobExperience': '3-5年',
+                'jobDegree': '本科',
+                'skills': ['Python', 'Django'],
+            },
+            {
+                'encryptJobId': 987,
+                'jobName': '数据工程师',
+                'brandName': '示例数据',
+                'salaryDesc': 30000,
+                'cityName': '上海',
+                'skills': 'Spark',
+            },
+            # 缺少必填字段 company，应被过滤
+            {'encryptJobId': 'missing', 'jobName': '测试工程师'},
+        ]
+    }
+}
+
+
+def write_source(sources_dir, base_url):
+    config = {
+        'name': '桩服务器招聘',
+        'base_url': base_url,
+        'search_url': base_url + '/search?query={keyword}&page={page}',
+        'fetch_mode': 'api',
+        'rate_limit': {'request_delay': [0, 0], 'page_delay': [0, 0]},
+        'pagination': {'start': 1, 'max_pages': 1},
+        'max_items': 10,
+        'required': ['title', 'company'],
+        'api': {
+            'url': base_url + '/api/joblist.json',
+            'method': 'GET',
+            'params': {'query': '{keyword}', 'page': '{page}'},
+            'headers': {'Referer': base_url + '/jobs'},
+            'items_path': 'zpData.jobList',
+            'id_field': 'encryptJobId',
+            'detail_url': base_url + '/job_detail/{encryptJobId}.html',
+            'fields': {
+                'title': 'jobName',
+                'company': 'brandName',
+                'salary': 'salaryDesc',
+                'location': 'cityName',
+                'experience': 'jobExperience',
+                'education': 'jobDegree',
+                'tags': 'skills',
+            },
+        },
+    }
+    sources_dir.mkdir()
+    (sources_dir / 'stub.json').write_text(json.dumps(config, ensure_ascii=False), encoding='utf-8')
+
+
+async def crawl_stub(tmp_path):
+    requests = []
+
+    async def robots(request):
+        return web.Response(text='User-agent: *\nAllow: /\n')
+
+    async def joblist(request):
+        requests.append(request)
+        return web.Response(body=json.dumps(FIXTURE, ensure_ascii=False).encode('utf-8'),
+                            content_type='application/json')
+
+    app = web.Application()
+    app.router.add_get('/robots.txt', robots)
+    app.router.add_get('/api/joblist.json', joblist)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = runner.addresses[0][1]
+
+    try:
+        base_url = f'http://127.0.0.1:{port}'
+        write_source(tmp_path / 'sources', base_url)
+        spider = JobSpider(db_path=str(tmp_path / 'jobs.db'), sources_dir=str(tmp_path / 'sources'))
+        spider.request_delay = (0, 0)
+        try:
+            jobs = await spider.crawl_source('stub', 'Python')
+        finally:
+            await spider.close()
+    finally:
+        await runner.cleanup()
+    return base_url, jobs, requests
+
+
+def test_api_mode_maps_fields_from_stub_server(tmp_path):
+    base_url, jobs, requests = asyncio.run(crawl_stub(tmp_path))
+
+    # 请求参数中的占位符被替换，配置的请求头被发送
+    assert len(requests) == 1
+    assert dict(requests[0].query) == {'query': 'Python', 'page': '1'}
+    assert requests[0].headers['Referer'] == base_url + '/jobs'
+    assert 'application/json' in requests[0].headers['Accept']
+
+    assert [job['job_id'] for job in jobs] == ['stub_abc123', 'stub_987']
+    first, second = jobs
+    assert first['title'] == 'Python开发工程师'
+    assert first['company'] == '示例科技'
+    assert first['salary'] == '20-40K'
+    assert first['location'] == '北京'
+    assert first['experience'] == '3-5年'
+    assert first['education'] == '本科'
+    assert first['tags'] == ['Python', 'Django']
+    assert first['url'] == base_url + '/job_detail/abc123.html'
+    assert first['source'] == '桩服务器招聘'
+    assert first['source_key'] == 'stub'
+
+    # 非字符串值转换为文本，单个标签包装为列表，缺失字段使用默认空值
+    assert second['salary'] == '30000'
+    assert second['tags'] == ['Spark']
+    assert second['experience'] == ''
+
+
+def test_json_responses_are_decoded_from_bytes_with_orjson():
+    orjson = pytest.importorskip('orjson')
+    assert job_spider.json_loads is orjson.loads
+    payload = json.dumps(FIXTURE, ensure_ascii=False).encode('utf-8')
+    assert job_spider.json_loads(payload) == FIXTURE
+
+
+def test_builtin_sources_default_to_html_with_api_opt_in():
+    registry = SourceRegistry()
+    for key in ('boss', 'lagou'):
+        config = registry.get(key)
+        assert config['fetch_mode'] == 'html'
+        assert 'api' in config
+
+
+def test_api_mode_rejects_selenium_render(tmp_path):
+    sources_dir = tmp_path / 'sources'
+    sources_dir.mkdir()
+    config = {'name': '渲染站点', 'base_url': 'https://example.com', 'render': 'selenium',
+              'fetch_mode': 'api', 'api': {'url': 'https://example.com/api'}}
+    (sources_dir / 'rendered.json').write_text(json.dumps(config), encoding='utf-8')
+
+    with pytest.raises(ValueError, match='selenium'):
+        SourceRegistry(str(sources_dir)).get('rendered')
@@ -0,0 +1,110 @@
+"""JobSpider 详情页重试测试：失败的详情页记录尝试次数和错误并重新入队"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'web_scraping'))
+
+from job_spider import JobSpider  # noqa: E402
+
+DETAIL_HTML = '<html><body><div class="desc">负责推荐系统</div></body></html>'
+
+
+def write_source(sources_dir, base_url):
+    config = {
+        'name': '桩服务器招聘',
+        'base_url': base_url,
+        'search_url': base_url + '/search?query={keyword}&page={page}',
+        'rate_limit': {'request_delay': [0, 0], 'page_delay': [0, 0]},
+        'selectors': {'item': '.job'},
+        'required': ['title', 'company'],
+        'detail': {'selectors': {'description': '.desc'}},
+    }
+    sources_dir.mkdir()
+    (sources_dir / 'stub.json').write_text(json.dumps(config, ensure_ascii=False), encoding='utf-8')
+
+
+def frontier_row(spider, url):
+    conn = sqlite3.connect(spider.db_path)
+    try:
+        return conn.execute('SELECT status, attempts, last_error FROM crawl_frontier WHERE url = ?',
+                            (url,)).fetchone()
+    finally:
+        conn.close()
+
+
+async def crawl_with_failures(tmp_path, failures, max_attempts):
+    calls = []
+
+    async def robots(request):
+        return web.Response(text='User-agent: *\nAllow: /\n')
+
+    async def detail(request):
+        calls.append(request.path)
+        if len(calls) <= failures:
+            return web.Response(status=503)
+        return web.Response(text=DETAIL_HTML, content_type='text/html')
+
+    app = web.Application()
+    app.router.add_get('/robots.txt', robots)
+    app.router.add_get('/jobs/1.html', detail)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    base_url = f'http://127.0.0.1:{runner.addresses[0][1]}'
+    url = base_url + '/jobs/1.html'
+    rows = []
+
+    try:
+        write_source(tmp_path / 'sources', base_url)
+        spider = JobSpider(db_path=str(tmp_path / 'jobs.db'), sources_dir=str(tmp_path / 'sources'),
+                           enrich_details=True, detail_max_attempts=max_attempts)
+        spider.request_delay = (0, 0)
+        spider.max_retries = 1
+        try:
+            job = {'job_id': 'stub_1', 'title': '算法工程师', 'company': '示例科技', 'url': url,
+                   'source': '桩服务器招聘', 'source_key': 'stub'}
+            await spider.save_job(job)
+            # 列表页发现的职位第一次补充详情
+            results = [await spider.enrich_job(job)]
+            rows.append(frontier_row(spider, url))
+            # 之后每次爬取从待抓取队列重试
+            for _ in range(3):
+                results.append(await spider.enrich_pending_urls(['stub']))
+                rows.append(frontier_row(spider, url))
+            description = await spider.db.fetchone('SELECT description FROM jobs WHERE job_id = ?', ('stub_1',))
+        finally:
+            await spider.close()
+    finally:
+        await runner.cleanup()
+    return results, rows, description, len(calls)
+
+
+def test_failed_detail_is_requeued_until_it_succeeds(tmp_path):
+    results, rows, description, calls = asyncio.run(crawl_with_failures(tmp_path, failures=2, max_attempts=3))
+
+    assert results[0] == 'failed'
+    assert rows[0] == ('pending', 1, '状态码: 503')
+    assert rows[1] == ('pending', 2, '状态码: 503')
+    # 第三次成功：已知的标题和公司沿用，补充描述
+    assert results[2] == {'updated': 1}
+    assert rows[2] == ('fetched', 3, None)
+    assert results[3] == {}
+    assert description[0] == '负责推荐系统'
+    assert calls == 3
+
+
+def test_detail_marked_failed_after_max_attempts(tmp_path):
+    results, rows, description, calls = asyncio.run(crawl_with_failures(tmp_path, failures=10, max_attempts=2))
+
+    assert rows[0] == ('pending', 1, '状态码: 503')
+    assert rows[1] == ('failed', 2, '状态码: 503')
+    assert rows[3] == ('failed', 2, '状态码: 503')
+    assert description[0] is None
+    assert calls == 2
@@ -0,0 +1,73 @@
+"""JobSpider 变化跟踪测试：旧版本写入的职位和站点清空的字段"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'web_scraping'))
+
+from job_spider import JobSpider  # noqa: E402
+
+JOB = {
+    'job_id': 'A_1', 'title': '数据工程师', 'company': '示例科技', 'salary': '20-30K',
+    'location': '北京', 'experience': '3-5年', 'education': '本科', 'description': '负责数据平台',
+    'tags': ['大数据', 'Spark'], 'url': 'https://example.com/jobs/1', 'source': 'A',
+}
+
+
+@pytest.fixture
+def spider(tmp_path):
+    return JobSpider(db_path=str(tmp_path / 'jobs.db'))
+
+
+def save(spider, job_data):
+    async def crawl():
+        try:
+            return await spider.save_job(job_data)
+        finally:
+            await spider.close()
+
+    return asyncio.run(crawl())
+
+
+def query(spider, sql):
+    conn = sqlite3.connect(spider.db_path)
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+def test_legacy_row_recrawled_unchanged_records_no_history(spider):
+    # 旧版本的写入方式：标签使用默认的 ASCII 转义，没有内容指纹
+    conn = sqlite3.connect(spider.db_path)
+    conn.execute('''
+        INSERT INTO jobs (job_id, title, company, salary, location, experience, education,
+                          description, tags, source, url)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (JOB['job_id'], JOB['title'], JOB['company'], JOB['salary'], JOB['location'],
+          JOB['experience'], JOB['education'], JOB['description'], json.dumps(JOB['tags']),
+          JOB['source'], JOB['url']))
+    conn.commit()
+    conn.close()
+
+    assert save(spider, dict(JOB)) == 'unchanged'
+    assert query(spider, 'SELECT COUNT(*) FROM job_history') == [(0,)]
+
+
+def test_cleared_fields_are_recorded_and_missing_fields_kept(spider):
+    assert save(spider, dict(JOB)) == 'inserted'
+
+    # 站点清空了薪资和标签；列表页没有提供描述
+    relisted = {**JOB, 'salary': '', 'tags': [], 'description': None}
+    assert save(spider, relisted) == 'updated'
+
+    assert query(spider, 'SELECT salary, tags, description FROM jobs') == [('', '[]', '负责数据平台')]
+    assert sorted(query(spider, 'SELECT field, old_value, new_value FROM job_history')) == [
+        ('salary', '20-30K', ''),
+        ('tags', '["大数据", "Spark"]', '[]'),
+    ]
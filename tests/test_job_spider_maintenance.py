@@ -0,0 +1,77 @@
+"""JobSpider 数据维护测试：过期标记与增量VACUUM"""
+
+import asyncio
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'web_scraping'))
+
+from job_spider import JobSpider  # noqa: E402
+
+
+@pytest.fixture
+def spider(tmp_path):
+    return JobSpider(db_path=str(tmp_path / 'jobs.db'), stale_after_crawls=2)
+
+
+def job(job_id, source='A'):
+    return {'job_id': job_id, 'title': '工程师', 'company': '公司', 'source': source}
+
+
+def run(spider, keyword, jobs, job_counts):
+    async def crawl():
+        await spider.start_crawl_run(keyword)
+        await spider.save_jobs(jobs)
+        await spider.record_source_results(job_counts)
+        await spider.finish_crawl_run(len(jobs))
+        await spider.close()
+
+    asyncio.run(crawl())
+
+
+def statuses(spider):
+    conn = sqlite3.connect(spider.db_path)
+    try:
+        return dict(conn.execute('SELECT job_id, status FROM jobs'))
+    finally:
+        conn.close()
+
+
+def test_expire_counts_only_successful_runs_of_same_keyword(spider):
+    run(spider, 'python', [job('1'), job('2')], {'A': 2})
+    run(spider, 'java', [job('3')], {'A': 1})   # 其他关键词
+    run(spider, 'python', [], {'A': 0})         # 空结果
+    run(spider, 'python', [job('1')], {'A': 1})
+    assert spider.expire_stale_jobs() == 0
+
+    run(spider, 'python', [job('1')], {'A': 1})
+    assert spider.expire_stale_jobs() == 1
+    assert statuses(spider) == {'1': 'active', '2': 'expired', '3': 'active'}
+
+
+def test_explicit_zero_is_not_treated_as_default(spider):
+    run(spider, 'python', [job('1')], {'A': 1})
+    run(spider, 'python', [job('2')], {'A': 1})
+    assert spider.expire_stale_jobs(max_missed_crawls=0) == 2
+
+
+def test_compact_database_frees_up_to_max_pages(spider):
+    conn = sqlite3.connect(spider.db_path)
+    conn.execute('CREATE TABLE filler (data BLOB)')
+    conn.executemany('INSERT INTO filler VALUES (?)', [(b'x' * 4000,) for _ in range(1500)])
+    conn.commit()
+    conn.execute('DELETE FROM filler')
+    conn.commit()
+    before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    conn.close()
+    assert before > 1000
+
+    spider.compact_database(max_pages=500)
+
+    conn = sqlite3.connect(spider.db_path)
+    after = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    conn.close()
+    assert before - after == pytest.approx(500, abs=5)
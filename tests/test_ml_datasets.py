@@ -0,0 +1,46 @@
+"""MLDatabaseManager 数据集版本测试：指纹算法与按名称加载"""
+
+import pandas as pd
+import pytest
+
+import ml_database_integration
+from ml_database_integration import MLDatabaseManager
+
+
+@pytest.fixture
+def db(tmp_path):
+    manager = MLDatabaseManager(str(tmp_path / 'ml.db'), model_store_dir=str(tmp_path / 'models'),
+                                dataset_dir=str(tmp_path / 'datasets'))
+    yield manager
+    manager.close()
+
+
+DF = pd.DataFrame({'x': [1.0, 2.0, 3.0], 'label': ['a', 'b', 'c']})
+
+
+def test_same_content_reuses_version_only_with_same_algorithm(db, monkeypatch):
+    assert db.save_dataset_info('prices', '房价', DF) == 'prices@1'
+    assert db.save_dataset_info('prices', '房价', DF) == 'prices@1'
+
+    # 换了哈希算法（如安装或卸载了 xxhash）：即使指纹文本相同也不复用
+    monkeypatch.setattr(ml_database_integration, 'HASH_ALGORITHM', 'other')
+    assert db.save_dataset_info('prices', '房价', DF) == 'prices@2'
+    assert db.connection.execute(
+        'SELECT version, hash_algorithm FROM datasets ORDER BY version').fetchall()[1] == (2, 'other')
+
+
+def test_load_by_name_falls_back_to_newest_stored_version(db):
+    db.save_dataset_info('prices', '房价', DF)
+    db.save_dataset_info('prices', '只记录元数据', DF.assign(x=DF['x'] * 2), store_data=False)
+
+    pd.testing.assert_frame_equal(db.load_dataset('prices'), DF)
+    with pytest.raises(KeyError, match='没有保存数据'):
+        db.load_dataset('prices@2')
+
+
+def test_load_by_name_without_stored_data_raises_clear_error(db):
+    db.save_dataset_info('meta_only', '只记录元数据', DF, store_data=False)
+    with pytest.raises(KeyError, match='所有版本都没有保存数据'):
+        db.load_dataset('meta_only')
+    with pytest.raises(KeyError, match='未找到'):
+        db.load_dataset('missing')
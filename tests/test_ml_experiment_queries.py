@@ -0,0 +1,55 @@
+"""MLDatabaseManager 实验查询测试：命名语句只注册一次，查询结果与过滤条件"""
+
+import pytest
+
+from ml_database_integration import MLDatabaseManager
+
+
+@pytest.fixture
+def db(tmp_path):
+    manager = MLDatabaseManager(str(tmp_path / 'ml.db'), model_store_dir=str(tmp_path / 'models'),
+                                dataset_dir=str(tmp_path / 'datasets'))
+    experiments = [('a', 'linear', 0.5, 0.80), ('b', 'linear', 0.2, 0.95), ('c', 'tree', 0.1, 0.70),
+                   ('d', 'tree', 0.3, None)]
+    for name, model_type, mse, r2 in experiments:
+        cursor = manager.connection.execute(
+            "INSERT INTO experiments (experiment_name, model_type, status) VALUES (?, ?, 'completed')",
+            (name, model_type))
+        metrics = {'mean_squared_error': mse}
+        if r2 is not None:
+            metrics['r2_score'] = r2
+        manager.log_metrics(cursor.lastrowid, metrics)
+    yield manager
+    manager.connection.close()
+
+
+def test_queries_do_not_register_new_statements(db):
+    statements = dict(db.profiler.statements)
+    db.rank_experiments('mean_squared_error', filters={'r2_score': ('>=', 0.75)})
+    db.rank_experiments('r2_score', ascending=False)
+    db.metrics_table(('mean_squared_error',))
+    db.metrics_table(('mean_squared_error', 'r2_score', 'f1'))
+    assert db.profiler.statements == statements
+
+
+def test_rank_experiments_order_filters_and_model_type(db):
+    names = [row['experiment_name'] for row in db.rank_experiments('mean_squared_error')]
+    assert names == ['c', 'b', 'd', 'a']
+
+    best = db.rank_experiments('mean_squared_error', ascending=False, filters={'r2_score': ('>=', 0.75)})
+    assert [row['experiment_name'] for row in best] == ['a', 'b']
+    assert best[0]['mean_squared_error'] == 0.5
+
+    tree = db.rank_experiments('mean_squared_error', model_type='tree', limit=1)
+    assert [row['experiment_name'] for row in tree] == ['c']
+
+    with pytest.raises(ValueError):
+        db.rank_experiments('mean_squared_error', filters={'r2_score': ('LIKE', 1)})
+
+
+def test_metrics_table_pivots_requested_metrics(db):
+    table = db.metrics_table(('mean_squared_error', 'r2_score', 'f1'), limit=3)
+    assert [row['experiment_name'] for row in table] == ['d', 'c', 'b']
+    assert table[0] == {'experiment_name': 'd', 'model_type': 'tree', 'status': 'completed',
+                        'mean_squared_error': 0.3, 'r2_score': None, 'f1': None}
+    assert table[2]['r2_score'] == 0.95
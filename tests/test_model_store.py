@@ -0,0 +1,54 @@
+"""ModelStore 测试：Windows 上被映射的模型文件不能删除或替换"""
+
+import os
+from pathlib import Path
+
+import numpy as np
+from sklearn.linear_model import LinearRegression
+
+from ml_database_integration import ModelStore
+
+
+def fitted(seed):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(50, 3))
+    return LinearRegression().fit(X, X @ [1.0, 2.0, 3.0]), X
+
+
+def test_evict_skips_files_in_use(tmp_path, monkeypatch):
+    store = ModelStore(tmp_path, max_bytes=0)
+    model, _ = fitted(0)
+    store.put('old', model)
+    os.utime(store.path('old'), (0, 0))
+
+    unlink = Path.unlink
+
+    def locked_unlink(self, missing_ok=False):
+        if self.stem == 'old':
+            raise PermissionError('file is mapped')
+        return unlink(self, missing_ok=missing_ok)
+
+    monkeypatch.setattr(Path, 'unlink', locked_unlink)
+    store.put('new', model)
+    assert store.path('old').exists() and store.path('new').exists()
+
+    # 模型释放后，下一次淘汰删除旧文件
+    monkeypatch.setattr(Path, 'unlink', unlink)
+    store.evict(keep='new')
+    assert not store.path('old').exists()
+
+
+def test_put_keeps_existing_file_when_replace_is_denied(tmp_path, monkeypatch):
+    store = ModelStore(tmp_path)
+    model, X = fitted(1)
+    store.put('key', model)
+    cached = store.get('key')
+
+    def denied(src, dst):
+        raise PermissionError('file is mapped')
+
+    monkeypatch.setattr(os, 'replace', denied)
+    store.put('key', model)
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['key.joblib']
+    np.testing.assert_allclose(cached.predict(X), model.predict(X))
@@ -0,0 +1,63 @@
+"""StreamingLinearRegression 测试：normal / sgd 求解器与 sklearn 的结果对比"""
+
+import os
+import sys
+import warnings
+
+import numpy as np
+import pytest
+from sklearn.exceptions import ConvergenceWarning
+from sklearn.linear_model import LinearRegression, Ridge
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'machine_learning', 'basics'))
+
+from linear_regression import StreamingLinearRegression  # noqa: E402
+
+
+def make_data(n_samples=20_000, n_features=40, noise=0.1, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.standard_normal((n_samples, n_features)) + 3
+    y = X @ rng.uniform(-3, 3, n_features) + 1 + noise * rng.standard_normal(n_samples)
+    return X, y
+
+
+def test_normal_solver_matches_linear_regression():
+    X, y = make_data(n_features=5)
+    model = StreamingLinearRegression(dtype=np.float64, batch_size=1000).fit(X, y)
+    reference = LinearRegression().fit(X, y)
+    assert model.solver_ == 'normal'
+    np.testing.assert_allclose(model.coef_, reference.coef_, atol=1e-8)
+    assert model.intercept_ == pytest.approx(reference.intercept_, abs=1e-6)
+
+
+@pytest.mark.parametrize('alpha', [1.0, 2000.0])
+def test_sgd_above_feature_threshold_matches_ridge(alpha):
+    X, y = make_data()
+    model = StreamingLinearRegression(alpha=alpha, max_normal_features=10, batch_size=5000)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', ConvergenceWarning)
+        model.fit(X, y)
+    reference = Ridge(alpha=alpha).fit(X, y)
+
+    assert model.solver_ == 'sgd'
+    np.testing.assert_allclose(model.coef_, reference.coef_, atol=0.02)
+    assert model.intercept_ == pytest.approx(reference.intercept_, abs=0.2)
+    # 惩罚项按整个数据集缩放：收缩程度与 Ridge 一致
+    assert np.abs(model.coef_).sum() == pytest.approx(np.abs(reference.coef_).sum(), rel=0.01)
+    mse = np.mean((model.predict(X) - y) ** 2)
+    assert mse == pytest.approx(np.mean((reference.predict(X) - y) ** 2), rel=0.1)
+
+
+def test_sgd_warns_when_not_converged():
+    X, y = make_data(n_samples=2000)
+    with pytest.warns(ConvergenceWarning):
+        StreamingLinearRegression(solver='sgd', n_epochs=1).fit(X, y)
+
+
+def test_sgd_epochs_use_different_orders():
+    X, y = make_data(n_samples=1000, n_features=3)
+    model = StreamingLinearRegression(solver='sgd', batch_size=100)
+    rng = np.random.default_rng(0)
+    first = np.concatenate([batch for batch, _ in model._iter_batches(X, y, rng)])
+    second = np.concatenate([batch for batch, _ in model._iter_batches(X, y, rng)])
+    assert not np.array_equal(first, second)
@@ -4,17 +4,25 @@
 import asyncio
 import aiohttp
 import json
+import os
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import re
 import time
+import hashlib
+import gzip
+import importlib
 import random
 from urllib.parse import urljoin, urlparse
+from urllib.robotparser import RobotFileParser
+from xml.etree import ElementTree
 import matplotlib.pyplot as plt
 import seaborn as sns
 from collections import defaultdict
+from contextlib import asynccontextmanager
 import sqlite3
+import sys
 from typing import List, Dict, Optional
 import logging
 from fake_useragent import UserAgent
@@ -26,100 +34,586 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+# 异步数据库访问层（仓库根目录的 database_connection.py）
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database_connection import AsyncDatabaseManager
+
+# JSON解码：优先使用 orjson（直接解析bytes，速度更快）
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 数据源配置目录（每个站点一个 JSON/YAML 文件，文件名即数据源标识）
+DEFAULT_SOURCES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sources')
+
+
+class SourceRegistry:
+    """数据源插件注册表
+
+    只在首次访问时扫描配置目录，单个数据源的配置在被用到时才解析，
+    未启用的站点不会被加载。
+    """
+
+    CONFIG_SUFFIXES = ('.json', '.yaml', '.yml')
+
+    def __init__(self, config_dir: str = DEFAULT_SOURCES_DIR, enabled: Optional[List[str]] = None):
+        self.config_dir = config_dir
+        self.enabled = list(enabled) if enabled is not None else None
+        self._paths = None   # 数据源标识 -> 配置文件路径
+        self._configs = {}   # 已加载的配置缓存
+
+    def _discover(self) -> Dict[str, str]:
+        """扫描配置目录（只读取文件名，不解析内容）"""
+        if self._paths is None:
+            self._paths = {}
+            if os.path.isdir(self.config_dir):
+                for filename in sorted(os.listdir(self.config_dir)):
+                    key, suffix = os.path.splitext(filename)
+                    if suffix in self.CONFIG_SUFFIXES:
+                        self._paths[key] = os.path.join(self.config_dir, filename)
+        return self._paths
+
+    def _load(self, key: str) -> Dict:
+        """解析单个配置文件"""
+        path = self._discover()[key]
+        with open(path, 'r', encoding='utf-8') as f:
+            if path.endswith('.json'):
+                config = json.load(f)
+            else:
+                try:
+                    import yaml
+                except ImportError:
+                    raise ImportError("读取YAML数据源配置需要安装: pip install pyyaml")
+                config = yaml.safe_load(f)
+
+        config.setdefault('key', key)
+        config.setdefault('render', 'http')
+        config.setdefault('fetch_mode', 'html')
+        config.setdefault('priority', 100)
+        config.setdefault('rate_limit', {})
+        config.setdefault('pagination', {})
+        config.setdefault('defaults', {})
+        config.setdefault('required', ['title', 'company'])
+
+        if config['fetch_mode'] not in ('html', 'api'):
+            raise ValueError(f"数据源 {key} 的 fetch_mode 只能是 html 或 api: {config['fetch_mode']}")
+        if config['fetch_mode'] == 'api':
+            if 'api' not in config:
+                raise ValueError(f"数据源 {key} 使用接口模式，但缺少 api 配置")
+            # 接口模式直接请求JSON，不经过浏览器，需要浏览器渲染的站点不能开启
+            if config['render'] == 'selenium':
+                raise ValueError(f"数据源 {key} 的 render 为 selenium，不能与 fetch_mode=api 同时使用")
+        return config
+
+    def get(self, key: str) -> Optional[Dict]:
+        """按标识获取数据源配置，首次访问时才加载"""
+        if key not in self._discover():
+            return None
+        if key not in self._configs:
+            self._configs[key] = self._load(key)
+        return self._configs[key]
+
+    def keys(self) -> List[str]:
+        """所有可用的数据源标识"""
+        return list(self._discover().keys())
+
+    def select(self, names: Optional[List[str]] = None) -> List[str]:
+        """返回本次要爬取的数据源，按优先级排序
+
+        Args:
+            names: 本次运行指定的数据源，为空时使用注册表的默认启用列表
+        """
+        names = names if names is not None else self.enabled
+        if names is None:
+            names = self.keys()
+
+        selected = []
+        for name in names:
+            if self.get(name) is None:
+                logger.warning(f"未找到数据源配置: {name}")
+            else:
+                selected.append(name)
+        return sorted(selected, key=lambda name: self.get(name)['priority'])
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._discover()
+
+
+class CrawlFrontier:
+    """爬取边界：robots.txt 策略缓存、按主机限速和站点地图（sitemap）发现
+
+    robots.txt 按主机缓存 robots_ttl 秒，其中的 Crawl-delay 会参与该主机的请求间隔计算；
+    robots.txt 因服务器错误（5xx）或网络问题无法获取时按 RFC 9309 暂时禁止抓取该主机，robots_retry 秒后重试；
+    站点地图中发现的详情页写入 crawl_frontier 表，lastmod 未变化的页面不会重复入队；
+    抓取失败的详情页记录尝试次数和最后的错误并重新入队，失败 max_attempts 次后标记为 failed。
+    只用 robots.txt 检查和限速时可以不传 db_path（此时不能使用待抓取队列）。
+    """
+
+    SITEMAP_NS = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+
+    def __init__(self, db_path: Optional[str] = None, user_agent: str = '*', robots_ttl: int = 24 * 3600,
+                 detail_concurrency: int = 2, robots_retry: int = 300, max_attempts: int = 3):
+        self.db_path = db_path
+        self.user_agent = user_agent
+        self.robots_ttl = robots_ttl
+        self.robots_retry = robots_retry
+        self.detail_concurrency = detail_concurrency
+        self.max_attempts = max_attempts
+        self._robots = {}        # 主机 -> (RobotFileParser, 获取时间)
+        self._host_locks = {}    # 主机 -> asyncio.Lock
+        self._robots_locks = {}  # 主机 -> asyncio.Lock（获取 robots.txt）
+        self._last_request = {}  # 主机 -> 上次请求时间
+        self._active_search = 0  # 正在进行的列表页请求数
+        self._search_idle = None
+        self._detail_semaphore = None
+
+    def _idle_event(self) -> asyncio.Event:
+        if self._search_idle is None:
+            self._search_idle = asyncio.Event()
+            self._search_idle.set()
+        return self._search_idle
+
+    @asynccontextmanager
+    async def search_slot(self):
+        """列表页请求（高优先级）：进行期间详情页请求暂停"""
+        self._active_search += 1
+        self._idle_event().clear()
+        try:
+            yield
+        finally:
+            self._active_search -= 1
+            if self._active_search == 0:
+                self._idle_event().set()
+
+    @asynccontextmanager
+    async def detail_slot(self):
+        """详情页请求（低优先级）：受独立并发上限约束，并等待列表页请求空闲"""
+        if self._detail_semaphore is None:
+            self._detail_semaphore = asyncio.Semaphore(self.detail_concurrency)
+        async with self._detail_semaphore:
+            await self._idle_event().wait()
+            yield
+
+    @staticmethod
+    def host_of(url: str) -> str:
+        parsed = urlparse(url)
+        return f"{parsed.scheme}://{parsed.netloc}"
+
+    async def get_robots(self, session, url: str) -> RobotFileParser:
+        """获取（或从缓存读取）主机的 robots.txt 策略
+
+        同一主机同时只有一个请求去获取 robots.txt，并发的其他请求等待后直接使用缓存结果。
+        """
+        host = self.host_of(url)
+        cached = self._robots.get(host)
+        if cached and time.time() - cached[1] < self.robots_ttl:
+            return cached[0]
+
+        lock = self._robots_locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            # 等待期间其他请求可能已经获取过
+            cached = self._robots.get(host)
+            if cached and time.time() - cached[1] < self.robots_ttl:
+                return cached[0]
+            return await self._fetch_robots(session, host, cached)
+
+    async def _fetch_robots(self, session, host: str, cached: Optional[tuple]) -> RobotFileParser:
+        """请求并解析 robots.txt，结果写入缓存"""
+        parser = RobotFileParser(f"{host}/robots.txt")
+        try:
+            async with session.get(f"{host}/robots.txt", timeout=15) as response:
+                if response.status == 200:
+                    parser.parse((await response.text()).splitlines())
+                elif response.status in (401, 403):
+                    parser.disallow_all = True
+                elif response.status >= 500:
+                    raise aiohttp.ClientResponseError(response.request_info, response.history,
+                                                      status=response.status, message=response.reason)
+                else:
+                    # 其他4xx：robots.txt 不存在，允许抓取
+                    parser.allow_all = True
+        except Exception as e:
+            # 服务器错误或无法访问：沿用上一次的策略，没有时暂时禁止抓取，robots_retry 秒后重试
+            logger.warning(f"获取 robots.txt 失败: {host} - {e}")
+            if cached:
+                parser = cached[0]
+            else:
+                parser.disallow_all = True
+            self._robots[host] = (parser, time.time() - self.robots_ttl + self.robots_retry)
+            return parser
+
+        self._robots[host] = (parser, time.time())
+        return parser
+
+    async def allowed(self, session, url: str) -> bool:
+        """robots.txt 是否允许抓取该URL"""
+        parser = await self.get_robots(session, url)
+        return parser.can_fetch(self.user_agent, url)
+
+    def crawl_delay(self, url: str) -> float:
+        """robots.txt 中声明的 Crawl-delay / Request-rate（秒）"""
+        cached = self._robots.get(self.host_of(url))
+        if not cached:
+            return 0
+        parser = cached[0]
+        delay = parser.crawl_delay(self.user_agent) or 0
+        rate = parser.request_rate(self.user_agent)
+        if rate and rate.requests:
+            delay = max(delay, rate.seconds / rate.requests)
+        return float(delay)
+
+    async def wait_turn(self, url: str, min_interval: float = 0):
+        """按主机限速：同一主机两次请求之间至少间隔 max(min_interval, Crawl-delay) 秒"""
+        host = self.host_of(url)
+        lock = self._host_locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            interval = max(min_interval, self.crawl_delay(url))
+            elapsed = time.monotonic() - self._last_request.get(host, 0)
+            if elapsed < interval:
+                await asyncio.sleep(interval - elapsed)
+            self._last_request[host] = time.monotonic()
+
+    async def _fetch_sitemap(self, session, url: str) -> Optional[bytes]:
+        try:
+            await self.wait_turn(url)
+            async with session.get(url, timeout=30) as response:
+                if response.status == 200:
+                    body = await response.read()
+                    return gzip.decompress(body) if url.endswith('.gz') else body
+                logger.warning(f"获取站点地图失败: {url} - 状态码: {response.status}")
+        except Exception as e:
+            logger.warning(f"获取站点地图失败: {url} - {e}")
+        return None
+
+    async def discover_sitemap_urls(self, session, source_key: str, base_url: str,
+                                    url_pattern: Optional[str] = None, max_urls: int = 500) -> int:
+        """读取 robots.txt 中声明的站点地图，把新增或 lastmod 更新的详情页加入待抓取队列
+
+        Returns:
+            新入队的URL数量
+        """
+        parser = await self.get_robots(session, base_url)
+        pending_sitemaps = list(parser.site_maps() or [f"{self.host_of(base_url)}/sitemap.xml"])
+        pattern = re.compile(url_pattern) if url_pattern else None
+        entries = []
+
+        while pending_sitemaps and len(entries) < max_urls:
+            body = await self._fetch_sitemap(session, pending_sitemaps.pop(0))
+            if not body:
+                continue
+            try:
+                root = ElementTree.fromstring(body)
+            except ElementTree.ParseError as e:
+                logger.warning(f"解析站点地图失败: {e}")
+                continue
+
+            # 站点地图索引：继续展开子站点地图
+            for sitemap in root.iter(f'{self.SITEMAP_NS}sitemap'):
+                loc = sitemap.findtext(f'{self.SITEMAP_NS}loc')
+                if loc:
+                    pending_sitemaps.append(loc.strip())
+
+            for node in root.iter(f'{self.SITEMAP_NS}url'):
+                loc = (node.findtext(f'{self.SITEMAP_NS}loc') or '').strip()
+                if not loc or (pattern and not pattern.search(loc)):
+                    continue
+                if not parser.can_fetch(self.user_agent, loc):
+                    continue
+                entries.append((loc, (node.findtext(f'{self.SITEMAP_NS}lastmod') or '').strip() or None))
+                if len(entries) >= max_urls:
+                    break
+
+        return await asyncio.to_thread(self.enqueue, source_key, entries)
+
+    def enqueue(self, source_key: str, entries: List[tuple]) -> int:
+        """把 (url, lastmod) 加入待抓取队列，lastmod 未变化的URL跳过"""
+        if not entries:
+            return 0
+        conn = sqlite3.connect(self.db_path)
+        try:
+            before = conn.total_changes
+            conn.executemany('''
+                INSERT INTO crawl_frontier (url, source, lastmod, status)
+                VALUES (?, ?, ?, 'pending')
+                ON CONFLICT(url) DO UPDATE SET
+                    lastmod = excluded.lastmod,
+                    status = 'pending',
+                    attempts = 0,
+                    last_error = NULL
+                WHERE excluded.lastmod IS NOT NULL
+                  AND (crawl_frontier.lastmod IS NULL OR excluded.lastmod > crawl_frontier.lastmod)
+            ''', [(url, source_key, lastmod) for url, lastmod in entries])
+            conn.commit()
+            queued = conn.total_changes - before
+        finally:
+            conn.close()
+
+        logger.info(f"🗺️ {source_key} 站点地图入队 {queued} 个URL（共发现 {len(entries)} 个）")
+        return queued
+
+    def pending_urls(self, source_key: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        """取出待抓取的URL（没有失败过的优先）"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            query = "SELECT url, source, lastmod FROM crawl_frontier WHERE status = 'pending'"
+            params = []
+            if source_key:
+                query += " AND source = ?"
+                params.append(source_key)
+            query += " ORDER BY attempts, discovered_at LIMIT ?"
+            params.append(limit)
+            rows = conn.execute(query, params).fetchall()
+        finally:
+            conn.close()
+        return [{'url': r[0], 'source': r[1], 'lastmod': r[2]} for r in rows]
+
+    def mark_fetched(self, url: str, status: str = 'fetched'):
+        """标记URL已抓取"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute('''
+                UPDATE crawl_frontier SET status = ?, fetched_at = CURRENT_TIMESTAMP,
+                    attempts = attempts + 1, last_error = NULL
+                WHERE url = ?
+            ''', (status, url))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def record_failure(self, url: str, source_key: str, error: str) -> str:
+        """记录一次抓取失败并重新入队（列表页发现的URL此时才写入队列）
+
+        Returns:
+            'pending'（下次爬取时重试）或 'failed'（已达到 max_attempts）
+        """
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute('''
+                INSERT INTO crawl_frontier (url, source, status, attempts, last_error, fetched_at)
+                VALUES (?, ?, CASE WHEN ? <= 1 THEN 'failed' ELSE 'pending' END, 1, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(url) DO UPDATE SET
+                    attempts = crawl_frontier.attempts + 1,
+                    last_error = excluded.last_error,
+                    fetched_at = excluded.fetched_at,
+                    status = CASE WHEN crawl_frontier.attempts + 1 >= ? THEN 'failed' ELSE 'pending' END
+            ''', (url, source_key, self.max_attempts, error, self.max_attempts))
+            conn.commit()
+            status = conn.execute('SELECT status FROM crawl_frontier WHERE url = ?', (url,)).fetchone()[0]
+        finally:
+            conn.close()
+        return status
+
+
+def add_missing_job_columns(cursor):
+    """旧版本创建的 jobs 表补充新增列"""
+    existing_columns = {row[1] for row in cursor.execute('PRAGMA table_info(jobs)')}
+    for column, column_type in (('content_hash', 'TEXT'), ('first_seen', 'TIMESTAMP'),
+                                ('last_seen', 'TIMESTAMP'), ('last_seen_crawl', 'INTEGER'),
+                                ('requirements', 'TEXT')):
+        if column not in existing_columns:
+            cursor.execute(f'ALTER TABLE jobs ADD COLUMN {column} {column_type}')
+
+
 class JobSpider:
     """现代化招聘信息爬虫"""
 
-    def __init__(self, db_path='job_data.db'):
+    # 有序的数据库迁移：(版本, 说明, 语句)，语句可以是SQL或接收游标的函数
+    MIGRATIONS = [
+        (1, '创建职位、公司和搜索关键词表', [
+            '''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_id TEXT UNIQUE,
+                    title TEXT NOT NULL,
+                    company TEXT NOT NULL,
+                    salary TEXT,
+                    location TEXT,
+                    experience TEXT,
+                    education TEXT,
+                    description TEXT,
+                    requirements TEXT,  -- 任职要求（详情页补充）
+                    tags TEXT,  -- JSON格式存储标签
+                    source TEXT,
+                    url TEXT,
+                    publish_time TEXT,
+                    crawl_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    status TEXT DEFAULT 'active',
+                    content_hash TEXT,  -- 职位内容指纹，用于判断是否需要写入
+                    first_seen TIMESTAMP,
+                    last_seen TIMESTAMP,
+                    last_seen_crawl INTEGER  -- 最后一次出现的爬取批次
+                )
+            ''',
+            # 公司信息表
+            '''
+                CREATE TABLE IF NOT EXISTS companies (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT UNIQUE,
+                    industry TEXT,
+                    size TEXT,
+                    description TEXT,
+                    website TEXT,
+                    logo_url TEXT,
+                    update_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''',
+            # 搜索关键词表
+            '''
+                CREATE TABLE IF NOT EXISTS search_keywords (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    keyword TEXT UNIQUE,
+                    search_count INTEGER DEFAULT 0,
+                    last_search TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''',
+        ]),
+        (2, '为旧数据库补充内容指纹、出现时间和任职要求列', [add_missing_job_columns]),
+        (3, '职位变更历史表（只记录发生变化的字段）', [
+            '''
+                CREATE TABLE IF NOT EXISTS job_history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_id TEXT NOT NULL,
+                    field TEXT NOT NULL,
+                    old_value TEXT,
+                    new_value TEXT,
+                    changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''',
+            'CREATE INDEX IF NOT EXISTS idx_job_history_job ON job_history (job_id, changed_at)',
+            'CREATE INDEX IF NOT EXISTS idx_jobs_status_crawl ON jobs (status, last_seen_crawl)',
+        ]),
+        (4, '待抓取URL表和爬取批次表', [
+            # 站点地图发现的详情页
+            '''
+                CREATE TABLE IF NOT EXISTS crawl_frontier (
+                    url TEXT PRIMARY KEY,
+                    source TEXT,
+                    lastmod TEXT,
+                    status TEXT DEFAULT 'pending',  -- pending, fetched, failed
+                    discovered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    fetched_at TIMESTAMP
+                )
+            ''',
+            'CREATE INDEX IF NOT EXISTS idx_frontier_status ON crawl_frontier (status, source)',
+            # 每次 run_crawler 记录一条
+            '''
+                CREATE TABLE IF NOT EXISTS crawl_runs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    keyword TEXT,
+                    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    finished_at TIMESTAMP,
+                    job_count INTEGER DEFAULT 0
+                )
+            ''',
+        ]),
+        (5, '按URL查找职位的索引', [
+            'CREATE INDEX IF NOT EXISTS idx_jobs_url ON jobs (url)',
+        ]),
+        (6, '记录详情页补充时间', [
+            'ALTER TABLE jobs ADD COLUMN detail_fetched_at TIMESTAMP',
+        ]),
+        (7, '按数据源记录每个爬取批次的结果', [
+            # 数据源成功返回职位时才记录，过期判断只统计这些批次
+            '''
+                CREATE TABLE IF NOT EXISTS crawl_run_sources (
+                    run_id INTEGER NOT NULL,
+                    source TEXT NOT NULL,
+                    job_count INTEGER DEFAULT 0,
+                    PRIMARY KEY (run_id, source)
+                )
+            ''',
+            'CREATE INDEX IF NOT EXISTS idx_crawl_run_sources_source ON crawl_run_sources (source, run_id)',
+        ]),
+        (8, '记录详情页抓取的尝试次数和最后的错误', [
+            'ALTER TABLE crawl_frontier ADD COLUMN attempts INTEGER DEFAULT 0',
+            'ALTER TABLE crawl_frontier ADD COLUMN last_error TEXT',
+        ]),
+    ]
+
+    def __init__(self, db_path='job_data.db', stale_after_crawls: int = 10,
+                 maintenance_interval: int = 5, archive_dir: Optional[str] = None,
+                 sources_dir: Optional[str] = None, enabled_sources: Optional[List[str]] = None,
+                 respect_robots: bool = True, enrich_details: bool = False, detail_concurrency: int = 2,
+                 detail_max_attempts: int = 3):
         self.db_path = db_path
         self.ua = UserAgent()
         self.session = None
         self.driver = None
+        self.current_crawl_id = None
         self.init_database()
 
+        # 爬取流程中的入库通过 aiosqlite 连接池完成，不阻塞事件循环（首次使用时打开）
+        self.db = AsyncDatabaseManager('sqlite', database=db_path, pool_min=1,
+                                       pool_max=detail_concurrency + 1)
+
+        # 数据维护策略
+        self.stale_after_crawls = stale_after_crawls      # 连续N次爬取未出现则过期
+        self.maintenance_interval = maintenance_interval  # 每N次爬取执行一次维护
+        self.archive_dir = archive_dir                    # 设置后过期职位归档为Parquet文件
+
         # 反爬虫策略
         self.request_delay = (1, 3)  # 请求间隔1-3秒
         self.max_retries = 3
         self.timeout = 30
 
-        # 目标网站配置
-        self.sources = {
-            'lagou': {
-                'name': '拉勾网',
-                'base_url': 'https://www.lagou.com',
-                'search_url': 'https://www.lagou.com/wn/jobs?pn={page}&kd={keyword}',
-                'parser': self.parse_lagou
-            },
-            'boss': {
-                'name': 'Boss直聘',
-                'base_url': 'https://www.zhipin.com',
-                'search_url': 'https://www.zhipin.com/web/geek/job?query={keyword}&page={page}',
-                'parser': self.parse_boss,
-                'use_selenium': True
-            },
-            'bilibili': {
-                'name': 'Bilibili招聘',
-                'base_url': 'https://jobs.bilibili.com',
-                'search_url': 'https://jobs.bilibili.com/search?keyword={keyword}&page={page}',
-                'parser': self.parse_bilibili
-            }
-        }
+        # 爬取边界：robots.txt 策略、按主机限速、站点地图
+        self.respect_robots = respect_robots
+        self.frontier = CrawlFrontier(db_path, detail_concurrency=detail_concurrency,
+                                      max_attempts=detail_max_attempts)
+        self.fetch_errors = {}  # URL -> 最近一次请求失败的原因（详情页失败时记录到队列）
+
+        # 详情页补充（只抓取新增或变化的职位）
+        self.enrich_details = enrich_details
+
+        # 目标网站配置（从配置目录按需加载）
+        self.sources = SourceRegistry(sources_dir or DEFAULT_SOURCES_DIR, enabled_sources)
 
     def init_database(self):
-        """初始化数据库"""
+        """初始化数据库（执行尚未应用的迁移；结构已是最新时只需一次查询）"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
+        try:
+            try:
+                current = cursor.execute('SELECT MAX(version) FROM schema_version').fetchone()[0] or 0
+            except sqlite3.OperationalError:
+                # 新数据库启用增量VACUUM（必须在建表之前设置）
+                if cursor.execute('PRAGMA page_count').fetchone()[0] == 0:
+                    cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS schema_version (
+                        version INTEGER PRIMARY KEY,
+                        description TEXT,
+                        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                ''')
+                current = 0
 
-        # 创建招聘信息表
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS jobs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                job_id TEXT UNIQUE,
-                title TEXT NOT NULL,
-                company TEXT NOT NULL,
-                salary TEXT,
-                location TEXT,
-                experience TEXT,
-                education TEXT,
-                description TEXT,
-                tags TEXT,  -- JSON格式存储标签
-                source TEXT,
-                url TEXT,
-                publish_time TEXT,
-                crawl_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                status TEXT DEFAULT 'active'
-            )
-        ''')
-
-        # 创建公司信息表
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS companies (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT UNIQUE,
-                industry TEXT,
-                size TEXT,
-                description TEXT,
-                website TEXT,
-                logo_url TEXT,
-                update_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        # 创建搜索关键词表
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS search_keywords (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                keyword TEXT UNIQUE,
-                search_count INTEGER DEFAULT 0,
-                last_search TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        conn.commit()
-        conn.close()
+            for version, description, statements in self.MIGRATIONS:
+                if version <= current:
+                    continue
+                logger.info(f"🔄 应用数据库迁移 v{version}: {description}")
+                # 每个版本在一个事务中执行并登记
+                cursor.execute('BEGIN')
+                try:
+                    for statement in statements:
+                        if callable(statement):
+                            statement(cursor)
+                        else:
+                            cursor.execute(statement)
+                    cursor.execute('INSERT INTO schema_version (version, description) VALUES (?, ?)',
+                                   (version, description))
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+        finally:
+            conn.close()
         logger.info("✅ 数据库初始化完成")
 
     def init_session(self):
@@ -155,44 +649,317 @@ class JobSpider:
         """关闭资源"""
         if self.session:
             await self.session.close()
+        await self.db.close()
         if self.driver:
             self.driver.quit()
 
-    def save_job(self, job_data: Dict):
-        """保存招聘信息到数据库"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    # 参与内容指纹计算的字段（publish_time 每次解析都会变化，不参与比较）
+    TRACKED_FIELDS = ('title', 'company', 'salary', 'location', 'experience',
+                      'education', 'description', 'requirements', 'tags', 'url')
+
+    # 由详情页提供的字段：详情补充过的职位，列表页的摘要不会覆盖这些字段
+    DETAIL_FIELDS = ('description', 'requirements')
+
+    @staticmethod
+    def _job_values(job_data: Dict) -> Dict:
+        """提取需要跟踪的字段值（标签序列化为JSON文本）
 
+        None 表示数据源没有提供该字段，空字符串和空列表表示站点上该字段已被清空。
+        """
+        values = {field: job_data.get(field) for field in JobSpider.TRACKED_FIELDS}
+        if values['tags'] is not None:
+            values['tags'] = json.dumps(values['tags'], ensure_ascii=False)
+        return values
+
+    @staticmethod
+    def _normalize_tags(text: Optional[str]) -> Optional[str]:
+        """把库中的标签JSON统一为当前编码（旧版本写入时使用 ensure_ascii=True）"""
         try:
-            cursor.execute('''
-                INSERT OR REPLACE INTO jobs
-                (job_id, title, company, salary, location, experience, education,
-                 description, tags, source, url, publish_time)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                job_data.get('job_id'),
-                job_data.get('title'),
-                job_data.get('company'),
-                job_data.get('salary'),
-                job_data.get('location'),
-                job_data.get('experience'),
-                job_data.get('education'),
-                job_data.get('description'),
-                json.dumps(job_data.get('tags', [])),
-                job_data.get('source'),
-                job_data.get('url'),
-                job_data.get('publish_time')
-            ))
-            conn.commit()
-            logger.info(f"✅ 保存职位: {job_data.get('title')} - {job_data.get('company')}")
+            return json.dumps(json.loads(text), ensure_ascii=False)
+        except (TypeError, ValueError):
+            return text
+
+    @staticmethod
+    def content_hash(values: Dict) -> str:
+        """计算职位内容指纹"""
+        payload = json.dumps([values.get(field) for field in JobSpider.TRACKED_FIELDS], ensure_ascii=False)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    async def save_job(self, job_data: Dict, from_detail: bool = False) -> Optional[str]:
+        """保存招聘信息到数据库
+
+        仅在内容指纹变化时才写入正文，变化的字段追加到 job_history。
+        from_detail=True 表示数据来自详情页补充；已补充过详情的职位，
+        列表页再次出现时保留详情页的描述和任职要求（DETAIL_FIELDS）。
+
+        Returns:
+            'inserted'、'updated'、'unchanged'，失败时返回 None
+        """
+        job_id = job_data.get('job_id')
+        values = self._job_values(job_data)
+        new_hash = self.content_hash(values)
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        detail_fetched_at = now if from_detail else None
+
+        try:
+            # 先读后写，开始时就获取写锁，避免并发补充详情时升级写锁失败
+            async with self.db.transaction(immediate=True) as session:
+                row = await session.fetchone(f'''
+                    SELECT content_hash, detail_fetched_at, {', '.join(self.TRACKED_FIELDS)}
+                    FROM jobs WHERE job_id = ?
+                ''', (job_id,))
+
+                if row is None:
+                    await session.execute('''
+                        INSERT INTO jobs
+                        (job_id, title, company, salary, location, experience, education,
+                         description, requirements, tags, source, url, publish_time,
+                         content_hash, first_seen, last_seen, last_seen_crawl, detail_fetched_at)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', (
+                        job_id,
+                        values['title'],
+                        values['company'],
+                        values['salary'],
+                        values['location'],
+                        values['experience'],
+                        values['education'],
+                        values['description'],
+                        values['requirements'],
+                        values['tags'],
+                        job_data.get('source'),
+                        values['url'],
+                        job_data.get('publish_time'),
+                        new_hash,
+                        now,
+                        now,
+                        self.current_crawl_id,
+                        detail_fetched_at
+                    ))
+                    status = 'inserted'
+
+                else:
+                    old_values = dict(zip(self.TRACKED_FIELDS, row[2:]))
+                    # 按解码后的内容比较标签，旧编码的相同标签不算变化
+                    old_values['tags'] = self._normalize_tags(old_values['tags'])
+                    # 已补充过详情的职位，列表页的摘要不覆盖详情页字段
+                    if row[1] and not from_detail:
+                        for field in self.DETAIL_FIELDS:
+                            values[field] = old_values[field]
+                    # 数据源未提供的字段保留已有值；提供了空值说明站点已清空，按变化记录
+                    for field in self.TRACKED_FIELDS:
+                        if values[field] is None:
+                            values[field] = old_values[field]
+                    # 合并之后再计算指纹和变化字段
+                    new_hash = self.content_hash(values)
+                    changed = [field for field in self.TRACKED_FIELDS
+                               if old_values[field] != values[field]]
+
+                    if row[0] == new_hash or not changed:
+                        # 内容未变化，只刷新最后出现时间
+                        await session.execute(
+                            "UPDATE jobs SET content_hash = ?, last_seen = ?, last_seen_crawl = ?, "
+                            "status = 'active', detail_fetched_at = COALESCE(?, detail_fetched_at) "
+                            "WHERE job_id = ?",
+                            (new_hash, now, self.current_crawl_id, detail_fetched_at, job_id)
+                        )
+                        status = 'unchanged'
+
+                    else:
+                        assignments = ', '.join(f'{field} = ?' for field in changed)
+                        await session.execute(
+                            f"UPDATE jobs SET {assignments}, content_hash = ?, last_seen = ?, "
+                            f"last_seen_crawl = ?, status = 'active', "
+                            f"detail_fetched_at = COALESCE(?, detail_fetched_at) WHERE job_id = ?",
+                            [values[field] for field in changed]
+                            + [new_hash, now, self.current_crawl_id, detail_fetched_at, job_id]
+                        )
+                        await session.executemany('''
+                            INSERT INTO job_history (job_id, field, old_value, new_value, changed_at)
+                            VALUES (?, ?, ?, ?, ?)
+                        ''', [(job_id, field, old_values[field], values[field], now) for field in changed])
+                        status = 'updated'
 
         except Exception as e:
             logger.error(f"❌ 保存职位失败: {e}")
+            return None
+
+        if status == 'unchanged':
+            logger.debug(f"职位未变化: {job_data.get('title')} - {job_data.get('company')}")
+        else:
+            logger.info(f"✅ 保存职位({status}): {job_data.get('title')} - {job_data.get('company')}")
+        return status
+
+    async def save_jobs(self, jobs: List[Dict]) -> List[Dict]:
+        """批量保存职位，返回新增或发生变化的职位"""
+        save_stats = defaultdict(int)
+        changed_jobs = []
+        for job in jobs:
+            status = await self.save_job(job)
+            save_stats[status or 'failed'] += 1
+            if status in ('inserted', 'updated'):
+                changed_jobs.append(job)
+        logger.info(f"💾 入库统计: {dict(save_stats)}")
+        return changed_jobs
+
+    def get_job_history(self, job_id: str) -> List[Dict]:
+        """查询职位的字段变更历史（如薪资变化趋势）"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            rows = conn.execute('''
+                SELECT field, old_value, new_value, changed_at
+                FROM job_history WHERE job_id = ?
+                ORDER BY changed_at, id
+            ''', (job_id,)).fetchall()
         finally:
             conn.close()
 
-    async def fetch_page(self, url: str, use_selenium: bool = False) -> Optional[str]:
+        return [
+            {'field': r[0], 'old_value': r[1], 'new_value': r[2], 'changed_at': r[3]}
+            for r in rows
+        ]
+
+    async def start_crawl_run(self, keyword: str) -> int:
+        """登记一次爬取批次，返回批次ID"""
+        async with self.db.transaction() as session:
+            await session.execute('INSERT INTO crawl_runs (keyword) VALUES (?)', (keyword,))
+            self.current_crawl_id = (await session.fetchone('SELECT last_insert_rowid()'))[0]
+        return self.current_crawl_id
+
+    async def finish_crawl_run(self, job_count: int):
+        """记录爬取批次结束"""
+        if self.current_crawl_id is None:
+            return
+        await self.db.execute('''
+            UPDATE crawl_runs SET finished_at = CURRENT_TIMESTAMP, job_count = ?
+            WHERE id = ?
+        ''', (job_count, self.current_crawl_id))
+
+    async def record_source_results(self, job_counts: Dict[str, int]):
+        """记录本批次各数据源获取到的职位数（键为职位的 source 字段，即数据源名称）"""
+        if self.current_crawl_id is None:
+            return
+        await self.db.executemany('''
+            INSERT OR REPLACE INTO crawl_run_sources (run_id, source, job_count)
+            VALUES (?, ?, ?)
+        ''', [(self.current_crawl_id, source, count) for source, count in job_counts.items()])
+
+    def expire_stale_jobs(self, max_missed_crawls: Optional[int] = None) -> int:
+        """将之后N次成功爬取都未出现的职位标记为过期
+
+        只统计已结束、且该职位的数据源返回了职位的批次，并且关键词与职位最后出现的批次相同；
+        失败或没有结果的批次、其他关键词或其他数据源的批次不计入。
+        """
+        if max_missed_crawls is None:
+            max_missed_crawls = self.stale_after_crawls
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.execute('''
+                UPDATE jobs SET status = 'expired'
+                WHERE status = 'active' AND (
+                    SELECT COUNT(*) FROM crawl_run_sources rs
+                    JOIN crawl_runs r ON r.id = rs.run_id
+                    WHERE rs.source = jobs.source
+                      AND rs.job_count > 0
+                      AND r.finished_at IS NOT NULL
+                      AND rs.run_id > COALESCE(jobs.last_seen_crawl, 0)
+                      -- 旧数据没有批次记录时不限关键词
+                      AND r.keyword = COALESCE(
+                          (SELECT keyword FROM crawl_runs WHERE id = jobs.last_seen_crawl), r.keyword)
+                ) >= ?
+            ''', (max_missed_crawls,))
+            conn.commit()
+            expired = cursor.rowcount
+        finally:
+            conn.close()
+
+        logger.info(f"🕰️ 标记过期职位: {expired} 个")
+        return expired
+
+    def archive_expired_jobs(self) -> int:
+        """将过期职位移出热表，归档到 jobs_archive 表或Parquet文件"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(jobs)')]
+            column_list = ', '.join(columns)
+
+            if self.archive_dir:
+                df = pd.read_sql_query(f"SELECT {column_list} FROM jobs WHERE status = 'expired'", conn)
+                if df.empty:
+                    return 0
+                os.makedirs(self.archive_dir, exist_ok=True)
+                filename = os.path.join(
+                    self.archive_dir, f'jobs_archive_{datetime.now().strftime("%Y%m%d_%H%M%S")}.parquet'
+                )
+                df.to_parquet(filename, index=False)
+                logger.info(f"📦 过期职位已写入: {filename}")
+            else:
+                conn.execute('CREATE TABLE IF NOT EXISTS jobs_archive AS SELECT * FROM jobs WHERE 0')
+                archive_columns = {row[1] for row in conn.execute('PRAGMA table_info(jobs_archive)')}
+                for column in columns:
+                    if column not in archive_columns:
+                        conn.execute(f'ALTER TABLE jobs_archive ADD COLUMN {column}')
+                conn.execute(f'''
+                    INSERT INTO jobs_archive ({column_list})
+                    SELECT {column_list} FROM jobs WHERE status = 'expired'
+                ''')
+
+            cursor = conn.execute("DELETE FROM jobs WHERE status = 'expired'")
+            conn.commit()
+            archived = cursor.rowcount
+        finally:
+            conn.close()
+
+        logger.info(f"📦 归档过期职位: {archived} 个")
+        return archived
+
+    def compact_database(self, max_pages: int = 1000):
+        """增量回收空闲页并更新查询优化器统计信息"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+                # 旧数据库需要一次完整VACUUM才能切换到增量模式
+                conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+                conn.execute('VACUUM')
+            else:
+                # execute() 只执行一步（每次只释放一页），executescript 会把语句执行完
+                conn.executescript(f'PRAGMA incremental_vacuum({int(max_pages)});')
+            conn.execute('ANALYZE')
+            conn.commit()
+        finally:
+            conn.close()
+
+        logger.info("🧹 数据库压缩与统计信息更新完成")
+
+    def run_maintenance(self):
+        """执行维护任务：过期标记 -> 归档 -> 压缩"""
+        self.expire_stale_jobs()
+        self.archive_expired_jobs()
+        self.compact_database()
+
+    def maybe_run_maintenance(self):
+        """按爬取批次间隔定期执行维护"""
+        if (self.current_crawl_id and self.maintenance_interval
+                and self.current_crawl_id % self.maintenance_interval == 0):
+            self.run_maintenance()
+
+    async def before_request(self, url: str, request_delay: Optional[tuple] = None) -> bool:
+        """请求前检查 robots.txt 并按主机限速，不允许抓取时返回 False"""
+        if not self.session:
+            self.init_session()
+        if self.respect_robots and not await self.frontier.allowed(self.session, url):
+            logger.warning(f"🚫 robots.txt 禁止抓取: {url}")
+            return False
+        await self.frontier.wait_turn(url, (request_delay or self.request_delay)[0])
+        return True
+
+    async def fetch_page(self, url: str, use_selenium: bool = False,
+                         request_delay: Optional[tuple] = None) -> Optional[str]:
         """获取页面内容"""
+        if not await self.before_request(url, request_delay):
+            self.fetch_errors[url] = 'robots.txt 禁止抓取'
+            return None
+
         for attempt in range(self.max_retries):
             try:
                 if use_selenium:
@@ -202,116 +969,194 @@ class JobSpider:
                     WebDriverWait(self.driver, 10).until(
                         EC.presence_of_element_located((By.TAG_NAME, "body"))
                     )
+                    self.fetch_errors.pop(url, None)
                     return self.driver.page_source
                 else:
                     if not self.session:
                         self.init_session()
                     async with self.session.get(url, timeout=self.timeout) as response:
                         if response.status == 200:
+                            self.fetch_errors.pop(url, None)
                             return await response.text()
                         else:
                             logger.warning(f"请求失败: {url} - 状态码: {response.status}")
+                            self.fetch_errors[url] = f'状态码: {response.status}'
 
             except Exception as e:
                 logger.warning(f"请求失败 (尝试 {attempt + 1}/{self.max_retries}): {e}")
+                self.fetch_errors[url] = str(e) or type(e).__name__
 
             # 随机延迟
-            await asyncio.sleep(random.uniform(*self.request_delay))
+            await asyncio.sleep(random.uniform(*(request_delay or self.request_delay)))
 
         return None
 
-    def parse_lagou(self, html: str, source_config: Dict) -> List[Dict]:
-        """解析拉勾网招聘信息"""
-        soup = BeautifulSoup(html, 'html.parser')
-        jobs = []
-
-        # 拉勾网的职位列表选择器（可能需要根据实际页面调整）
-        job_items = soup.select('.job-list .job-item') or soup.select('[data-jobid]')
+    async def fetch_json(self, url: str, method: str = 'GET', params: Optional[Dict] = None,
+                         data: Optional[Dict] = None, headers: Optional[Dict] = None,
+                         request_delay: Optional[tuple] = None):
+        """直接请求JSON接口，跳过HTML下载与渲染"""
+        if not await self.before_request(url, request_delay):
+            return None
 
-        for item in job_items[:10]:  # 限制数量避免被限制
+        for attempt in range(self.max_retries):
             try:
-                job = {
-                    'job_id': f"lagou_{item.get('data-jobid', str(hash(str(item))))}",
-                    'title': item.select_one('.job-name, .position-link h3').text.strip() if item.select_one('.job-name, .position-link h3') else '',
-                    'company': item.select_one('.company-name, .company').text.strip() if item.select_one('.company-name, .company') else '',
-                    'salary': item.select_one('.salary, .money').text.strip() if item.select_one('.salary, .money') else '',
-                    'location': item.select_one('.job-area, .area').text.strip() if item.select_one('.job-area, .area') else '',
-                    'experience': item.select_one('.experience').text.strip() if item.select_one('.experience') else '',
-                    'education': item.select_one('.education').text.strip() if item.select_one('.education') else '',
-                    'description': item.select_one('.job-desc, .description').text.strip() if item.select_one('.job-desc, .description') else '',
-                    'tags': [tag.text.strip() for tag in item.select('.tags span, .labels span')],
-                    'source': '拉勾网',
-                    'url': urljoin(source_config['base_url'], item.select_one('a')['href']) if item.select_one('a') else '',
-                    'publish_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                }
-                if job['title'] and job['company']:
-                    jobs.append(job)
+                if not self.session:
+                    self.init_session()
+                request_headers = {'Accept': 'application/json, text/plain, */*'}
+                request_headers.update(headers or {})
+                async with self.session.request(method, url, params=params, data=data,
+                                                headers=request_headers, timeout=self.timeout) as response:
+                    if response.status == 200:
+                        # 直接解码原始字节，避免先转换为str
+                        return json_loads(await response.read())
+                    else:
+                        logger.warning(f"接口请求失败: {url} - 状态码: {response.status}")
+
             except Exception as e:
-                logger.warning(f"解析拉勾网职位失败: {e}")
-                continue
+                logger.warning(f"接口请求失败 (尝试 {attempt + 1}/{self.max_retries}): {e}")
 
-        return jobs
+            await asyncio.sleep(random.uniform(*(request_delay or self.request_delay)))
 
-    def parse_boss(self, html: str, source_config: Dict) -> List[Dict]:
-        """解析Boss直聘招聘信息"""
-        soup = BeautifulSoup(html, 'html.parser')
-        jobs = []
+        return None
 
-        # Boss直聘的职位列表选择器
-        job_items = soup.select('.job-card-wrapper, .job-list-item')
+    @staticmethod
+    def _lookup(data, path: str):
+        """按点号路径读取嵌套JSON字段，如 'zpData.jobList'"""
+        for part in path.split('.'):
+            if isinstance(data, list):
+                data = data[int(part)] if part.isdigit() and int(part) < len(data) else None
+            elif isinstance(data, dict):
+                data = data.get(part)
+            else:
+                return None
+        return data
+
+    @staticmethod
+    def _format_request_value(value, keyword: str, page: int):
+        """替换请求参数中的 {keyword}/{page} 占位符"""
+        if isinstance(value, str):
+            return value.format(keyword=keyword, page=page)
+        if isinstance(value, dict):
+            return {k: JobSpider._format_request_value(v, keyword, page) for k, v in value.items()}
+        return value
+
+    async def fetch_api_page(self, source_config: Dict, keyword: str, page: int):
+        """按数据源的 api 配置请求一页列表数据"""
+        api = source_config['api']
+        return await self.fetch_json(
+            api['url'].format(keyword=keyword, page=page),
+            method=api.get('method', 'GET'),
+            params=self._format_request_value(api.get('params'), keyword, page),
+            data=self._format_request_value(api.get('data'), keyword, page),
+            headers=api.get('headers'),
+            request_delay=source_config['rate_limit'].get('request_delay')
+        )
+
+    def parse_api_response(self, payload, source_config: Dict) -> List[Dict]:
+        """按字段映射把接口返回的JSON转换为职位字典"""
+        api = source_config['api']
+        fields = api['fields']
+        items = self._lookup(payload, api['items_path']) or []
+        jobs = []
 
-        for item in job_items[:10]:
+        for item in items[:source_config.get('max_items', 10)]:
             try:
-                job = {
-                    'job_id': f"boss_{item.get('data-jobid', str(hash(str(item))))}",
-                    'title': item.select_one('.job-name, .job-title').text.strip() if item.select_one('.job-name, .job-title') else '',
-                    'company': item.select_one('.company-name, .company-text').text.strip() if item.select_one('.company-name, .company-text') else '',
-                    'salary': item.select_one('.salary, .money').text.strip() if item.select_one('.salary, .money') else '',
-                    'location': item.select_one('.job-area, .area').text.strip() if item.select_one('.job-area, .area') else '',
-                    'experience': item.select_one('.job-experience, .experience').text.strip() if item.select_one('.job-experience, .experience') else '',
-                    'education': item.select_one('.job-education, .education').text.strip() if item.select_one('.job-education, .education') else '',
-                    'description': item.select_one('.job-desc, .description').text.strip() if item.select_one('.job-desc, .description') else '',
-                    'tags': [tag.text.strip() for tag in item.select('.tag, .labels span')],
-                    'source': 'Boss直聘',
-                    'url': urljoin(source_config['base_url'], item.select_one('a')['href']) if item.select_one('a') else '',
-                    'publish_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                }
-                if job['title'] and job['company']:
+                # 未映射的字段为 None（未提供），已映射但接口未返回的字段为空值
+                job = {field: source_config['defaults'].get(field, '' if field in fields else None)
+                       for field in self.TRACKED_FIELDS}
+                for field, path in fields.items():
+                    value = self._lookup(item, path)
+                    if value is not None:
+                        job[field] = value if field == 'tags' else str(value).strip()
+
+                if job['tags'] is not None and not isinstance(job['tags'], list):
+                    job['tags'] = [job['tags']] if job['tags'] else []
+                job['job_id'] = f"{source_config['key']}_{self._lookup(item, api['id_field'])}"
+                if api.get('detail_url') and not job['url']:
+                    job['url'] = api['detail_url'].format(**item)
+                job['source'] = source_config['name']
+                job['source_key'] = source_config['key']
+                job['publish_time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+                if all(job[field] for field in source_config['required']):
                     jobs.append(job)
             except Exception as e:
-                logger.warning(f"解析Boss直聘职位失败: {e}")
+                logger.warning(f"解析{source_config['name']}接口数据失败: {e}")
                 continue
 
         return jobs
 
-    def parse_bilibili(self, html: str, source_config: Dict) -> List[Dict]:
-        """解析Bilibili招聘信息"""
+    @staticmethod
+    def _fallback_job_id(item) -> str:
+        """页面未提供 data-jobid 时生成稳定的职位ID
+
+        内置 hash() 每个进程的随机种子不同，无法在多次爬取间识别同一职位。
+        """
+        link = item.select_one('a')
+        key = link.get('href') if link and link.get('href') else str(item)
+        return hashlib.md5(key.encode('utf-8')).hexdigest()[:16]
+
+    def get_parser(self, source_config: Dict):
+        """获取数据源的解析函数
+
+        配置中的 parser 可以是 JobSpider 的方法名，或 'module:function' 形式的插件函数；
+        未配置时使用基于选择器的通用解析器。
+        """
+        parser = source_config.get('parser')
+        if not parser:
+            return self.parse_listing
+        if ':' in parser:
+            module_name, func_name = parser.split(':', 1)
+            module = importlib.import_module(module_name)
+            return getattr(module, func_name)
+        return getattr(self, parser)
+
+    def parse_listing(self, html: str, source_config: Dict) -> List[Dict]:
+        """按配置中的CSS选择器解析职位列表页"""
         soup = BeautifulSoup(html, 'html.parser')
+        selectors = source_config['selectors']
         jobs = []
 
-        # Bilibili招聘的职位列表选择器
-        job_items = soup.select('.job-item, .position-item')
-
-        for item in job_items[:10]:
+        # 列表项选择器可配置多个，按顺序取第一个有结果的
+        item_selectors = selectors['item']
+        if isinstance(item_selectors, str):
+            item_selectors = [item_selectors]
+        job_items = []
+        for selector in item_selectors:
+            job_items = soup.select(selector)
+            if job_items:
+                break
+
+        def select_text(item, field):
+            # 未配置选择器的字段为 None（未提供），配置了但没有匹配到的字段为空值
+            selector = selectors.get(field)
+            if not selector:
+                return source_config['defaults'].get(field)
+            node = item.select_one(selector)
+            return node.text.strip() if node else source_config['defaults'].get(field, '')
+
+        for item in job_items[:source_config.get('max_items', 10)]:  # 限制数量避免被限制
             try:
+                link = item.select_one('a')
                 job = {
-                    'job_id': f"bilibili_{item.get('data-jobid', str(hash(str(item))))}",
-                    'title': item.select_one('.job-title, .position-title').text.strip() if item.select_one('.job-title, .position-title') else '',
-                    'company': '哔哩哔哩',  # B站招聘通常是内部招聘
-                    'salary': item.select_one('.salary, .money').text.strip() if item.select_one('.salary, .money') else '',
-                    'location': item.select_one('.location, .area').text.strip() if item.select_one('.location, .area') else '',
-                    'experience': item.select_one('.experience').text.strip() if item.select_one('.experience') else '',
-                    'education': item.select_one('.education').text.strip() if item.select_one('.education') else '',
-                    'description': item.select_one('.description, .job-desc').text.strip() if item.select_one('.description, .job-desc') else '',
-                    'tags': [tag.text.strip() for tag in item.select('.tag, .label')],
-                    'source': 'Bilibili招聘',
-                    'url': urljoin(source_config['base_url'], item.select_one('a')['href']) if item.select_one('a') else '',
+                    'job_id': f"{source_config['key']}_{item.get('data-jobid') or self._fallback_job_id(item)}",
+                    'title': select_text(item, 'title'),
+                    'company': select_text(item, 'company'),
+                    'salary': select_text(item, 'salary'),
+                    'location': select_text(item, 'location'),
+                    'experience': select_text(item, 'experience'),
+                    'education': select_text(item, 'education'),
+                    'description': select_text(item, 'description'),
+                    'tags': [tag.text.strip() for tag in item.select(selectors['tags'])] if selectors.get('tags') else None,
+                    'source': source_config['name'],
+                    'source_key': source_config['key'],
+                    'url': urljoin(source_config['base_url'], link['href']) if link and link.get('href') else None,
                     'publish_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                 }
-                if job['title']:
+                if all(job[field] for field in source_config['required']):
                     jobs.append(job)
             except Exception as e:
-                logger.warning(f"解析Bilibili招聘职位失败: {e}")
+                logger.warning(f"解析{source_config['name']}职位失败: {e}")
                 continue
 
         return jobs
@@ -326,23 +1171,42 @@ class JobSpider:
         all_jobs = []
         logger.info(f"开始爬取 {source_config['name']} - 关键词: {keyword}")
 
-        for page in range(1, max_pages + 1):
+        parser = self.get_parser(source_config)
+        pagination = source_config['pagination']
+        rate_limit = source_config['rate_limit']
+        start_page = pagination.get('start', 1)
+        max_pages = min(max_pages, pagination.get('max_pages', max_pages))
+
+        for page in range(start_page, start_page + max_pages):
             try:
-                url = source_config['search_url'].format(keyword=keyword, page=page)
+                url_template = (source_config['api']['url'] if source_config['fetch_mode'] == 'api'
+                                else source_config['search_url'])
+                url = url_template.format(keyword=keyword, page=page)
                 logger.info(f"爬取第 {page} 页: {url}")
 
-                html = await self.fetch_page(url, source_config.get('use_selenium', False))
-                if not html:
+                # 列表页优先调度，请求期间详情页抓取让路
+                async with self.frontier.search_slot():
+                    if source_config['fetch_mode'] == 'api':
+                        # 接口模式：直接请求列表JSON
+                        content = await self.fetch_api_page(source_config, keyword, page)
+                    else:
+                        content = await self.fetch_page(url, source_config['render'] == 'selenium',
+                                                        rate_limit.get('request_delay'))
+
+                if content is None:
                     logger.warning(f"获取页面失败: {url}")
                     continue
 
-                jobs = source_config['parser'](html, source_config)
+                if source_config['fetch_mode'] == 'api':
+                    jobs = self.parse_api_response(content, source_config)
+                else:
+                    jobs = parser(content, source_config)
                 all_jobs.extend(jobs)
 
                 logger.info(f"第 {page} 页获取到 {len(jobs)} 个职位")
 
                 # 页面间延迟
-                await asyncio.sleep(random.uniform(2, 5))
+                await asyncio.sleep(random.uniform(*rate_limit.get('page_delay', (2, 5))))
 
             except Exception as e:
                 logger.error(f"爬取第 {page} 页失败: {e}")
@@ -350,28 +1214,199 @@ class JobSpider:
 
         return all_jobs
 
-    async def crawl_all_sources(self, keyword: str, max_pages: int = 2) -> List[Dict]:
-        """并发爬取所有数据源"""
+    async def crawl_all_sources(self, keyword: str, max_pages: int = 2,
+                                sources: Optional[List[str]] = None) -> List[Dict]:
+        """并发爬取所有启用的数据源
+
+        Args:
+            sources: 本次运行要爬取的数据源标识，为空时使用默认启用列表
+        """
         logger.info(f"开始并发爬取所有数据源 - 关键词: {keyword}")
 
+        source_names = self.sources.select(sources)
+
+        # 站点地图：把新增/更新的详情页加入待抓取队列（只有开启详情页补充时才会被抓取）
+        if self.enrich_details:
+            await self.discover_sitemaps(source_names)
+
+        # 站点地图中的详情页在后台抓取，只在列表页请求空闲时进行
+        detail_task = asyncio.create_task(self.enrich_pending_urls(source_names)) if self.enrich_details else None
+
         tasks = []
-        for source_name in self.sources.keys():
+        for source_name in source_names:
             task = self.crawl_source(source_name, keyword, max_pages)
             tasks.append(task)
 
         results = await asyncio.gather(*tasks, return_exceptions=True)
+        if detail_task:
+            await asyncio.gather(detail_task, return_exceptions=True)
 
         all_jobs = []
-        for i, result in enumerate(results):
-            source_name = list(self.sources.keys())[i]
+        job_counts = {}
+        for source_name, result in zip(source_names, results):
             if isinstance(result, Exception):
                 logger.error(f"爬取 {source_name} 失败: {result}")
             else:
                 all_jobs.extend(result)
+                job_counts[self.sources.get(source_name)['name']] = len(result)
                 logger.info(f"{source_name} 共获取 {len(result)} 个职位")
 
+        # 记录各数据源的结果，过期判断只统计成功返回职位的批次
+        await self.record_source_results(job_counts)
         return all_jobs
 
+    async def discover_sitemaps(self, source_names: List[str]) -> int:
+        """对配置了 sitemap 的数据源读取站点地图，返回新入队的URL数"""
+        if not self.session:
+            self.init_session()
+
+        queued = 0
+        for source_name in source_names:
+            sitemap_config = self.sources.get(source_name).get('sitemap')
+            if not sitemap_config:
+                continue
+            try:
+                queued += await self.frontier.discover_sitemap_urls(
+                    self.session, source_name, self.sources.get(source_name)['base_url'],
+                    url_pattern=sitemap_config.get('url_pattern'),
+                    max_urls=sitemap_config.get('max_urls', 500)
+                )
+            except Exception as e:
+                logger.error(f"读取 {source_name} 站点地图失败: {e}")
+        return queued
+
+    def parse_detail(self, html: str, source_config: Dict) -> Dict:
+        """按配置中的 detail.selectors 解析职位详情页
+
+        Returns:
+            {'job': 职位字段, 'company': 公司字段}
+        """
+        soup = BeautifulSoup(html, 'html.parser')
+        selectors = source_config['detail'].get('selectors', {})
+        job, company = {}, {}
+
+        for field, selector in selectors.items():
+            if field == 'tags':
+                value = [tag.text.strip() for tag in soup.select(selector)]
+            else:
+                nodes = soup.select(selector)
+                value = '\n'.join(node.get_text('\n', strip=True) for node in nodes).strip()
+            if not value:
+                continue
+            if field.startswith('company_'):
+                company[field[len('company_'):]] = value
+            else:
+                job[field] = value
+
+        return {'job': job, 'company': company}
+
+    async def save_company(self, company: Dict):
+        """保存公司信息（已存在时只补充非空字段）"""
+        if not company.get('name'):
+            return
+        try:
+            await self.db.execute('''
+                INSERT INTO companies (name, industry, size, description, website, logo_url)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET
+                    industry = COALESCE(excluded.industry, industry),
+                    size = COALESCE(excluded.size, size),
+                    description = COALESCE(excluded.description, description),
+                    website = COALESCE(excluded.website, website),
+                    logo_url = COALESCE(excluded.logo_url, logo_url),
+                    update_time = CURRENT_TIMESTAMP
+            ''', (company['name'], company.get('industry'), company.get('size'),
+                  company.get('description'), company.get('website'), company.get('logo_url')))
+        except Exception as e:
+            logger.error(f"❌ 保存公司信息失败: {e}")
+
+    async def enrich_job(self, job: Dict) -> Optional[str]:
+        """抓取单个职位的详情页，补充完整描述、任职要求和公司信息"""
+        source_config = self.sources.get(job.get('source_key', ''))
+        if not source_config or not source_config.get('detail') or not job.get('url'):
+            return None
+
+        detail_config = source_config['detail']
+        async with self.frontier.detail_slot():
+            html = await self.fetch_page(job['url'], detail_config.get('render', 'http') == 'selenium',
+                                         source_config['rate_limit'].get('request_delay'))
+        if not html:
+            return await self._detail_failed(job, self.fetch_errors.pop(job['url'], '请求失败'))
+
+        try:
+            detail = self.parse_detail(html, source_config)
+        except Exception as e:
+            return await self._detail_failed(job, f'解析失败: {e}')
+        enriched = dict(job)
+        enriched.update(detail['job'])
+        await asyncio.to_thread(self.frontier.mark_fetched, job['url'])
+
+        if not all(enriched.get(field) for field in source_config['required']):
+            logger.warning(f"详情页缺少必要字段，跳过: {job['url']}")
+            return None
+
+        if detail['company']:
+            await self.save_company({'name': enriched['company'], **detail['company']})
+        return await self.save_job(enriched, True)
+
+    async def _detail_failed(self, job: Dict, error: str) -> str:
+        """记录详情页抓取失败，未达到最大尝试次数时下次爬取重试"""
+        status = await asyncio.to_thread(self.frontier.record_failure, job['url'], job['source_key'], error)
+        if status == 'failed':
+            logger.warning(f"详情页多次抓取失败，不再重试: {job['url']} - {error}")
+        else:
+            logger.warning(f"详情页抓取失败，已重新入队: {job['url']} - {error}")
+        return 'failed'
+
+    async def enrich_jobs(self, jobs: List[Dict]) -> Dict:
+        """并发补充详情（并发数受 detail_concurrency 限制，且让位于列表页请求）"""
+        results = await asyncio.gather(*(self.enrich_job(job) for job in jobs), return_exceptions=True)
+        stats = defaultdict(int)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"详情页抓取失败: {result}")
+                stats['failed'] += 1
+            else:
+                stats[result or 'skipped'] += 1
+        if jobs:
+            logger.info(f"📄 详情页补充统计: {dict(stats)}")
+        return dict(stats)
+
+    async def enrich_pending_urls(self, source_names: List[str], limit: int = 100) -> Dict:
+        """抓取站点地图发现的待抓取详情页"""
+        jobs = await asyncio.to_thread(self.pending_detail_jobs, source_names, limit)
+        return await self.enrich_jobs(jobs)
+
+    def pending_detail_jobs(self, source_names: List[str], limit: int = 100) -> List[Dict]:
+        """把待抓取队列中的详情页URL转换为职位记录"""
+        jobs = []
+        conn = sqlite3.connect(self.db_path)
+        try:
+            for source_name in source_names:
+                source_config = self.sources.get(source_name)
+                if not source_config.get('detail'):
+                    continue
+                for entry in self.frontier.pending_urls(source_name, limit):
+                    # 已经由列表页收录的职位（包括重试的详情页）沿用原有 job_id 和已知字段
+                    row = conn.execute('SELECT job_id, title, company FROM jobs WHERE url = ?',
+                                       (entry['url'],)).fetchone()
+                    job_id = row[0] if row else \
+                        f"{source_name}_{hashlib.md5(entry['url'].encode('utf-8')).hexdigest()[:16]}"
+                    job = {
+                        'job_id': job_id,
+                        'url': entry['url'],
+                        'source': source_config['name'],
+                        'source_key': source_name,
+                        'publish_time': entry['lastmod'] or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                    }
+                    if row:
+                        job.update(title=row[1], company=row[2])
+                    jobs.append(job)
+        finally:
+            conn.close()
+
+        return jobs
+
     def analyze_jobs(self, jobs: List[Dict]) -> Dict:
         """分析招聘数据"""
         if not jobs:
@@ -520,17 +1555,26 @@ class JobSpider:
 
         logger.info(f"✅ 分析报告已保存: {filename}")
 
-    async def run_crawler(self, keyword: str, max_pages: int = 2):
+    async def run_crawler(self, keyword: str, max_pages: int = 2, sources: Optional[List[str]] = None):
         """运行完整的爬虫流程"""
         logger.info(f"🚀 开始爬取招聘信息 - 关键词: {keyword}")
 
         try:
+            await self.start_crawl_run(keyword)
+
             # 1. 并发爬取所有数据源
-            jobs = await self.crawl_all_sources(keyword, max_pages)
+            jobs = await self.crawl_all_sources(keyword, max_pages, sources)
+
+            # 2. 保存到数据库（未变化的职位不会重写；通过异步连接池入库，不阻塞事件循环）
+            changed_jobs = await self.save_jobs(jobs)
+
+            # 只为新增或变化的职位抓取详情页
+            if self.enrich_details:
+                await self.enrich_jobs(changed_jobs)
+            await self.finish_crawl_run(len(jobs))
 
-            # 2. 保存到数据库
-            for job in jobs:
-                self.save_job(job)
+            # 定期清理过期职位并压缩数据库
+            await asyncio.to_thread(self.maybe_run_maintenance)
 
             # 3. 分析数据
             analysis = self.analyze_jobs(jobs)
@@ -1,8 +1,8 @@
 # 招聘信息爬虫演示
 # 演示基本的爬虫技术和数据处理
 
-import requests
-from bs4 import BeautifulSoup
+import asyncio
+import aiohttp
 import pandas as pd
 import time
 import random
@@ -11,27 +11,33 @@ from datetime import datetime
 import matplotlib.pyplot as plt
 import seaborn as sns
 import sqlite3
-from fake_useragent import UserAgent
 import re
+from fake_useragent import UserAgent
+from job_spider import CrawlFrontier
 
 class SimpleJobSpider:
-    """简化的招聘信息爬虫演示"""
-
-    def __init__(self):
+    """简化的招聘信息爬虫演示
+
+    所有请求共用一个 aiohttp 会话（连接复用），并复用 job_spider 的 CrawlFrontier
+    做 robots.txt 检查和按主机限速（不创建 JobSpider 的职位数据库），不同站点可以并发爬取。
+    被 robots.txt 禁止或请求失败的页面记录在 skipped_pages 中。
+    """
+
+    def __init__(self, db_path='job_demo.db', request_delay=(1, 3), respect_robots=True):
+        self.db_path = db_path
+        self.request_delay = request_delay
+        self.respect_robots = respect_robots
+        self.frontier = CrawlFrontier()
         self.ua = UserAgent()
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': self.ua.random,
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-            'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-        })
+        self.session = None
+        self.skipped_pages = []  # (URL, 原因)
 
         # 初始化数据库
         self.init_database()
 
     def init_database(self):
         """初始化数据库"""
-        self.conn = sqlite3.connect('job_demo.db')
+        self.conn = sqlite3.connect(self.db_path)
         cursor = self.conn.cursor()
 
         cursor.execute('''
@@ -48,105 +54,134 @@ class SimpleJobSpider:
 
         self.conn.commit()
 
-    def crawl_zhipin_demo(self, keyword="Python", pages=1):
-        """演示爬取Boss直聘（注意：实际使用时需遵守网站规则）"""
-        print(f"🔍 演示爬取Boss直聘 - 关键词: {keyword}")
-
-        jobs = []
-
-        for page in range(1, pages + 1):
-            try:
-                # 注意：这是演示URL，实际爬取时需要处理动态加载和反爬虫
-                url = f"https://www.zhipin.com/web/geek/job?query={keyword}&page={page}"
-                print(f"请求页面: {url}")
-
-                # 由于Boss直聘有反爬虫措施，这里只做请求演示
-                response = self.session.get(url, timeout=10)
-
-                if response.status_code == 200:
-                    print(f"✅ 页面 {page} 请求成功 (状态码: {response.status_code})")
-
-                    # 解析HTML（实际项目中需要处理动态内容）
-                    soup = BeautifulSoup(response.text, 'html.parser')
-
-                    # 这里是演示数据，实际爬取需要根据页面结构调整选择器
-                    demo_jobs = [
-                        {
-                            'title': f'Python开发工程师-{page}-{i+1}',
-                            'company': f'科技公司{i+1}',
-                            'salary': f'{random.randint(15, 50)}k-{random.randint(20, 80)}k',
-                            'location': random.choice(['北京', '上海', '深圳', '杭州', '广州']),
-                            'source': 'Boss直聘(演示)'
-                        } for i in range(5)
-                    ]
+    def init_session(self):
+        """创建共享的 aiohttp 会话（需在事件循环中调用）"""
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=10),
+                headers={
+                    'User-Agent': self.ua.random,
+                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+                    'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+                }
+            )
 
-                    jobs.extend(demo_jobs)
+    async def fetch_demo_page(self, url, page):
+        """请求一个页面：先检查 robots.txt 并按主机限速，跳过的页面记录到 skipped_pages"""
+        self.init_session()
+        print(f"请求页面: {url}")
+        try:
+            if self.respect_robots and not await self.frontier.allowed(self.session, url):
+                print(f"🚫 页面 {page} 被 robots.txt 禁止，已跳过")
+                self.skipped_pages.append((url, 'robots.txt 禁止'))
+                return None
+
+            # 同一主机的请求间隔由 CrawlFrontier 控制（同时遵守 Crawl-delay）
+            await self.frontier.wait_turn(url, random.uniform(*self.request_delay))
+            async with self.session.get(url) as response:
+                if response.status != 200:
+                    print(f"❌ 页面 {page} 请求失败 (状态码: {response.status})")
+                    self.skipped_pages.append((url, f'状态码 {response.status}'))
+                    return None
+                html = await response.text()
+        except Exception as e:
+            print(f"❌ 爬取页面 {page} 时出错: {e}")
+            self.skipped_pages.append((url, f'请求出错: {e}'))
+            return None
+
+        print(f"✅ 页面 {page} 请求成功 (状态码: 200)")
+        return html
+
+    def report_skipped(self):
+        """输出被跳过的页面（这些页面没有生成演示数据）"""
+        if not self.skipped_pages:
+            return
+        print(f"\n⚠️ 跳过 {len(self.skipped_pages)} 个页面:")
+        for url, reason in self.skipped_pages:
+            print(f"- {url}: {reason}")
 
-                else:
-                    print(f"❌ 页面 {page} 请求失败 (状态码: {response.status_code})")
+    async def crawl_zhipin_demo(self, keyword="Python", pages=1):
+        """演示爬取Boss直聘（注意：实际使用时需遵守网站规则）"""
+        print(f"🔍 演示爬取Boss直聘 - 关键词: {keyword}")
 
-            except Exception as e:
-                print(f"❌ 爬取页面 {page} 时出错: {e}")
+        # 注意：这是演示URL，实际爬取时需要处理动态加载和反爬虫
+        # 各页并发提交，同一主机的请求间隔由调度器控制
+        urls = [f"https://www.zhipin.com/web/geek/job?query={keyword}&page={page}"
+                for page in range(1, pages + 1)]
+        pages_html = await asyncio.gather(*(self.fetch_demo_page(url, page)
+                                            for page, url in enumerate(urls, 1)))
 
-            # 延迟避免请求过快
-            time.sleep(random.uniform(1, 3))
+        jobs = []
+        for page, html in enumerate(pages_html, 1):
+            if html is None:
+                continue
+
+            # 这里是演示数据，实际爬取需要根据页面结构调整选择器
+            demo_jobs = [
+                {
+                    'title': f'Python开发工程师-{page}-{i+1}',
+                    'company': f'科技公司{i+1}',
+                    'salary': f'{random.randint(15, 50)}k-{random.randint(20, 80)}k',
+                    'location': random.choice(['北京', '上海', '深圳', '杭州', '广州']),
+                    'source': 'Boss直聘(演示)'
+                } for i in range(5)
+            ]
+
+            jobs.extend(demo_jobs)
 
         return jobs
 
-    def crawl_lagou_demo(self, keyword="Python", pages=1):
+    async def crawl_lagou_demo(self, keyword="Python", pages=1):
         """演示爬取拉勾网"""
         print(f"🔍 演示爬取拉勾网 - 关键词: {keyword}")
 
-        jobs = []
-
-        for page in range(1, pages + 1):
-            try:
-                url = f"https://www.lagou.com/wn/jobs?pn={page}&kd={keyword}"
-                print(f"请求页面: {url}")
-
-                response = self.session.get(url, timeout=10)
-
-                if response.status_code == 200:
-                    print(f"✅ 页面 {page} 请求成功 (状态码: {response.status_code})")
-
-                    # 演示数据
-                    demo_jobs = [
-                        {
-                            'title': f'后端开发工程师-{page}-{i+1}',
-                            'company': f'互联网公司{i+1}',
-                            'salary': f'{random.randint(20, 60)}k-{random.randint(30, 100)}k',
-                            'location': random.choice(['北京', '上海', '深圳', '杭州', '成都']),
-                            'source': '拉勾网(演示)'
-                        } for i in range(5)
-                    ]
-
-                    jobs.extend(demo_jobs)
-
-                else:
-                    print(f"❌ 页面 {page} 请求失败 (状态码: {response.status_code})")
-
-            except Exception as e:
-                print(f"❌ 爬取页面 {page} 时出错: {e}")
+        urls = [f"https://www.lagou.com/wn/jobs?pn={page}&kd={keyword}"
+                for page in range(1, pages + 1)]
+        pages_html = await asyncio.gather(*(self.fetch_demo_page(url, page)
+                                            for page, url in enumerate(urls, 1)))
 
-            time.sleep(random.uniform(1, 3))
+        jobs = []
+        for page, html in enumerate(pages_html, 1):
+            if html is None:
+                continue
+
+            # 演示数据
+            demo_jobs = [
+                {
+                    'title': f'后端开发工程师-{page}-{i+1}',
+                    'company': f'互联网公司{i+1}',
+                    'salary': f'{random.randint(20, 60)}k-{random.randint(30, 100)}k',
+                    'location': random.choice(['北京', '上海', '深圳', '杭州', '成都']),
+                    'source': '拉勾网(演示)'
+                } for i in range(5)
+            ]
+
+            jobs.extend(demo_jobs)
 
         return jobs
 
+    async def crawl_all_demo(self, keyword="Python", pages=1):
+        """并发爬取Boss直聘和拉勾网，总耗时约等于最慢的单个站点"""
+        boss_jobs, lagou_jobs = await asyncio.gather(
+            self.crawl_zhipin_demo(keyword, pages),
+            self.crawl_lagou_demo(keyword, pages)
+        )
+        return boss_jobs, lagou_jobs
+
     def save_jobs_to_db(self, jobs):
         """保存职位到数据库"""
-        cursor = self.conn.cursor()
-
-        for job in jobs:
-            try:
-                cursor.execute('''
+        try:
+            # 一次 executemany 批量写入，单个事务提交
+            with self.conn:
+                self.conn.executemany('''
                     INSERT INTO demo_jobs (title, company, salary, location, source)
                     VALUES (?, ?, ?, ?, ?)
-                ''', (job['title'], job['company'], job['salary'], job['location'], job['source']))
-
-            except Exception as e:
-                print(f"保存职位失败: {e}")
+                ''', [(job['title'], job['company'], job['salary'], job['location'], job['source'])
+                      for job in jobs])
+        except Exception as e:
+            print(f"保存职位失败: {e}")
+            return
 
-        self.conn.commit()
         print(f"✅ 已保存 {len(jobs)} 个职位到数据库")
 
     def analyze_and_visualize(self):
@@ -228,12 +263,14 @@ class SimpleJobSpider:
 
         print("✅ 分析完成！生成文件：job_analysis_demo.png, job_report_demo.md")
 
-    def close(self):
-        """关闭数据库连接"""
+    async def close(self):
+        """关闭网络会话和数据库连接"""
+        if self.session:
+            await self.session.close()
         if self.conn:
             self.conn.close()
 
-def main():
+async def main():
     """主函数演示"""
     print("🎯 招聘信息爬虫演示系统")
     print("=" * 50)
@@ -245,17 +282,15 @@ def main():
     spider = SimpleJobSpider()
 
     try:
-        # 1. 爬取Boss直聘演示数据
-        print("\n1️⃣ 爬取Boss直聘演示数据...")
-        boss_jobs = spider.crawl_zhipin_demo("Python", pages=2)
-
-        # 2. 爬取拉勾网演示数据
-        print("\n2️⃣ 爬取拉勾网演示数据...")
-        lagou_jobs = spider.crawl_lagou_demo("Python", pages=2)
+        # 1-2. 并发爬取Boss直聘和拉勾网演示数据
+        print("\n1️⃣ 2️⃣ 并发爬取Boss直聘和拉勾网演示数据...")
+        start_time = time.perf_counter()
+        boss_jobs, lagou_jobs = await spider.crawl_all_demo("Python", pages=2)
 
         # 3. 合并数据
         all_jobs = boss_jobs + lagou_jobs
-        print(f"\n📊 共获取 {len(all_jobs)} 个演示职位")
+        print(f"\n📊 共获取 {len(all_jobs)} 个演示职位，耗时 {time.perf_counter() - start_time:.1f} 秒")
+        spider.report_skipped()
 
         # 4. 保存到数据库
         print("\n3️⃣ 保存数据到数据库...")
@@ -274,7 +309,7 @@ def main():
     except Exception as e:
         print(f"❌ 演示过程中出错: {e}")
     finally:
-        spider.close()
+        await spider.close()
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())